@@ -3,6 +3,9 @@
 """ Draw the Population graph.  Nodes will be drawn with a color corresponding
 to the type_colors property of the Cell type used.
 
+Images are rendered by the Experiment's OutputManager, so they are drawn in the
+background if the output_thread option is enabled in the [Experiment] section.
+
 NOTE: This action requires Matplotlib
 
 """
@@ -13,7 +16,8 @@ __credits__ = "Brian Connelly"
 import csv
 
 try:
-    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
 except ImportError:
     raise ImportError("DrawPopulation requires matplotlib")
 
@@ -97,21 +101,51 @@ class DrawPopulation(Action):
         if self.skip_update():
 	        return
 
-        # Get a list of the colors to use for each node
-        cols = []
-        for n in self.graph.nodes():
-            cols.append(self.colors[self.graph.node[n]['cell'].type])
+        # Get the nodes, edges, and the colors to use for each node now, since
+        # the image may be drawn after the population has changed
+        nodes = list(self.graph.nodes())
+        edges = list(self.graph.edges())
+        cols = [self.colors[self.graph.node[n]['cell'].type] for n in nodes]
 
-        plt.figure()
-        nx.draw(self.graph, with_labels=False,
-                pos=self.pos, edge_color='#777777', node_color=cols, node_size=40)
+        filename = "%s-%06d.%s" % (self.filename, self.experiment.epoch, self.format)
+        data_file = self.datafile_path(filename)
+        self.experiment.output.submit(self.draw, data_file,
+                                      self.experiment.epoch, nodes, edges,
+                                      cols)
+
+    def draw(self, data_file, epoch, nodes, edges, cols):
+        """Draw the population and save the image
+
+        Parameters:
+
+        *data_file*
+            The path of the image file to write
+        *epoch*
+            The epoch being drawn
+        *nodes*
+            A list of the nodes to draw
+        *edges*
+            A list of the edges to draw
+        *cols*
+            A list of the colors of each node
+
+        """
+
+        # Figures are created without pyplot, which is not safe to use from a
+        # background thread
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111)
+
+        nx.draw_networkx_edges(self.graph, pos=self.pos, edgelist=edges,
+                               edge_color='#777777', ax=ax)
+        nx.draw_networkx_nodes(self.graph, pos=self.pos, nodelist=nodes,
+                               node_color=cols, node_size=40, ax=ax)
+        ax.set_axis_off()
 
         if self.display_epoch:
-            plt.text(0, -0.05, "Epoch: %d" % (self.experiment.epoch),
-                     horizontalalignment='left',
-                     size='small')
+            ax.text(0, -0.05, "Epoch: %d" % (epoch),
+                    horizontalalignment='left',
+                    size='small')
 
-        filename = "%s-%06d.%s" % (self.filename, self.experiment.epoch, self.format)
-        data_file = self.datafile_path(filename)
-        plt.savefig(data_file, transparent=self.transparent)
-        plt.close()
+        fig.savefig(data_file, transparent=self.transparent)
@@ -111,7 +111,7 @@ class DrawTransitions(Action):
         # NOTE: this size is radius-based.  Do area-based for more accurate analogy?
         for i in range(self.max_types):
             count = float(self.experiment.data['population']['type_count'][i])
-            frac = count / len(self.experiment.population.topology.graph)
+            frac = count / self.experiment.population.topology.num_nodes()
             mysize = min_size + (frac * (max_size - min_size))
             node_sizes.append(mysize)
 
@@ -50,6 +50,8 @@ class PlotCellTypeStack(Action):
 
     """
 
+    checkpoint_fields = ['epochs', 'typecounts']
+
     def __init__(self, experiment, label=None):
         """Initialize the PlotCellTypeStack Action"""
 
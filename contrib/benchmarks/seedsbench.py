@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark SEEDS by running a set of standard workloads at several sizes.  For
+each run, the time taken to set up the Experiment, the number of epochs (and
+Cell updates) per second, and the peak memory used (resident set size) are
+recorded.  Results are written as JSON, so that the results from two
+checkouts of SEEDS can be compared:
+
+    seedsbench.py -o before.json
+    (change SEEDS)
+    seedsbench.py -o after.json
+    seedsbench.py --compare before.json after.json
+
+Each run is performed in its own process, so that its peak memory use is not
+affected by the runs before it.  The SEEDS that is benchmarked is the one
+found on the Python path (e.g., PYTHONPATH=/path/to/checkout).
+
+Workloads:
+    rps-cartesian       RPSCell on a CartesianTopology
+    gol-moore           GameOfLifeCell on a MooreTopology
+    kerr-vonneumann     Kerr07Cell on a VonNeumannTopology
+    resource-diffusion  A NormalResource diffusing on a VonNeumannTopology
+    clusters            PrintPopulationTypeClusters on a MooreTopology
+    graph-properties    PrintPopulationGraphProperties on a MooreTopology
+    rps-wellmixed       RPSCell on a WellMixedTopology
+    quasispecies-moore  QuasispeciesCell with long genotypes on a MooreTopology
+
+Dependencies:
+    - Python 2.7 or greater
+    - SEEDS
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__version__ = "1.0"
+__credits__ = "Brian Connelly"
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+clock = getattr(time, 'perf_counter', time.time)
+
+SIZES = ['small', 'medium', 'large']
+
+
+def rps_cartesian(size):
+    return {'Experiment': {'actions': 'PrintCellTypeCount'},
+            'Population': {'topology': 'CartesianTopology', 'cell': 'RPSCell'},
+            'CartesianTopology': {'size': size, 'expected_neighbors': 8,
+                                  'periodic': True},
+            'PrintCellTypeCount': {'frequency': 1}}
+
+def gol_moore(size):
+    return {'Experiment': {'actions': 'PrintCellTypeCount'},
+            'Population': {'topology': 'MooreTopology',
+                           'cell': 'GameOfLifeCell'},
+            'MooreTopology': {'size': size, 'periodic': True},
+            'PrintCellTypeCount': {'frequency': 1}}
+
+def kerr_vonneumann(size):
+    return {'Experiment': {'actions': 'PrintCellTypeCount'},
+            'Population': {'topology': 'VonNeumannTopology',
+                           'cell': 'Kerr07Cell'},
+            'VonNeumannTopology': {'size': size, 'periodic': True},
+            'Kerr07Cell': {'death_sensitive': 0.010, 'death_resistant': 0.0125,
+                           'death_producer': 0.015, 'toxicity': 0.05},
+            'PrintCellTypeCount': {'frequency': 1}}
+
+def resource_diffusion(size):
+    return {'Experiment': {'actions': 'PrintResourceStats',
+                           'resources': 'glucose'},
+            'Population': {'topology': 'MooreTopology', 'cell': 'RPSCell'},
+            'MooreTopology': {'size': 10, 'periodic': True},
+            'Resource:glucose': {'type': 'NormalResource',
+                                 'topology': 'VonNeumannTopology',
+                                 'initial': 0, 'inflow': 0.5,
+                                 'diffusion': 0.3, 'decay': 0.1},
+            'VonNeumannTopology': {'size': size, 'periodic': False},
+            'PrintResourceStats': {'resource': 'glucose'}}
+
+def clusters(size):
+    return {'Experiment': {'actions': 'PrintPopulationTypeClusters'},
+            'Population': {'topology': 'MooreTopology', 'cell': 'RPSCell'},
+            'MooreTopology': {'size': size, 'periodic': True},
+            'PrintPopulationTypeClusters': {'frequency': 1}}
+
+def graph_properties(size):
+    return {'Experiment': {'actions': 'PrintPopulationGraphProperties'},
+            'Population': {'topology': 'MooreTopology', 'cell': 'RPSCell'},
+            'MooreTopology': {'size': size, 'periodic': True},
+            'PrintPopulationGraphProperties': {'frequency': 1}}
+
+def rps_wellmixed(size):
+    return {'Experiment': {'actions': 'PrintCellTypeCount'},
+            'Population': {'topology': 'WellMixedTopology', 'cell': 'RPSCell'},
+            'WellMixedTopology': {'size': size},
+            'PrintCellTypeCount': {'frequency': 1}}
+
+def quasispecies_moore(size):
+    return {'Experiment': {'actions': 'PrintCellTypeCount'},
+            'Population': {'topology': 'MooreTopology',
+                           'cell': 'QuasispeciesCell'},
+            'MooreTopology': {'size': size, 'periodic': True},
+            'QuasispeciesCell': {'death_rate': 0.2, 'genotype_length': 1000,
+                                 'site_mut_rate': 0.005,
+                                 'narrow_polynomail_order': 4,
+                                 'wide_max_value': 0.75},
+            'PrintCellTypeCount': {'frequency': 1}}
+
+# For each workload: the function building its configuration, the size
+# parameter given to that function for each size, and the default number of
+# epochs
+WORKLOADS = {'rps-cartesian': (rps_cartesian,
+                               {'small': 1000, 'medium': 10000, 'large': 40000},
+                               20),
+             'gol-moore': (gol_moore,
+                           {'small': 32, 'medium': 100, 'large': 200}, 20),
+             'kerr-vonneumann': (kerr_vonneumann,
+                                 {'small': 32, 'medium': 100, 'large': 200},
+                                 20),
+             'resource-diffusion': (resource_diffusion,
+                                    {'small': 32, 'medium': 100, 'large': 300},
+                                    20),
+             'clusters': (clusters,
+                          {'small': 32, 'medium': 100, 'large': 200}, 10),
+             'graph-properties': (graph_properties,
+                                  {'small': 10, 'medium': 20, 'large': 30}, 5),
+             'rps-wellmixed': (rps_wellmixed,
+                               {'small': 500, 'medium': 2000, 'large': 5000},
+                               10),
+             'quasispecies-moore': (quasispecies_moore,
+                                    {'small': 32, 'medium': 100, 'large': 200},
+                                    10)}
+
+WORKLOAD_ORDER = ['rps-cartesian', 'gol-moore', 'kerr-vonneumann',
+                  'resource-diffusion', 'clusters', 'graph-properties',
+                  'rps-wellmixed', 'quasispecies-moore']
+
+
+def write_config(filename, sections):
+    """Write a configuration given as a dict of dicts"""
+    with open(filename, 'w') as handle:
+        for section in sorted(sections):
+            handle.write("[%s]\n" % (section))
+            for (key, value) in sorted(sections[section].items()):
+                handle.write("%s = %s\n" % (key, value))
+            handle.write("\n")
+
+def git_revision(path):
+    """Get the git revision of the checkout holding path, if any"""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                               cwd=path, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision.decode('ascii').strip()
+
+def environment():
+    """Describe SEEDS and the system on which it is run"""
+    import seeds
+
+    seeds_dir = os.path.dirname(os.path.abspath(seeds.__file__))
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+
+    return {'seeds_version': seeds.__version__,
+            'seeds_path': seeds_dir,
+            'git_revision': git_revision(seeds_dir),
+            'python': platform.python_version(),
+            'numpy': numpy_version,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def peak_rss_kb():
+    """Get the peak resident set size of this process in kilobytes"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # Reported in bytes rather than kilobytes
+        rss = rss // 1024
+    return rss
+
+def num_nodes(topology):
+    """Get the number of nodes in a topology.  Versions of SEEDS without
+    Topology.num_nodes count the nodes of the graph, which later versions may
+    only build when it is asked for.
+    """
+
+    if hasattr(topology, 'num_nodes'):
+        return topology.num_nodes()
+    return len(topology.graph)
+
+def epoch_events(population):
+    """Get the number of Cell updates performed during the last epoch.
+    Versions of SEEDS that do not count them update events_per_epoch Cells
+    (by default, one per node) each epoch.
+    """
+
+    events = getattr(population, 'events', None)
+    if events is None:
+        events = population.experiment.config.getint(section=population.config_section,
+                                                     name='events_per_epoch',
+                                                     default=num_nodes(population.topology))
+    return events
+
+def run_workload(task):
+    """Run one workload in this process and return a dict of measurements"""
+    (workload, size, epochs, seed, params) = task
+    (build, sizes, default_epochs) = WORKLOADS[workload]
+
+    result = {'workload': workload, 'size': size, 'size_param': sizes[size],
+              'epochs': epochs, 'error': None}
+
+    workdir = tempfile.mkdtemp(prefix='seedsbench-')
+    try:
+        rss_start = peak_rss_kb()
+
+        from seeds.Experiment import Experiment
+
+        config = build(sizes[size])
+        config['Experiment']['epochs'] = epochs
+        config['Experiment']['data_dir'] = os.path.join(workdir, 'data')
+        for (section, parameter, value) in params:
+            config.setdefault(section, {})[parameter] = value
+
+        configfile = os.path.join(workdir, 'benchmark.cfg')
+        write_config(configfile, config)
+
+        experiment = Experiment(configfile=configfile, seed=seed)
+
+        start = clock()
+        experiment.setup()
+        result['setup_seconds'] = clock() - start
+        result['cells'] = num_nodes(experiment.population.topology)
+
+        events = 0
+        start = clock()
+        while experiment.proceed:
+            experiment.update()
+            events += epoch_events(experiment.population)
+        run_seconds = clock() - start
+
+        start = clock()
+        experiment.teardown()
+        result['teardown_seconds'] = clock() - start
+
+        result['run_seconds'] = run_seconds
+        result['events'] = events
+        if run_seconds > 0:
+            result['epochs_per_second'] = experiment.epoch / run_seconds
+            result['events_per_second'] = events / run_seconds
+        else:
+            result['epochs_per_second'] = None
+            result['events_per_second'] = None
+
+        result['peak_rss_kb'] = peak_rss_kb()
+        result['start_rss_kb'] = rss_start
+    except Exception as err:
+        result['error'] = str(err)
+        result['traceback'] = traceback.format_exc()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return result
+
+def run_isolated(func, args):
+    """Call func with the given tuple of arguments in a new process and
+    return its result
+    """
+
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+def summarize(results):
+    """Combine the repeated runs of each workload and size, keeping the
+    fastest run time and setup time and the largest peak memory use
+    """
+
+    combined = []
+    for r in results:
+        if len(combined) > 0 and combined[-1]['workload'] == r['workload'] and \
+                combined[-1]['size'] == r['size']:
+            entry = combined[-1]
+        else:
+            entry = {'workload': r['workload'], 'size': r['size'],
+                     'size_param': r['size_param'], 'epochs': r['epochs'],
+                     'runs': []}
+            combined.append(entry)
+        entry['runs'].append(r)
+
+    for entry in combined:
+        runs = [r for r in entry['runs'] if r['error'] is None]
+        if len(runs) == 0:
+            entry['error'] = entry['runs'][0]['error']
+            continue
+
+        best = min(runs, key=lambda r: r['run_seconds'])
+        entry['error'] = None
+        entry['cells'] = best['cells']
+        entry['run_seconds'] = best['run_seconds']
+        entry['epochs_per_second'] = best['epochs_per_second']
+        entry['events_per_second'] = best['events_per_second']
+        entry['setup_seconds'] = min(r['setup_seconds'] for r in runs)
+        entry['peak_rss_kb'] = max(r['peak_rss_kb'] for r in runs)
+
+    return combined
+
+def format_results(results):
+    """Format combined results as a table"""
+    lines = ["%-20s %-7s %8s %12s %14s %10s %12s" % ('workload', 'size',
+                                                     'cells', 'epochs/s',
+                                                     'events/s', 'setup (s)',
+                                                     'peak RSS (MB)')]
+    for r in results:
+        if r['error'] is not None:
+            lines.append("%-20s %-7s failed: %s" % (r['workload'], r['size'],
+                                                    r['error']))
+            continue
+
+        lines.append("%-20s %-7s %8d %12.2f %14.1f %10.3f %12.1f" % (r['workload'], r['size'],
+                                                                   r['cells'],
+                                                                   r['epochs_per_second'] or 0,
+                                                                   r['events_per_second'] or 0,
+                                                                   r['setup_seconds'],
+                                                                   r['peak_rss_kb'] / 1024.0))
+    return "\n".join(lines)
+
+def compare_results(base, new):
+    """Format a comparison of two results files as a table.  Ratios above 1
+    mean that the new results are faster (or use less memory).
+    """
+
+    lines = ["base: %s (%s)" % (base['environment']['seeds_path'],
+                                base['environment']['git_revision']),
+             "new:  %s (%s)" % (new['environment']['seeds_path'],
+                                new['environment']['git_revision']),
+             "",
+             "%-20s %-7s %12s %12s %8s %10s %10s %8s %9s" % ('workload', 'size',
+                                                          'base ep/s',
+                                                          'new ep/s',
+                                                          'speedup',
+                                                          'base setup',
+                                                          'new setup',
+                                                          'speedup',
+                                                          'RSS ratio')]
+
+    base_results = dict(((r['workload'], r['size']), r) for r in base['results'])
+
+    for r in new['results']:
+        b = base_results.get((r['workload'], r['size']))
+        if b is None:
+            continue
+        if b['error'] is not None or r['error'] is not None:
+            lines.append("%-20s %-7s failed" % (r['workload'], r['size']))
+            continue
+        if not b['epochs_per_second'] or not r['epochs_per_second']:
+            lines.append("%-20s %-7s too fast to measure" % (r['workload'], r['size']))
+            continue
+
+        lines.append("%-20s %-7s %12.2f %12.2f %7.2fx %10.3f %10.3f %7.2fx %8.2fx" %
+                     (r['workload'], r['size'],
+                      b['epochs_per_second'], r['epochs_per_second'],
+                      r['epochs_per_second'] / b['epochs_per_second'],
+                      b['setup_seconds'], r['setup_seconds'],
+                      b['setup_seconds'] / max(r['setup_seconds'], 1e-9),
+                      float(b['peak_rss_kb']) / r['peak_rss_kb']))
+
+    return "\n".join(lines)
+
+PARAM_PATTERN = re.compile(r"^\s*(?P<section>[A-Za-z0-9:_]+)\.(?P<parameter>[A-Za-z0-9:_]+)\s*=\s*(?P<value>[A-Za-z0-9_\.\,\-:]+)\s*$")
+
+def parse_params(strings):
+    """Parse semicolon-separated lists of section.param=value settings and
+    return a list of (section, parameter, value) tuples.  This is done here
+    rather than with seeds.utils.parsing so that versions of SEEDS without
+    parse_param_string can be benchmarked.
+    """
+
+    params = []
+    for s in strings:
+        for p in re.split(r"\s*;\s*", s.strip()):
+            if not p:
+                continue
+            match = PARAM_PATTERN.match(p)
+            if match is None:
+                raise ValueError("'{s}' is not a valid parameter setting".format(s=p))
+            params.append((match.group('section'), match.group('parameter'),
+                           match.group('value')))
+    return params
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SEEDS workloads",
+                                     epilog="Workloads: %s" % (", ".join(WORKLOAD_ORDER)))
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help="compare two results files and quit")
+    parser.add_argument('-e', '--epochs', type=int,
+                        help="number of epochs to run each workload (default: depends on the workload)")
+    parser.add_argument('-l', '--list', action='store_true', help="list the workloads and sizes and quit")
+    parser.add_argument('-o', '--outfile', help="write results to this JSON file")
+    parser.add_argument('-p', '--param', action='append', default=[],
+                        help="set a config value in every workload.  Semicolon-separated list of section.param=val.  May be repeated.")
+    parser.add_argument('-r', '--repeat', type=int, default=1,
+                        help="number of times to run each workload.  The fastest run is reported. (default: 1)")
+    parser.add_argument('-s', '--sizes', nargs='+', choices=SIZES, default=SIZES,
+                        help="sizes to run (default: all)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument('-w', '--workloads', nargs='+', choices=WORKLOAD_ORDER,
+                        default=WORKLOAD_ORDER, metavar='WORKLOAD',
+                        help="workloads to run (default: all)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="suppress progress messages")
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as handle:
+            base = json.load(handle)
+        with open(args.compare[1]) as handle:
+            new = json.load(handle)
+        print(compare_results(base, new))
+        return
+
+    if args.list:
+        for name in WORKLOAD_ORDER:
+            (build, sizes, epochs) = WORKLOADS[name]
+            print("%-20s %s (epochs: %d)" % (name, ", ".join("%s=%s" % (s, sizes[s]) for s in SIZES), epochs))
+        return
+
+    try:
+        params = parse_params(args.param)
+    except ValueError as err:
+        parser.error(str(err))
+
+    runs = []
+    for name in WORKLOAD_ORDER:
+        if name not in args.workloads:
+            continue
+        for size in SIZES:
+            if size not in args.sizes:
+                continue
+            epochs = args.epochs or WORKLOADS[name][2]
+            for i in range(args.repeat):
+                runs.append((name, size, epochs, args.seed, params))
+
+    results = []
+    for task in runs:
+        if not args.quiet:
+            sys.stdout.write("%s (%s)... " % (task[0], task[1]))
+            sys.stdout.flush()
+        result = run_isolated(run_workload, (task,))
+        results.append(result)
+        if not args.quiet:
+            if result['error'] is None:
+                print("%.2f epochs/s" % (result['epochs_per_second'] or 0))
+            else:
+                print("failed: %s" % (result['error']))
+
+    output = {'benchmark_version': __version__,
+              'environment': run_isolated(environment, ()),
+              'params': [list(p) for p in params],
+              'seed': args.seed,
+              'repeat': args.repeat,
+              'results': summarize(results)}
+
+    if not args.quiet:
+        print("")
+        print(format_results(output['results']))
+
+    if args.outfile:
+        with open(args.outfile, 'w') as handle:
+            json.dump(output, handle, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
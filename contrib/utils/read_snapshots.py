@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Read binary snapshot files written by the SEEDS PrintCellLocations action
+(with format = binary) into NumPy arrays.  This can either be used as a
+command-line tool to summarize a snapshot file or convert it to CSV, or by
+importing and calling the read_snapshots function.
+
+Example:
+
+    snaps = read_snapshots('data/cell_locations.snap')
+    types = snaps.stack('type')         # one row per epoch
+    x = snaps.static('x', epoch=100)    # x coordinate of each node
+
+Uncompressed arrays are memory-mapped, so large files can be read without
+loading them into memory.
+
+Dependencies:
+    - Python 2.7 or greater
+    - Numpy
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__version__ = "1.0"
+__credits__ = "Brian Connelly"
+
+import argparse
+import csv
+import json
+import mmap
+import struct
+import sys
+import zlib
+
+import numpy
+
+# These match the format written by seeds.utils.snapshots
+MAGIC = b'SEEDSNAP'
+HEADER = struct.Struct('<8sHI')
+RECORD_MAGIC = b'SREC'
+RECORD = struct.Struct('<4sBBHHqQQ')
+TRAILER = struct.Struct('<Q8s')
+TRAILER_MAGIC = b'SNAPIDX1'
+
+STATIC = 0
+EPOCH = 1
+
+
+def _padding(length, alignment=8):
+    return -length % alignment
+
+
+class Snapshots(object):
+    """The contents of a snapshot file
+
+    Properties:
+
+    filename
+        The name of the file
+    metadata
+        A dict of information stored when the file was written (e.g., the
+        names of the Cell types)
+    epochs
+        A sorted array of the epochs for which snapshots were written
+    records
+        A list of (kind, epoch, name, dtype, offset, nbytes, stored,
+        compression) tuples describing each array in the file
+
+    """
+
+    def __init__(self, filename, use_mmap=True):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+
+        if use_mmap:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = self._file.read()
+
+        (magic, version, meta_length) = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a SEEDS snapshot file" % (filename))
+
+        start = HEADER.size
+        self.metadata = json.loads(self._data[start:start + meta_length].decode('utf-8'))
+        start += meta_length
+        start += _padding(start)
+
+        self.records = self._read_index(start)
+        self.epochs = numpy.array(sorted(set(r[1] for r in self.records if r[0] == EPOCH)),
+                                  dtype=numpy.int64)
+
+    def _read_index(self, start):
+        """Read the index at the end of the file.  If the file was not closed
+        (e.g., the experiment was interrupted), the records are scanned
+        instead.
+        """
+
+        length = len(self._data)
+        if length >= start + TRAILER.size:
+            (offset, magic) = TRAILER.unpack_from(self._data, length - TRAILER.size)
+            if magic == TRAILER_MAGIC:
+                index = json.loads(self._data[offset:length - TRAILER.size].decode('utf-8'))
+                return [tuple(r) for r in index]
+
+        records = []
+        position = start
+        while position + RECORD.size <= length:
+            (magic, kind, compression, name_length, dtype_length, epoch,
+             nbytes, stored) = RECORD.unpack_from(self._data, position)
+            if magic != RECORD_MAGIC:
+                break
+
+            position += RECORD.size
+            name = self._data[position:position + name_length].decode('utf-8')
+            position += name_length
+            dtype = self._data[position:position + dtype_length].decode('ascii')
+            position += dtype_length
+            position += _padding(position)
+
+            if position + stored > length:
+                # Incomplete record at the end of the file
+                break
+
+            records.append((kind, epoch, name, dtype, position, nbytes, stored,
+                            compression))
+            position += stored
+            position += _padding(position)
+
+        return records
+
+    def _load(self, record):
+        (kind, epoch, name, dtype, offset, nbytes, stored, compression) = record
+        dtype = numpy.dtype(str(dtype))
+
+        if compression == 1:
+            data = zlib.decompress(self._data[offset:offset + stored])
+            return numpy.frombuffer(data, dtype=dtype)
+
+        return numpy.frombuffer(self._data, dtype=dtype,
+                                count=nbytes // dtype.itemsize, offset=offset)
+
+    def names(self):
+        """Get the names of the arrays written at each epoch"""
+        return sorted(set(r[2] for r in self.records if r[0] == EPOCH))
+
+    def get(self, name, epoch):
+        """Get the named array for the given epoch"""
+        for r in self.records:
+            if r[0] == EPOCH and r[1] == epoch and r[2] == name:
+                return self._load(r)
+        raise KeyError("No array '%s' at epoch %d" % (name, epoch))
+
+    def static(self, name, epoch=None):
+        """Get the named static array (e.g., node_id, x, or y) that applies at
+        the given epoch.  By default, the most recently written one is used.
+        """
+
+        found = None
+        for r in self.records:
+            if r[0] == STATIC and r[2] == name and (epoch is None or r[1] <= epoch):
+                if found is None or r[1] >= found[1]:
+                    found = r
+
+        if found is None:
+            raise KeyError("No static array '%s'" % (name))
+        return self._load(found)
+
+    def stack(self, name, epochs=None):
+        """Get the named array for several epochs (default: all) as a 2D
+        array with one row per epoch.  The arrays must all have the same
+        length.
+        """
+
+        if epochs is None:
+            epochs = self.epochs
+        return numpy.vstack([self.get(name, e) for e in epochs])
+
+    def close(self):
+        """Close the file"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def read_snapshots(filename, use_mmap=True):
+    """Open a snapshot file and return a Snapshots object describing it
+
+    Parameters:
+
+    *filename*
+        The name of the snapshot file
+    *use_mmap*
+        Whether or not to memory-map the file rather than reading it into
+        memory (default: True)
+
+    """
+
+    return Snapshots(filename, use_mmap=use_mmap)
+
+def write_csv(snaps, outfile, epochs=None):
+    """Write snapshots in the CSV format used by PrintCellLocations"""
+    writer = csv.writer(outfile)
+    writer.writerow(['epoch', 'cell_id', 'node_id', 'x', 'y', 'type'])
+
+    if epochs is None:
+        epochs = snaps.epochs
+
+    for epoch in epochs:
+        nodes = snaps.static('node_id', epoch)
+        x = snaps.static('x', epoch)
+        y = snaps.static('y', epoch)
+        ids = snaps.get('cell_id', epoch)
+        types = snaps.get('type', epoch)
+        writer.writerows(zip([int(epoch)] * len(nodes), ids.tolist(),
+                             nodes.tolist(), x.tolist(), y.tolist(),
+                             types.tolist()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or convert SEEDS snapshot files")
+    parser.add_argument('infile', help="snapshot file to read")
+    parser.add_argument('--csv', '-c', metavar='CSVFILE', default=None,
+                        help="write the snapshots to CSVFILE in the format of PrintCellLocations (use - for stdout)")
+    parser.add_argument('--epoch', '-e', type=int, action='append', default=None,
+                        help="only convert the given epoch (may be repeated)")
+    parser.add_argument('--version', action='version', version=__version__)
+    args = parser.parse_args()
+
+    snaps = read_snapshots(args.infile)
+
+    if args.csv:
+        if args.csv == '-':
+            write_csv(snaps, sys.stdout, epochs=args.epoch)
+        else:
+            with open(args.csv, 'w') as outfile:
+                write_csv(snaps, outfile, epochs=args.epoch)
+    else:
+        print("File: %s" % (snaps.filename))
+        print("Metadata: %s" % (json.dumps(snaps.metadata)))
+        print("Epochs: %d" % (len(snaps.epochs)))
+        if len(snaps.epochs) > 0:
+            print("First epoch: %d" % (snaps.epochs[0]))
+            print("Last epoch: %d" % (snaps.epochs[-1]))
+        print("Arrays per epoch: %s" % (", ".join(snaps.names())))
+
+    snaps.close()
+
+
+if __name__ == "__main__":
+    main()
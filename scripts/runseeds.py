@@ -13,7 +13,9 @@ __version__ = "1.0.13"
 __credits__ = "Brian Connelly"
 
 import seeds as S
+from seeds.OutputManager import install_signal_handler
 from seeds.SEEDSError import *
+from seeds.utils.parsing import parse_param
 from optparse import OptionParser
 
 import os
@@ -61,6 +63,8 @@ def main():
     parser.add_option("-e", "--experiment", dest="experiment", type="string", help="label of the experiment to run")
     parser.add_option("-p", "--param", dest="params", type="string", help="Set config values.  Semicolon-separated list of section.param=val")
     parser.add_option("-q", "--quiet", action="store_true", dest="quiet", help="suppress all output messages")
+    parser.add_option("-r", "--resume", dest="checkpoint", type="string",
+                      help="resume the experiment saved in this checkpoint file.  The configuration and seed are read from the checkpoint.")
     parser.add_option("-s", "--seed", dest="seed", type=int, default=0,
                       help="set random seed (default: use clock)")
     parser.add_option("-v", "--version", action="store_true", dest="version", help="display version information and quit")
@@ -81,10 +85,16 @@ def main():
     else:
         experiment_label = None
 
+    # Write buffered data files if the run is terminated
+    install_signal_handler()
+
     # Create the Experiment...
     try:
-        experiment = S.Experiment(configfile=cmd_options.configfile, seed=random_seed,
-                                  label=experiment_label)
+        if cmd_options.checkpoint:
+            experiment = S.Experiment(checkpoint=cmd_options.checkpoint)
+        else:
+            experiment = S.Experiment(configfile=cmd_options.configfile, seed=random_seed,
+                                      label=experiment_label)
     except SEEDSError as err:
         print("Error: %s" % err)
         sys.exit(1)
@@ -97,11 +107,10 @@ def main():
     if cmd_options.params != None:
         options = re.split("\s*;\s*", cmd_options.params)
         for opt in options:
-            # This is perhaps not the best regexp for comma-separated lists as values... need spaces.
-            m = re.match(r"(?P<section>[A-Za-z0-9:_]+)\.(?P<parameter>[A-Za-z0-9:_]+)\s*=\s*(?P<value>-?[A-Za-z0-9_\.\,]+)", opt)
-            if m != None:
-                experiment.config.set(m.group("section"), m.group("parameter"), m.group("value"))
-            else:
+            try:
+                (section, parameter, value) = parse_param(opt)
+                experiment.config.set(section, parameter, value)
+            except ParamStringFormatError:
                 print("Error: Could not parse parameter setting", opt)
 
     # Get the current configured list of plugin directories
@@ -132,7 +141,7 @@ def main():
     # Do the experiment...
     try:
         for epoch in experiment:
-            prog.update()
+            prog.update(epoch)
             if not cmd_options.quiet:
                 sys.stdout.write("%s\r" % prog)
                 sys.stdout.flush()
@@ -149,6 +158,9 @@ def main():
     if not cmd_options.quiet:
         print("")
 
+        if experiment.timer is not None:
+            sys.stdout.write(experiment.timer.summary())
+
 if __name__ == "__main__":
     main()
 
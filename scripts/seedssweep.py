@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script to run a SEEDS experiment many times, once for each combination of
+parameter settings and random seeds, using a pool of processes.  Each run
+writes its data to its own directory within the sweep directory, and a
+manifest (manifest.json) records the settings and status of each run.
+Running the script again with the same sweep directory skips runs that have
+already completed.  For more information, run with the --help argument.
+
+Parameter settings are given as with runseeds.  For example:
+
+    seedssweep.py -c rps.cfg -o sweep -r 10 -j 4 \\
+        -g "Population.mutation_rate=0.001|0.01|0.1" \\
+        -p "Experiment.epochs=100" -p "Experiment.epochs=1000"
+
+runs each of the 2 settings given with -p with each of the 3 mutation rates,
+and each of these with 10 seeds (60 runs in all).
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__version__ = "1.0.13"
+__credits__ = "Brian Connelly"
+
+import seeds as S
+from seeds.SEEDSError import *
+from seeds.utils.parsing import parse_param, parse_param_string
+from optparse import OptionParser
+
+import sys
+
+
+def parse_grid(s):
+    """Parse a grid setting of the form section.param=val1|val2|..."""
+    (setting, sep, values) = s.partition("=")
+    values = values.split("|")
+    for v in values:
+        parse_param("{s}={v}".format(s=setting, v=v))
+
+    (section, parameter, value) = parse_param("{s}={v}".format(s=setting, v=values[0]))
+    return (section, parameter, [v.strip() for v in values])
+
+def main():
+    parser = OptionParser('usage: %prog [options]')
+    parser.add_option("-c", "--config", dest="configfile", type="string", default="seeds.cfg",
+                      help="read config file (default: seeds.cfg)")
+    parser.add_option("-e", "--experiment", dest="experiment", type="string", help="label of the experiment to run")
+    parser.add_option("-g", "--grid", dest="grid", type="string", action="append", default=[],
+                      help="run each of the values given for a parameter.  section.param=val1|val2|...  May be repeated.")
+    parser.add_option("-j", "--processes", dest="processes", type=int, default=None,
+                      help="number of processes to use (default: number of CPUs)")
+    parser.add_option("-n", "--dry-run", action="store_true", dest="dryrun", help="list the runs to perform and quit")
+    parser.add_option("-o", "--sweep_dir", dest="sweepdir", type="string", default="sweep",
+                      help="write the manifest and data to this directory (default: sweep)")
+    parser.add_option("-p", "--param", dest="params", type="string", action="append", default=[],
+                      help="a set of config values to run.  Semicolon-separated list of section.param=val.  May be repeated.")
+    parser.add_option("-P", "--paramfile", dest="paramfile", type="string",
+                      help="read sets of config values from this file, one per line, as with -p")
+    parser.add_option("-q", "--quiet", action="store_true", dest="quiet", help="suppress all output messages")
+    parser.add_option("-r", "--replicates", dest="replicates", type=int, default=1,
+                      help="number of seeds with which to run each set of config values (default: 1)")
+    parser.add_option("-s", "--seed", dest="seed", type=int, default=1,
+                      help="first random seed.  Replicates use consecutive seeds. (default: 1)")
+    parser.add_option("-v", "--version", action="store_true", dest="version", help="display version information and quit")
+
+    (cmd_options, cmd_args) = parser.parse_args()
+
+    if cmd_options.version:
+        print("%s (SEEDS Version %s)" % (__version__, S.__version__))
+        sys.exit(0)
+
+    param_strings = list(cmd_options.params)
+    if cmd_options.paramfile:
+        with open(cmd_options.paramfile) as handle:
+            for line in handle:
+                line = line.strip()
+                if len(line) > 0 and not line.startswith("#"):
+                    param_strings.append(line)
+
+    # Sweep imports multiprocessing, so it is only imported when needed
+    from seeds.Sweep import Sweep
+
+    try:
+        param_sets = [parse_param_string(p) for p in param_strings]
+        grid = [parse_grid(g) for g in cmd_options.grid]
+        seeds = list(range(cmd_options.seed, cmd_options.seed + cmd_options.replicates))
+        sweep = Sweep(configfile=cmd_options.configfile,
+                      sweep_dir=cmd_options.sweepdir, grid=grid,
+                      param_sets=param_sets, seeds=seeds,
+                      label=cmd_options.experiment)
+    except SEEDSError as err:
+        print("Error: %s" % err)
+        sys.exit(1)
+
+    runs = sweep.runs()
+    remaining = [r for r in runs if not sweep.is_complete(r[0])]
+
+    if cmd_options.dryrun:
+        for (run_id, params, seed) in runs:
+            if sweep.is_complete(run_id):
+                status = "complete"
+            else:
+                status = "to run"
+            settings = ";".join("%s.%s=%s" % p for p in params)
+            print("%s\tseed=%d\t%s\t%s" % (run_id, seed, status, settings))
+        sys.exit(0)
+
+    if not cmd_options.quiet:
+        print("Sweep: %s (%d runs, %d complete)" % (sweep.sweep_dir, len(runs), len(runs) - len(remaining)))
+
+    def report(result):
+        if cmd_options.quiet:
+            return
+        if result['status'] == 'complete':
+            print("%s: complete (%.1f s)" % (result['run_id'], result['elapsed']))
+        else:
+            print("%s: failed: %s" % (result['run_id'], result['error']))
+
+    try:
+        results = sweep.run(processes=cmd_options.processes, callback=report)
+    except KeyboardInterrupt:
+        print("Interrupted.  Run again to resume.")
+        sys.exit(2)
+
+    failed = [r for r in results if r['status'] != 'complete']
+    if len(failed) > 0:
+        if not cmd_options.quiet:
+            print("%d of %d runs failed.  See %s for details." % (len(failed), len(results), sweep.manifest_file))
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
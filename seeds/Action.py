@@ -43,11 +43,25 @@ class Action(object):
         For Actions that write data files, whether or not to write a header
         row.  (Boolean, Default: True)
     
+    Actions that write data files should open them with open_writer.  Rows
+    written to these files are buffered by the Experiment's OutputManager,
+    which also closes the files at the end of the experiment.  Other slow work,
+    such as drawing images, can be given to the OutputManager's submit method
+    along with copies of the data it needs.  If the output_thread option is
+    enabled, this work is then done in the background.
+
+    Actions that keep state between epochs (e.g., data collected for a plot)
+    should list the attributes holding that state in checkpoint_fields, so
+    that they are saved when the Experiment is checkpointed (see
+    seeds.Checkpoint).
+
     Configuration: The data_dir parameter should be set in the [Experiment]
     block.  Each Action should have its own configuration block.
 
     """
 
+    checkpoint_fields = []
+
     def __init__(self, experiment, name=None, label=None):
         """Create an Action instance"""
         self.experiment = experiment
@@ -75,6 +89,30 @@ class Action(object):
         """Perform any necessary cleanup at the end of the experiment"""
         pass
 
+    def get_checkpoint(self):
+        """Get the state of the Action to be saved in a checkpoint.  This
+        includes whether or not the Action is enabled and the values of its
+        checkpoint_fields.
+        """
+
+        state = {'enabled': self.enabled}
+        for field in self.checkpoint_fields:
+            state[field] = getattr(self, field)
+        return state
+
+    def restore_checkpoint(self, state):
+        """Restore the state of the Action saved in a checkpoint
+
+        Parameters:
+
+        *state*
+            The state saved by get_checkpoint
+
+        """
+
+        for field in state:
+            setattr(self, field, state[field])
+
     def skip_update(self):
         """ Return a boolean indicating whether or not the action should be
         executed during the current epoch
@@ -96,6 +134,28 @@ class Action(object):
         """
         return os.path.join(self.data_dir, filename)
 
+    def open_writer(self, filename, fieldnames, header=None):
+        """ Open a data file in the data directory and return a
+        BufferedCSVWriter for writing rows to it
+
+        Parameters:
+
+        *filename*
+            The name of the file to write
+        *fieldnames*
+            A list of the names of the columns
+        *header*
+            Whether or not to write a header row (default: the Action's header
+            property)
+
+        """
+
+        if header is None:
+            header = self.header
+
+        return self.experiment.output.open_csv(self.datafile_path(filename),
+                                               fieldnames, header=header)
+
     def get_config_section(self):
         """ Return a string containing the configuration file section for this
         action.  This section is composed of <name>:<label>
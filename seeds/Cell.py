@@ -11,6 +11,7 @@ __credits__ = "Brian Connelly"
 import random
 
 from seeds.SEEDSError import *
+from seeds.StateStore import StateField
 
 
 class Cell(object):
@@ -46,7 +47,27 @@ class Cell(object):
         A unique label identifying this Cell's configuration
     neighbors
         A list of Cells with which this Cell interacts.  These are cells on
-        neighboring nodes in the topology.
+        neighboring nodes in the topology.  This list is kept by the Cell
+        unless the topology's cache_neighbors is False, in which case it is
+        found each time it is used.
+    state_fields
+        A dict mapping the names of any additional numeric per-cell fields to
+        their NumPy dtypes.  When the Population uses a StateStore, these
+        fields are allocated in the store and can be accessed with get_state
+        and set_state.
+    checkpoint_fields
+        A list of the names of any additional attributes of each Cell (e.g., a
+        genome) to be saved when the Experiment is checkpointed (see
+        seeds.Checkpoint).  The values of type, id, and state_fields are
+        always saved.
+
+    If the Population uses a StateStore (see Population), the type and id of
+    each Cell are kept in that store rather than in the Cell object itself.
+
+    Cells are updated by the Population through update_batch (asynchronous
+    updates), update_synchronous (synchronous updates), or rate and fire
+    (continuous-time updates).  By default, these call the update method of
+    the individual Cells.
 
     Configuration:
         Configuration options for each custom Cell object should be stored in a
@@ -58,6 +79,12 @@ class Cell(object):
     types = []
     type_colors = []
     max_types = 0
+    state_fields = {}
+    checkpoint_fields = []
+
+    type = StateField('type')
+    id = StateField('id')
+    _state_store = None
 
     def __init__(self, experiment, population, node, type=None, name=None, label=None):
         """Initialize a Cell object
@@ -82,8 +109,9 @@ class Cell(object):
 
         self.experiment = experiment
         self.population = population
-        self.id = self.population.get_cell_id()
         self.node = node
+        self._state_store = self.population.state
+        self.id = self.population.get_cell_id()
         self.name = name
         self.label = label
         self.type_colors = ['r','g','b','y','c', 'm', 'k']
@@ -101,7 +129,7 @@ class Cell(object):
         else:
             self.config_section = "{name}".format(name=self.name)
 
-        self.neighbors = []
+        self._neighbors = None
 
     def __str__(self):
         """Produce a string to be used when a Cell object is printed"""
@@ -109,15 +137,15 @@ class Cell(object):
 
     def add_neighbor(self, neighbor):
         """Make the given cell a neighbor"""
-        self.population.topology.add_edge(self.id, neighbor.id)
-        self.neighbors = self.get_neighbors()
-        neighbor.neighbors = neighbor.get_neighbors()
+        self.population.topology.add_edge(self.node, neighbor.node)
+        self.update_neighbors()
+        neighbor.update_neighbors()
 
     def remove_neighbor(self, neighbor):
         """Disconnect the Cell from the given Cell, making them no longer
         neighbors
         """
-        self.population.topology.remove_edge(self.id, neighbor.id)
+        self.population.topology.remove_edge(self.node, neighbor.node)
         self.update_neighbors()
         neighbor.update_neighbors()
 
@@ -125,21 +153,151 @@ class Cell(object):
         """Get a list of neighboring cells"""
         return self.population.get_neighbors(self)
 
+    @property
+    def neighbors(self):
+        """The list of neighboring cells"""
+        if self._neighbors is None:
+            return self.get_neighbors()
+        return self._neighbors
+
+    @neighbors.setter
+    def neighbors(self, neighbors):
+        self._neighbors = neighbors
+
     def update_neighbors(self):
-        """Update the list of neighboring cells"""
-        self.neighbors = self.get_neighbors()
+        """Update the list of neighboring cells.  If the topology does not
+        cache neighbors, the list is discarded instead.
+        """
+
+        if self.population.topology.cache_neighbors:
+            self._neighbors = self.get_neighbors()
+        else:
+            self._neighbors = None
 
     def update(self):
         """Update the Cell according to its update rules"""
         pass
 
+    def update_mean_field(self, frequencies):
+        """Update the Cell according to its update rules, but using the
+        frequency of each type in the Population in place of its neighbors.
+        This is called by the Population instead of update when the topology
+        uses the mean-field approximation (e.g., a WellMixedTopology with
+        mean_field enabled).  Cell types must define this to be used in that
+        way.
+
+        Parameters:
+
+        *frequencies*
+            A list of the fraction of the Population that is of each type,
+            indexed by type
+
+        """
+
+        raise ConfigurationError("{name} does not support mean-field updates".format(name=self.name))
+
+    def update_batch(self, nodes):
+        """Update the Cells residing on the given nodes, in order.  This is
+        called by the Population on a single Cell of the configured type, and
+        may update Cells anywhere in the Population.  Cell types that can
+        process many events at once (e.g., with NumPy operations on the
+        Population's StateStore) can override this method.  By default, the
+        update method of each Cell is called in turn.
+
+        Parameters:
+
+        *nodes*
+            A list of the IDs of the nodes whose Cells are to be updated.  A
+            node may appear more than once.
+
+        """
+
+        cells = self.population.cells
+        [cells[n].update() for n in nodes]
+
+    def rate(self):
+        """Get the rate (events per epoch) at which this Cell changes state.
+        This is used when the Population is updated in continuous time (the
+        gillespie update mode).  The rate should depend only on the state of
+        this Cell and its neighbors.  By default, each Cell is updated at a
+        rate of 1, which matches the asynchronous update mode.  Cell types
+        whose updates often leave the Cell unchanged can instead return the
+        rate of the updates that change it and implement those updates in
+        fire.
+        """
+
+        return 1.0
+
+    def fire(self):
+        """Perform one event for this Cell in the gillespie update mode.  The
+        Population calls this at the rate given by rate.  By default, this
+        calls update.
+        """
+
+        self.update()
+
+    def update_synchronous(self):
+        """Update every Cell in the Population at once.  This is called by
+        the Population on a single Cell of the configured type when the
+        synchronous update mode is used.  All Cells see the state of their
+        neighbors as it was at the beginning of the update.  By default, the
+        Population's StateStore is double buffered while the update method of
+        each Cell is called.  Cell types can override this method to update
+        all Cells using NumPy operations.
+        """
+
+        state = self.population.state
+        state.begin_step()
+        for c in self.population.cells:
+            if c is not None:
+                state.focus = c.node
+                c.update()
+        state.end_step()
+
     def teardown(self):
         """Perform any necessary cleanup at the end of the experiment"""
         pass
 
+    def get_state(self, field):
+        """Get the value of one of the Cell's state_fields
+
+        Parameters:
+
+        *field*
+            The name of the field
+
+        """
+
+        store = self._state_store
+        if store is None:
+            return self.__dict__.get(field, 0)
+        elif store.buffered and self.node == store.focus:
+            return store.back(field).item(self.node)
+        return store[field].item(self.node)
+
+    def set_state(self, field, value):
+        """Set the value of one of the Cell's state_fields
+
+        Parameters:
+
+        *field*
+            The name of the field
+        *value*
+            The value to store
+
+        """
+
+        if self._state_store is None:
+            self.__dict__[field] = value
+        elif self._state_store.buffered:
+            self._state_store.back(field)[self.node] = value
+        else:
+            self._state_store[field][self.node] = value
+            self._state_store.touch(field)
+
     def coords(self):
         """Get the coordinates of the Cell in space"""
-        return self.population.topology.graph.node[self.node]['coords']
+        return self.population.topology.get_coords(self.node)
 
     def get_neighbor_distance(self, neighbor):
         """Get the Cartesian distance to the given neighbor Cell"""
@@ -147,4 +305,4 @@ class Cell(object):
 
     def get_neighbor_distances(self):
         """Get an array of distances to all neighbors"""
-        return [self.get_neighbor_distance(n) for n in self.get_neighbors()]
+        return self.population.topology.get_neighbor_distances(self.node)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Save the state of a running Experiment to a checkpoint file so that it can be
+resumed later.
+
+A checkpoint holds the configuration, the epoch and time, the state of the
+random number generators (both the random module and the Experiment's NumPy
+RandomState), the Experiment's data, the state of the Population, Resources,
+Actions, and Timer, and the position of each open data file.  An Experiment resumed
+from a checkpoint produces the same results as one that was never stopped.
+Data files are truncated to the positions saved in the checkpoint, so any rows
+written after the checkpoint are replaced.
+
+To resume an Experiment, create it with the checkpoint parameter (or use the
+--resume option of runseeds).  The configuration, seed, and label are then
+taken from the checkpoint.  Each component is created as usual and then given
+its saved state through its restore_checkpoint method.  Cells, ResourceCells,
+and Actions can name any additional attributes to be saved in their
+checkpoint_fields.  Cells must not have been added to the Population after
+setup.
+
+Configuration: The following options can be set in the [Experiment] section.
+
+checkpoint_interval
+    The number of epochs between checkpoints.  If 0, no checkpoints are
+    written.  (default: 0)
+checkpoint_file
+    The name of the checkpoint file, which is written in the data directory
+    (default: checkpoint.dat)
+
+Checkpoint files start with 8 bytes 'SEEDSCKP' and a uint16 format version
+(little-endian), followed by the pickled state compressed with zlib.  The file
+is first written under a temporary name and then renamed, so an interrupted
+write never replaces the previous checkpoint with a partial one.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import os
+import random
+import struct
+import uuid
+import zlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import seeds
+from seeds.SEEDSError import *
+
+CHECKPOINT_MAGIC = b'SEEDSCKP'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('<8sH')
+
+
+def get_checkpoint(experiment):
+    """Get the state of an Experiment as a dict.  All buffered data is written
+    to the Experiment's data files first.
+
+    Parameters:
+
+    *experiment*
+        The Experiment
+
+    """
+
+    if experiment.rng is not None:
+        rng_state = experiment.rng.get_state()
+    else:
+        rng_state = None
+
+    if experiment.timer is not None:
+        timer_state = experiment.timer.get_checkpoint()
+    else:
+        timer_state = None
+
+    return {'seeds_version': seeds.__version__,
+            'label': experiment.label,
+            'seed': experiment.seed,
+            'uuid': str(experiment.uuid),
+            'epoch': experiment.epoch,
+            'time': experiment.time,
+            'proceed': experiment.proceed,
+            'configfile': experiment.config.filename,
+            'config': experiment.initial_config,
+            'random': random.getstate(),
+            'rng': rng_state,
+            'data': experiment.data,
+            'population': experiment.population.get_checkpoint(),
+            'resources': dict((name, experiment.resources[name].get_checkpoint())
+                              for name in experiment.resources),
+            'actions': [(a.name, a.label, a.get_checkpoint()) for a in experiment.actions],
+            'timer': timer_state,
+            'output': experiment.output.get_checkpoint()}
+
+def write_checkpoint(experiment, filename):
+    """Write the state of an Experiment to a checkpoint file.  Any existing
+    file is replaced.
+
+    Parameters:
+
+    *experiment*
+        The Experiment
+    *filename*
+        The name of the checkpoint file
+
+    """
+
+    state = get_checkpoint(experiment)
+    data = zlib.compress(pickle.dumps(state, 2))
+
+    tmpfile = filename + '.tmp'
+    with open(tmpfile, 'wb') as handle:
+        handle.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION))
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.rename(tmpfile, filename)
+
+def read_checkpoint(filename):
+    """Read the state of an Experiment from a checkpoint file
+
+    Parameters:
+
+    *filename*
+        The name of the checkpoint file
+
+    """
+
+    with open(filename, 'rb') as handle:
+        data = handle.read()
+
+    if len(data) < CHECKPOINT_HEADER.size:
+        raise CheckpointError("'{f}' is not a SEEDS checkpoint".format(f=filename))
+
+    (magic, version) = CHECKPOINT_HEADER.unpack_from(data, 0)
+    if magic != CHECKPOINT_MAGIC:
+        raise CheckpointError("'{f}' is not a SEEDS checkpoint".format(f=filename))
+    elif version != CHECKPOINT_VERSION:
+        raise CheckpointError("Checkpoint '{f}' has unsupported format version {v}".format(f=filename, v=version))
+
+    return pickle.loads(zlib.decompress(data[CHECKPOINT_HEADER.size:]))
+
+def restore_checkpoint(experiment, state):
+    """Give a newly set up Experiment the state saved in a checkpoint.  Data
+    files must already have been reopened by the Experiment's OutputManager.
+
+    Parameters:
+
+    *experiment*
+        The Experiment
+    *state*
+        The state read from a checkpoint (see read_checkpoint)
+
+    """
+
+    experiment.epoch = state['epoch']
+    experiment.time = state['time']
+    experiment.proceed = state['proceed']
+    experiment.uuid = uuid.UUID(state['uuid'])
+    experiment.data = state['data']
+
+    experiment.population.restore_checkpoint(state['population'])
+
+    if sorted(state['resources']) != sorted(experiment.resources):
+        raise CheckpointError("Checkpoint Resources do not match the Experiment")
+
+    for name in experiment.resources:
+        experiment.resources[name].restore_checkpoint(state['resources'][name])
+
+    actions = [(a.name, a.label) for a in experiment.actions]
+    if actions != [(name, label) for (name, label, s) in state['actions']]:
+        raise CheckpointError("Checkpoint Actions do not match the Experiment")
+
+    for (action, (name, label, s)) in zip(experiment.actions, state['actions']):
+        action.restore_checkpoint(s)
+
+    if experiment.timer is not None and state.get('timer') is not None:
+        experiment.timer.restore_checkpoint(state['timer'])
+
+    random.setstate(state['random'])
+    if experiment.rng is not None and state['rng'] is not None:
+        experiment.rng.set_state(state['rng'])
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+Find clusters of connected Cells that have the same type.
+
+label_type_clusters finds these clusters from scratch.  A ClusterTracker keeps
+them up to date as Cells change type.  Changes are reported to the tracker by
+the Population (see Population.update_type_count), and only the clusters
+around Cells that changed are examined.  When only a small fraction of Cells
+change type each epoch, this is much faster than finding all clusters again.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+from collections import deque
+from itertools import count
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from seeds.SEEDSError import *
+from seeds.utils.graphs import UnionFind, label_components
+
+
+def label_type_clusters(population):
+    """Label the clusters of connected Cells of the same type in a Population.
+    The result is a tuple (nodes, labels, types), where labels gives the
+    cluster of each node in nodes and types gives the type of its Cell.
+    Clusters are numbered 0, 1, 2, ...
+
+    If NumPy is available and the topology has static neighbors, clusters are
+    labeled using the topology's adjacency, keeping only the edges between
+    Cells of the same type, and the results are arrays.  Otherwise, a
+    UnionFind is built from the edges of the graph, and the results are lists.
+
+    Parameters:
+
+    *population*
+        The Population whose Cells to cluster
+
+    """
+
+    topology = population.topology
+    cells = population.cells
+    nodes = topology.nodes()
+
+    if np is not None and topology.static_neighbors:
+        (indptr, indices) = topology.get_adjacency()
+        nodes = np.array(nodes, dtype=np.int64)
+
+        types = np.empty(len(indptr) - 1, dtype=np.int64)
+        types.fill(-1)
+        if population.state is not None:
+            types[nodes] = population.state['type'][nodes]
+        else:
+            types[nodes] = [cells[n].type for n in nodes]
+
+        rows = np.repeat(np.arange(len(types)), np.diff(indptr))
+        labels = label_components(indptr, indices,
+                                  edge_mask=types[rows] == types[indices])
+
+        # Renumber so that only the given nodes' clusters are counted
+        (unused, labels) = np.unique(labels[nodes], return_inverse=True)
+        return (nodes, labels, types[nodes])
+
+    clusters = UnionFind(nodes)
+    for (a, b) in topology.edges():
+        if cells[a].type == cells[b].type:
+            clusters.union(a, b)
+
+    numbers = {}
+    labels = [numbers.setdefault(clusters.find(n), len(numbers)) for n in nodes]
+    types = [cells[n].type for n in nodes]
+    return (nodes, labels, types)
+
+
+class ClusterTracker(object):
+    """Keep track of the clusters of connected Cells of the same type as
+    Cells change type
+
+    A ClusterTracker registers itself with the Population's type_listeners.
+    Nodes whose Cells change type are recorded, and clusters are updated the
+    next time they are requested.  When a Cell changes type, it is removed
+    from its old cluster and joined to any neighboring clusters of its new
+    type.  If removing the Cell may split its old cluster, searches are run
+    from each of its neighbors in that cluster in turn until they meet, so
+    that only the smaller pieces of a split are visited.
+
+    If a type change is reported without its node, the Cells or the topology
+    are otherwise changed, or many Cells changed type, the clusters are found
+    again from scratch.  The topology must have static neighbors.
+
+    Properties:
+
+    population
+        The Population whose Cells are tracked
+    labels
+        A dict mapping each node to the label of its cluster
+    members
+        A dict mapping the label of each cluster to the set of its nodes
+    cluster_types
+        A dict mapping the label of each cluster to the type of its Cells
+    types
+        A dict mapping each node to the type of its Cell when the clusters
+        were last updated
+    pending
+        A set of nodes whose Cells may have changed type since the clusters
+        were last updated, or None if the clusters must be found again
+
+    """
+
+    def __init__(self, population, rebuild_fraction=0.25):
+        """Initialize a ClusterTracker object
+
+        Parameters:
+
+        *population*
+            The Population whose Cells to track
+        *rebuild_fraction*
+            If more than this fraction of nodes changed type since the clusters
+            were last updated, the clusters are found again from scratch
+            (default: 0.25)
+
+        """
+
+        if not population.topology.static_neighbors:
+            raise ConfigurationError("ClusterTracker requires a topology with static neighbors")
+
+        self.population = population
+        self.rebuild_fraction = rebuild_fraction
+        self.labels = {}
+        self.members = {}
+        self.cluster_types = {}
+        self.types = {}
+        self.pending = None
+        self._stats = {}
+        self._new_label = count(0)
+
+        population.type_listeners.append(self)
+
+    def __str__(self):
+        """Produce a string to be used when a ClusterTracker object is printed"""
+        return "ClusterTracker [Clusters: {c}]".format(c=len(self.members))
+
+    def type_changed(self, node=None):
+        """Record that the Cell in the given node changed type
+
+        Parameters:
+
+        *node*
+            The ID of the node.  If None, the clusters will be found again.
+
+        """
+
+        if node is None:
+            self.pending = None
+        elif self.pending is not None:
+            self.pending.add(node)
+
+    def types_changed(self, nodes=None):
+        """Record that the Cells in the given nodes changed type
+
+        Parameters:
+
+        *nodes*
+            A list or array of node IDs.  If None, the clusters will be found
+            again.
+
+        """
+
+        if nodes is None:
+            self.pending = None
+        elif self.pending is not None:
+            if hasattr(nodes, 'tolist'):
+                nodes = nodes.tolist()
+            self.pending.update(nodes)
+
+    def topology_changed(self):
+        """Record that Cells or edges were added or removed"""
+        self.pending = None
+
+    def detach(self):
+        """Stop tracking changes to the Population"""
+        self.population.type_listeners.remove(self)
+
+    def rebuild(self):
+        """Find all clusters from scratch"""
+        (nodes, labels, types) = label_type_clusters(self.population)
+        if hasattr(nodes, 'tolist'):
+            (nodes, labels, types) = (nodes.tolist(), labels.tolist(), types.tolist())
+
+        self.labels = dict(zip(nodes, labels))
+        self.types = dict(zip(nodes, types))
+        self.members = {}
+        self.cluster_types = {}
+        for (n, label, type) in zip(nodes, labels, types):
+            self.members.setdefault(label, set()).add(n)
+            self.cluster_types[label] = type
+
+        self._new_label = count(len(self.members))
+        self._stats = {}
+        for label in self.members:
+            self._add_stats(label)
+
+        self.pending = set()
+
+    def refresh(self):
+        """Update the clusters to reflect any changes in Cell type"""
+        if self.pending is not None and \
+                len(self.pending) > self.rebuild_fraction * len(self.labels):
+            self.pending = None
+
+        if self.pending is None:
+            self.rebuild()
+            return
+
+        cells = self.population.cells
+        pending = self.pending
+        self.pending = set()
+
+        for node in pending:
+            newtype = cells[node].type
+            if newtype != self.types[node]:
+                self._remove(node)
+                self.types[node] = newtype
+                self._add(node)
+
+    def stats(self, type=None):
+        """Get the number of clusters and the mean and standard deviation of
+        their sizes.  The result is a tuple (count, mean, std).  If there are
+        no clusters, the mean and standard deviation are 0.
+
+        Parameters:
+
+        *type*
+            The Cell type whose clusters to describe.  If None, all clusters
+            are described.  (default: None)
+
+        """
+
+        self.refresh()
+
+        if type is None:
+            num = sum(s[0] for s in self._stats.values())
+            total = sum(s[1] for s in self._stats.values())
+            sumsq = sum(s[2] for s in self._stats.values())
+        else:
+            (num, total, sumsq) = self._stats.get(type, (0, 0, 0))
+
+        if num == 0:
+            return (0, 0, 0)
+
+        return (num, float(total) / num, (num * sumsq - total * total)**0.5 / num)
+
+    def _add_stats(self, label, sign=1):
+        """Add (or with sign=-1, remove) a cluster to the size statistics"""
+        size = len(self.members[label])
+        s = self._stats.setdefault(self.cluster_types[label], [0, 0, 0])
+        s[0] += sign
+        s[1] += sign * size
+        s[2] += sign * size * size
+
+    def _neighbors(self, node):
+        """Get the nodes connected to a node in the topology.  For
+        topologies without static neighbors, these are read from the graph.
+        """
+
+        topology = self.population.topology
+        if topology.static_neighbors:
+            return topology.get_neighbors(node)
+        return topology.graph.adj[node]
+
+    def _same_cluster_neighbors(self, node, label):
+        """Get the neighbors of a node that are in the given cluster"""
+        labels = self.labels
+        return [n for n in self._neighbors(node)
+                if n != node and labels.get(n) == label]
+
+    def _remove(self, node):
+        """Remove a node from its cluster, splitting the cluster if needed"""
+        label = self.labels.pop(node)
+        self._add_stats(label, sign=-1)
+        self.members[label].discard(node)
+
+        if len(self.members[label]) == 0:
+            del self.members[label]
+            del self.cluster_types[label]
+            return
+
+        starts = self._same_cluster_neighbors(node, label)
+        if len(starts) > 1:
+            self._split(label, starts)
+        self._add_stats(label)
+
+    def _split(self, label, starts):
+        """Find the pieces of a cluster after a node was removed by searching
+        from each of the given neighbors of that node.  Searches that meet are
+        merged.  Once only one search remains, every other search has found a
+        separate piece, which is given a new label.
+        """
+
+        labels = self.labels
+
+        owner = {}
+        merged = {}
+        searches = {}
+        for (i, n) in enumerate(starts):
+            if n not in owner:
+                owner[n] = i
+                searches[i] = (set([n]), deque([n]))
+
+        def find(i):
+            while i in merged:
+                i = merged[i]
+            return i
+
+        pieces = []
+        while len(searches) > 1:
+            for i in list(searches):
+                if i not in searches:
+                    continue
+                if len(searches) == 1:
+                    break
+
+                (visited, queue) = searches[i]
+                if len(queue) == 0:
+                    pieces.append(visited)
+                    del searches[i]
+                    continue
+
+                n = queue.popleft()
+                for m in self._neighbors(n):
+                    if labels.get(m) != label:
+                        continue
+
+                    j = owner.get(m)
+                    if j is None:
+                        owner[m] = i
+                        visited.add(m)
+                        queue.append(m)
+                        continue
+
+                    j = find(j)
+                    if j != i:
+                        # Merge the smaller search into the larger
+                        if len(searches[j][0]) > len(visited):
+                            (i, j) = (j, i)
+                        searches[i][0].update(searches[j][0])
+                        searches[i][1].extend(searches[j][1])
+                        merged[j] = i
+                        del searches[j]
+                        (visited, queue) = searches[i]
+
+        for piece in pieces:
+            new_label = next(self._new_label)
+            self.members[label] -= piece
+            self.members[new_label] = piece
+            self.cluster_types[new_label] = self.cluster_types[label]
+            for n in piece:
+                labels[n] = new_label
+            self._add_stats(new_label)
+
+    def _add(self, node):
+        """Add a node to the clusters of its neighbors that have the same
+        type, merging them if there are several
+        """
+
+        type = self.types[node]
+        neighbor_labels = set(self.labels[n] for n in self._neighbors(node)
+                              if n != node and n in self.labels and self.types[n] == type)
+
+        if len(neighbor_labels) == 0:
+            label = next(self._new_label)
+            self.members[label] = set([node])
+            self.cluster_types[label] = type
+            self.labels[node] = label
+            self._add_stats(label)
+            return
+
+        # Relabel the smaller clusters as part of the largest
+        label = max(neighbor_labels, key=lambda l: len(self.members[l]))
+        self._add_stats(label, sign=-1)
+        for other in neighbor_labels:
+            if other != label:
+                self._add_stats(other, sign=-1)
+                for n in self.members[other]:
+                    self.labels[n] = label
+                self.members[label].update(self.members.pop(other))
+                del self.cluster_types[other]
+
+        self.members[label].add(node)
+        self.labels[node] = label
+        self._add_stats(label)
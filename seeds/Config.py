@@ -27,9 +27,18 @@ else:
 
 import seeds as S
 
+# A marker for values not yet cached
+_MISSING = object()
+
 class Config(object):
     """A Config object contains the configuration for an experiment.  The
     values in a configuration can be queried and also updated.
+
+    Values are parsed the first time they are read and cached by section,
+    name, and type, so repeated reads (e.g., once per epoch) cost only a
+    dictionary lookup.  Changing a value with set discards all cached values,
+    since other values may depend on it through interpolation (e.g.,
+    %(size)s) or the DEFAULT section.
     
     """
 
@@ -57,22 +66,31 @@ class Config(object):
             self.config = ConfigParser.SafeConfigParser()
 
         self.config.optionxform = str
-        self.filename = os.path.abspath(filename)
+        self._cache = {}
+        self.filename = None
 
         if filename != None:
+            self.filename = os.path.abspath(filename)
             self.config.read(filename)
 
+        self._find_resource_sections()
+
+    def _find_resource_sections(self):
         self.resource_sections = []
         for sec in self.config.sections():
             match = re.match("Resource:([a-zA-Z_]+)", sec)
             if match != None:
                 self.resource_sections.append(sec)
 
-    def get(self, section, name, default=None):
-        """Get a configured value for a variable
+    def _get(self, kind, parse, section, name, default):
+        """Get a configured value, using the cache if possible
 
         Parameters:
 
+        *kind*
+            The type of value being read (used as part of the cache key)
+        *parse*
+            The ConfigParser method used to read and convert the value
         *section*
             The section under which the variable is defined
         *name*
@@ -82,8 +100,13 @@ class Config(object):
 
         """
 
+        key = (kind, section, name)
+        val = self._cache.get(key, _MISSING)
+        if val is not _MISSING:
+            return val
+
         try:
-            val = self.config.get(section, name)
+            val = parse(section, name)
         except NO_SECTION_ERROR:
             self.config.add_section(section)
             self.config.set(section, name, str(default))
@@ -91,8 +114,26 @@ class Config(object):
         except NO_OPTION_ERROR:
             self.config.set(section, name, str(default))
             val = default
+
+        self._cache[key] = val
         return val
 
+    def get(self, section, name, default=None):
+        """Get a configured value for a variable
+
+        Parameters:
+
+        *section*
+            The section under which the variable is defined
+        *name*
+            The name of the variable
+        *default*
+            The value to use should the variable not be defined
+
+        """
+
+        return self._get('str', self.config.get, section, name, default)
+
     def getint(self, section, name, default=None):
         """Get a configured integer value for a variable
 
@@ -107,16 +148,7 @@ class Config(object):
 
         """
 
-        try:
-            val = self.config.getint(section, name)
-        except NO_SECTION_ERROR:
-            self.config.add_section(section)
-            self.config.set(section, name, str(default))
-            val = default
-        except NO_OPTION_ERROR:
-            self.config.set(section, name, str(default))
-            val = default
-        return val
+        return self._get('int', self.config.getint, section, name, default)
 
     def getfloat(self, section, name, default=None):
         """Get a configured floating point value for a variable
@@ -132,16 +164,7 @@ class Config(object):
 
         """
 
-        try:
-            val = self.config.getfloat(section, name)
-        except NO_SECTION_ERROR:
-            self.config.add_section(section)
-            self.config.set(section, name, str(default))
-            val = default
-        except NO_OPTION_ERROR:
-            self.config.set(section, name, str(default))
-            val = default
-        return val
+        return self._get('float', self.config.getfloat, section, name, default)
 
     def getboolean(self, section, name, default=None):
         """Get a configured boolean value for a variable
@@ -157,16 +180,7 @@ class Config(object):
 
         """
 
-        try:
-            val = self.config.getboolean(section, name)
-        except NO_SECTION_ERROR:
-            self.config.add_section(section)
-            self.config.set(section, name, str(default))
-            val = default
-        except NO_OPTION_ERROR:
-            self.config.set(section, name, str(default))
-            val = default
-        return val
+        return self._get('boolean', self.config.getboolean, section, name, default)
 
     def set(self, section, name, value):
         """Set the value for a given variable
@@ -181,7 +195,15 @@ class Config(object):
         """
 
         val = self.config.set(section, name, str(value))
+        self.invalidate()
         return val
+
+    def invalidate(self):
+        """Discard all cached values.  This should be called by any code that
+        changes the underlying ConfigParser directly rather than through set.
+        """
+
+        self._cache.clear()
         
     def items(self, section):
         """Get a list of (name,value) pairs for all items in a section
@@ -196,6 +218,36 @@ class Config(object):
         val = self.config.items(section)
         return val
 
+    def dump(self):
+        """Get all of the values stored in the Config object, without
+        interpolation, as a list of (section, [(name, value), ...]) tuples
+        """
+
+        return [(sec, self.config.items(sec, raw=True)) for sec in self.config.sections()]
+
+    def load(self, sections):
+        """Replace all of the values stored in the Config object with those
+        given
+
+        Parameters:
+
+        *sections*
+            A list of (section, [(name, value), ...]) tuples, as produced by
+            dump
+
+        """
+
+        for sec in self.config.sections():
+            self.config.remove_section(sec)
+
+        for (sec, items) in sections:
+            self.config.add_section(sec)
+            for (name, value) in items:
+                self.config.set(sec, name, value)
+
+        self.invalidate()
+        self._find_resource_sections()
+
     def has_section(self, secname):
         """See if the given section name is defined"""
         return self.config.has_section(secname)
@@ -15,13 +15,21 @@ import sys
 import time
 import uuid
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 import seeds
 from seeds.Cell import *
+from seeds.Checkpoint import read_checkpoint, restore_checkpoint, write_checkpoint
 from seeds.Config import *
+from seeds.OutputManager import OutputManager
 from seeds.PluginManager import *
 from seeds.Population import *
 from seeds.Resource import *
 from seeds.SEEDSError import *
+from seeds.Timing import Timer, clock
 from seeds.Topology import *
 
 from seeds.utils.parsing import parse_version_string
@@ -46,6 +54,10 @@ class Experiment(object):
         is needed.
     epoch
         An integer storing the current epoch (unit of time)
+    time
+        A float storing the current time.  This is equal to epoch except while
+        the Population is being updated in continuous time (see the gillespie
+        update mode in Population), when it advances by fractions of an epoch.
     plugin_manager
         A PluginManager object which manages all Plugins for the experiment
     population
@@ -53,6 +65,12 @@ class Experiment(object):
         and their interactions
     proceed
         Boolean value indicating whether or not the experiment should continue.
+    rng
+        A NumPy RandomState seeded with the experiment's seed.  This should be
+        used by any code that draws random numbers with NumPy.  If NumPy is not
+        available, this is None.
+    output
+        An OutputManager that owns the data files written by Actions
     resources
         A hash of available resources.  The key is the name of the resource,
         and the value is a Resource object.
@@ -63,10 +81,23 @@ class Experiment(object):
     config_section
         The section of the config file in which to find settings for this
         Experiment
+    initial_config
+        The configuration as it was when the Experiment was set up (see
+        Config.dump), before default values were added to it.  This is the
+        configuration saved in checkpoints.
+    checkpoint_interval
+        The number of epochs between checkpoints, or 0 if checkpoints are not
+        written (see seeds.Checkpoint)
+    checkpoint_file
+        The path of the checkpoint file
+    timer
+        If the timing option is enabled, a Timer that records the time taken
+        by each phase of every epoch (see seeds.Timing).  Otherwise, this is
+        None.
 
     """
 
-    def __init__(self, configfile=None, seed=-1, label=None):
+    def __init__(self, configfile=None, seed=-1, label=None, checkpoint=None):
         """Initialize a Experiment object
 
         Parameters:
@@ -84,11 +115,28 @@ class Experiment(object):
             By default, Experiment will look for settings in the [Experiment]
             section of the config file.  If a label is specified, it will look
             in [Experiment:label].
+        *checkpoint*
+            Name of a checkpoint file from which to resume an experiment (see
+            seeds.Checkpoint).  If given, the configuration, seed, and label
+            are those saved in the checkpoint, and configfile, seed, and label
+            are ignored.  The saved state is restored during setup.
 
         """
 
+        self._resume = None
+        if checkpoint:
+            self._resume = read_checkpoint(checkpoint)
+            configfile = None
+            seed = self._resume['seed']
+            label = self._resume['label']
+
         self.config = Config(experiment=self, filename=configfile)
+        if self._resume is not None:
+            self.config.load(self._resume['config'])
+            self.config.filename = self._resume['configfile']
+
         self.epoch = 0
+        self.time = 0.0
         self.is_setup = False
         self.proceed = True
         self.seed = seed
@@ -117,6 +165,9 @@ class Experiment(object):
 
     def setup(self):
         """Set up the Experiment including its Population, Resources, and Actions"""
+        setup_start = clock()
+        self.initial_config = self.config.dump()
+
         if self.seed == -1:
             configseed = self.config.getint(self.config_section, "seed", default=-1)
             if configseed != -1:
@@ -127,6 +178,11 @@ class Experiment(object):
         random.seed(self.seed)
         self.config.set(self.config_section, 'seed', self.seed)
 
+        if np is not None:
+            self.rng = np.random.RandomState(self.seed % 2**32)
+        else:
+            self.rng = None
+
         self.experiment_epochs = self.config.getint(self.config_section, 'epochs',
                                                     default=-1)
 
@@ -137,12 +193,31 @@ class Experiment(object):
                                    name='data_dir',
                                    default='data')
 
-        if os.path.exists(data_dir):
-            newname = data_dir + '-' + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-            shutil.move(data_dir, newname)
-
-        os.mkdir(data_dir)
+        # When resuming from a checkpoint, the existing data directory is used
+        # and its files are continued
+        if self._resume is None:
+            if os.path.exists(data_dir):
+                newname = data_dir + '-' + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+                shutil.move(data_dir, newname)
 
+            os.mkdir(data_dir)
+            self.output = OutputManager(self)
+        else:
+            if not os.path.exists(data_dir):
+                os.mkdir(data_dir)
+            self.output = OutputManager(self, resume=self._resume['output'])
+
+        self.timer = None
+        if self.config.getboolean(self.config_section, 'timing', default=False):
+            self.timer = Timer(self)
+
+        self.checkpoint_interval = self.config.getint(self.config_section,
+                                                      'checkpoint_interval',
+                                                      default=0)
+        self.checkpoint_file = os.path.join(data_dir,
+                                            self.config.get(self.config_section,
+                                                            'checkpoint_file',
+                                                            default='checkpoint.dat'))
 
         # Create a plugin manager.  Append the system-wide plugins
         # to the list of plugin sources.
@@ -208,6 +283,13 @@ class Experiment(object):
                 a = oref(self, label=label)
                 self.add_action(a)
 
+        if self._resume is not None:
+            restore_checkpoint(self, self._resume)
+            self._resume = None
+
+        if self.timer is not None:
+            self.timer.record('setup', clock() - setup_start)
+
         self.is_setup = True
 
     def update(self):
@@ -215,16 +297,54 @@ class Experiment(object):
         if not self.is_setup:
             self.setup()
 
-        [a.update() for a in self.actions]
-        [self.resources[res].update() for res in self.resources]
-        self.population.update()
+        timer = self.timer
+        if timer is None:
+            [a.update() for a in self.actions]
+            [self.resources[res].update() for res in self.resources]
+            self.population.update()
+        else:
+            started = timer.begin_epoch()
+            timer.update()
+
         self.epoch += 1
+        self.time = float(self.epoch)
+
+        if timer is None:
+            self.output.update()
+        else:
+            timer.run('output', self.output.update)
 
         # If we've surpassed the configured number of epochs to run for, set
         # proceed to false
         if self.experiment_epochs != -1 and self.epoch >= self.experiment_epochs:
             self.proceed = False
 
+        if self.checkpoint_interval > 0 and self.epoch % self.checkpoint_interval == 0:
+            if timer is None:
+                self.write_checkpoint()
+            else:
+                timer.run('checkpoint', self.write_checkpoint)
+
+        if timer is not None:
+            timer.end_epoch(started)
+
+    def write_checkpoint(self, filename=None):
+        """Save the state of the Experiment so that it can be resumed later
+        (see seeds.Checkpoint)
+
+        Parameters:
+
+        *filename*
+            The name of the checkpoint file (default: the configured
+            checkpoint_file)
+
+        """
+
+        if filename is None:
+            filename = self.checkpoint_file
+
+        write_checkpoint(self, filename)
+
     def __iter__(self):
         """Experiment is an iterator, so it can be used with commands such as
 
@@ -259,6 +379,9 @@ class Experiment(object):
         [a.teardown() for a in self.actions]
         [self.resources[res].teardown() for res in self.resources]
         self.population.teardown()
+        if self.timer is not None:
+            self.timer.teardown()
+        self.output.close()
 
     def is_resource_defined(self, name):
         """Helper function to determine whether a given resource has been
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+A GenomeStore keeps a fixed-length bit string genome for every node in a
+topology (e.g., the genotype of each Cell in a Population) in a single NumPy
+matrix indexed by node ID.
+
+Each genome is packed 64 bits to a word, so a genome of L sites takes L/8
+bytes rather than a list of L Python integers.  Mutations are applied by
+drawing the number of sites to flip from a binomial distribution and XORing a
+mask into the genome, so their cost depends on the number of sites flipped
+rather than the length of the genome.  The number of 1s in each genome is
+kept up to date as genomes change, as is the fitness of each genome if a
+fitness function is given.  The fitnesses of many genomes (e.g., those of a
+Cell's neighbors) can then be read at once.
+
+GenomeStores require NumPy.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from seeds.SEEDSError import *
+from seeds.utils.numeric import require_numpy
+
+WORD_BITS = 64
+
+# The number of 1s in each possible byte
+if np is not None:
+    BYTE_ONES = np.array([bin(b).count('1') for b in range(256)], dtype=np.int64)
+
+
+class GenomeStore(object):
+    """Store bit string genomes in a packed matrix
+
+    Properties:
+
+    size
+        The number of genomes stored.  Since node IDs are used as indices,
+        this is one more than the largest node ID.
+    length
+        The number of sites (bits) in each genome
+    words
+        A matrix of unsigned 64-bit integers with one row per node.  Site i of
+        a genome is bit i % 64 of word i // 64.
+    ones
+        An array giving the number of sites set to 1 in each genome
+    fitness
+        An array giving the fitness of each genome, as calculated by
+        fitness_function.  If no fitness function is given, fitnesses are 0.
+    fitness_function
+        A function that is given the GenomeStore and an array of nodes and
+        returns an array of the fitnesses of the genomes on those nodes.  It
+        is called whenever genomes change, so fitnesses are calculated once
+        for each new genome.
+
+    """
+
+    def __init__(self, size, length, fitness_function=None):
+        """Initialize a GenomeStore object.  All genomes are initially 0.
+
+        Parameters:
+
+        *size*
+            The number of nodes for which to store genomes
+        *length*
+            The number of sites in each genome
+        *fitness_function*
+            A function giving the fitness of genomes (see fitness_function)
+
+        """
+
+        require_numpy("GenomeStore")
+
+        if length < 1:
+            raise SEEDSError("GenomeStore: Genome length must be positive")
+
+        self.size = size
+        self.length = length
+        self.num_words = (length + WORD_BITS - 1) // WORD_BITS
+        self.fitness_function = fitness_function
+
+        # The bits of the last word that hold sites
+        tail = length - WORD_BITS * (self.num_words - 1)
+        self._tail_mask = np.uint64((1 << tail) - 1)
+
+        self.words = np.zeros((size, self.num_words), dtype=np.uint64)
+        self.ones = np.zeros(size, dtype=np.int64)
+        self.fitness = np.zeros(size, dtype=np.float64)
+
+    def __str__(self):
+        """Produce a string to be used when a GenomeStore object is printed"""
+        return "GenomeStore [Size: {size}][Length: {length}]".format(size=self.size, length=self.length)
+
+    def resize(self, size):
+        """Change the number of nodes for which genomes are stored.  When
+        growing, new genomes are 0.
+
+        Parameters:
+
+        *size*
+            The new size of the store
+
+        """
+
+        n = min(size, self.size)
+
+        words = np.zeros((size, self.num_words), dtype=np.uint64)
+        words[:n] = self.words[:n]
+        self.words = words
+
+        ones = np.zeros(size, dtype=np.int64)
+        ones[:n] = self.ones[:n]
+        self.ones = ones
+
+        fitness = np.zeros(size, dtype=np.float64)
+        fitness[:n] = self.fitness[:n]
+        self.fitness = fitness
+
+        self.size = size
+
+    def ensure_node(self, node):
+        """Make sure that the store is large enough to hold the given node.
+        Capacity is doubled as needed so that repeatedly adding nodes does not
+        copy the matrix each time.
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        if node >= self.size:
+            self.resize(max(node + 1, 2 * self.size))
+
+    def changed(self, nodes):
+        """Recalculate the number of 1s and the fitness of the genomes on the
+        given nodes.  This should be called after writing to words directly.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        self.ones[nodes] = BYTE_ONES[self.words[nodes].view(np.uint8)].sum(axis=-1)
+        if self.fitness_function is not None:
+            self.fitness[nodes] = self.fitness_function(self, nodes)
+
+    def get_bits(self, node):
+        """Get the genome on the given node as a list of 0s and 1s
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        bits = np.unpackbits(self.words[node].view(np.uint8))
+        # unpackbits orders the bits of each byte from most significant
+        return bits.reshape(-1, 8)[:, ::-1].ravel()[:self.length].tolist()
+
+    def set_bits(self, node, bits):
+        """Set the genome on the given node from a sequence of 0s and 1s
+
+        Parameters:
+
+        *node*
+            The ID of the node
+        *bits*
+            A sequence of length values, each 0 or 1
+
+        """
+
+        if len(bits) != self.length:
+            raise SEEDSError("GenomeStore: Genome has {n} sites, expected {l}".format(n=len(bits), l=self.length))
+
+        padded = np.zeros(self.num_words * WORD_BITS, dtype=np.uint8)
+        padded[:self.length] = np.asarray(bits, dtype=np.uint8) != 0
+        packed = np.packbits(padded.reshape(-1, 8)[:, ::-1])
+        self.words[node] = packed.view(np.uint64)
+        self.changed([node])
+
+    def get_site(self, nodes, site):
+        """Get the value of one site of the genomes on the given nodes
+
+        Parameters:
+
+        *nodes*
+            A node ID or an array of node IDs
+        *site*
+            The index of the site
+
+        """
+
+        word = self.words[nodes, site // WORD_BITS]
+        return ((word >> np.uint64(site % WORD_BITS)) & np.uint64(1)).astype(np.int64)
+
+    def set_site(self, nodes, site, value):
+        """Set one site of the genomes on the given nodes to 0 or 1
+
+        Parameters:
+
+        *nodes*
+            A node ID or an array of node IDs
+        *site*
+            The index of the site
+        *value*
+            The value to set (0 or 1)
+
+        """
+
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int64))
+        bit = np.uint64(1 << (site % WORD_BITS))
+        if value:
+            self.words[nodes, site // WORD_BITS] |= bit
+        else:
+            self.words[nodes, site // WORD_BITS] &= ~bit
+        self.changed(nodes)
+
+    def randomize(self, nodes, rng):
+        """Give the given nodes random genomes, where each site is equally
+        likely to be 0 or 1
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+        *rng*
+            The NumPy RandomState to use
+
+        """
+
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int64))
+        words = rng.randint(0, 2**WORD_BITS, size=(len(nodes), self.num_words),
+                            dtype=np.uint64)
+        words[:, -1] &= self._tail_mask
+        self.words[nodes] = words
+        self.changed(nodes)
+
+    def copy(self, dest, src):
+        """Copy genomes from one set of nodes to another
+
+        Parameters:
+
+        *dest*
+            A node ID or an array of the IDs of the nodes to copy to
+        *src*
+            A node ID or an array of the IDs of the nodes to copy from
+
+        """
+
+        self.words[dest] = self.words[src]
+        self.ones[dest] = self.ones[src]
+        self.fitness[dest] = self.fitness[src]
+
+    def mutate(self, nodes, rate, rng):
+        """Mutate the genomes on the given nodes.  Each site of each genome
+        is flipped with the given probability.  The number of sites flipped in
+        each genome is drawn from a binomial distribution, and that many
+        distinct sites are chosen at random.  If a node is given more than
+        once, its genome is mutated once for each time it appears.  The result
+        is the number of sites flipped in each genome.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+        *rate*
+            The probability that each site is flipped
+        *rng*
+            The NumPy RandomState to use
+
+        """
+
+        nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int64))
+
+        if len(nodes) == 1:
+            # A single genome (e.g., one offspring) is mutated site by site,
+            # which avoids the overhead of building arrays of sites
+            count = rng.binomial(self.length, rate)
+            if count > 0:
+                sites = set()
+                while len(sites) < count:
+                    sites.update(rng.randint(0, self.length, size=count - len(sites)).tolist())
+                row = self.words[nodes[0]]
+                if count <= WORD_BITS // 8:
+                    for site in sites:
+                        row[site // WORD_BITS] ^= np.uint64(1 << (site % WORD_BITS))
+                else:
+                    sites = np.fromiter(sites, dtype=np.int64, count=count)
+                    masks = np.left_shift(np.uint64(1), (sites % WORD_BITS).astype(np.uint64))
+                    np.bitwise_xor.at(row, sites // WORD_BITS, masks)
+                self.changed(nodes)
+            return np.array([count], dtype=np.int64)
+
+        counts = rng.binomial(self.length, rate, size=len(nodes))
+        total = counts.sum()
+        if total == 0:
+            return counts
+
+        # Choose the sites to flip in each genome, redrawing any that were
+        # chosen more than once for the same genome
+        rows = np.repeat(np.arange(len(nodes), dtype=np.int64), counts)
+        sites = rng.randint(0, self.length, size=total)
+        while True:
+            keys = np.unique(rows * self.length + sites)
+            if len(keys) == total:
+                break
+            short = counts - np.bincount(keys // self.length, minlength=len(nodes))
+            extra = np.repeat(np.arange(len(nodes), dtype=np.int64), short)
+            rows = np.concatenate((keys // self.length, extra))
+            sites = np.concatenate((keys % self.length,
+                                    rng.randint(0, self.length, size=len(extra))))
+
+        masks = np.left_shift(np.uint64(1), (sites % WORD_BITS).astype(np.uint64))
+        np.bitwise_xor.at(self.words, (nodes[rows], sites // WORD_BITS), masks)
+        self.changed(np.unique(nodes[rows]))
+        return counts
+
+    def nbytes(self):
+        """Get the number of bytes used by the stored arrays"""
+        return self.words.nbytes + self.ones.nbytes + self.fitness.nbytes
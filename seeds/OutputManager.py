@@ -0,0 +1,576 @@
+# -*- coding: utf-8 -*-
+"""
+The OutputManager owns the data files written during an Experiment.
+
+Rather than writing each row of a data file as soon as it is produced, Actions
+write rows to a BufferedCSVWriter obtained from the OutputManager (see
+Action.open_writer).  Rows are kept in memory, one list per column, and are
+written to disk in batches.  Buffers are flushed when they hold a given number
+of rows, at the end of an epoch once a given amount of time has passed since
+the last flush, and when the Experiment is torn down.  All files are also
+flushed if the interpreter exits before teardown (e.g., because of an error or
+an interrupt).  SIGTERM would otherwise end the process without running exit
+handlers, so programs running Experiments (e.g., runseeds) can call
+install_signal_handler to have it exit normally instead.  Rows that are still
+buffered are lost if the process is killed with SIGKILL.
+
+Optionally, files can be written by a background thread so that the simulation
+does not wait for slow storage.  Writers hand their buffered rows to the
+thread through a bounded queue, and Actions can use submit to run other work,
+such as rendering images, on the thread.  Anything handed to the thread should
+not be changed afterward, so Actions should pass copies of the data they
+need.  When the queue is full, the simulation waits for the thread to catch
+up.  Teardown waits until everything in the queue has been written.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import atexit
+import csv
+import os
+import signal
+import sys
+import threading
+import time
+import weakref
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from seeds.utils.snapshots import SnapshotWriter
+
+# OutputManagers that may still have buffered rows when the interpreter exits
+_open_managers = weakref.WeakSet()
+
+def _close_open_managers():
+    for manager in list(_open_managers):
+        manager.close()
+
+atexit.register(_close_open_managers)
+
+def _exit_on_signal(signum, frame):
+    sys.exit(128 + signum)
+
+def install_signal_handler():
+    """Make SIGTERM exit the interpreter normally, so that buffered rows are
+    written by the exit handler.  Handlers that have already been set are left
+    alone, and handlers can only be set from the main thread.  This changes
+    the handling of SIGTERM for the whole process, so it is left to programs
+    running Experiments to call.
+    """
+
+    if signal.getsignal(signal.SIGTERM) != signal.SIG_DFL:
+        return
+
+    try:
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+    except ValueError:
+        # Not the main thread
+        pass
+
+def _write_csv_file(filename, fieldnames, columns, header):
+    with open(filename, 'w') as handle:
+        writer = csv.writer(handle)
+        if header:
+            writer.writerow(fieldnames)
+        writer.writerows(zip(*columns))
+
+
+class BufferedCSVWriter(object):
+    """Write rows of comma-separated values to a file in batches
+
+    Properties:
+
+    filename
+        The name of the file being written
+    fieldnames
+        A list of the names of the columns
+    buffer_rows
+        The number of rows to buffer before writing them to the file
+    restval
+        The value written for columns missing from a row (default: '')
+    closed
+        Whether or not the file has been closed
+    output
+        The OutputManager whose background thread writes buffered rows, or
+        None if rows are written immediately when the buffer is flushed
+
+    """
+
+    def __init__(self, filename, fieldnames, header=True, buffer_rows=1000,
+                 restval='', output=None, resume=None):
+        """Initialize a BufferedCSVWriter object and open its file
+
+        Parameters:
+
+        *filename*
+            The name of the file to write.  Any existing file is replaced.
+        *fieldnames*
+            A list of the names of the columns
+        *header*
+            Whether or not to write a row containing the fieldnames
+            (default: True)
+        *buffer_rows*
+            The number of rows to buffer before writing them to the file
+            (default: 1000)
+        *restval*
+            The value written for columns missing from a row (default: '')
+        *output*
+            An OutputManager whose submit method is used to write rows
+            (default: None)
+        *resume*
+            The state of the writer saved in a checkpoint (see
+            get_checkpoint).  If given, the existing file is truncated to the
+            saved position, and rows are written after that without a header.
+            (default: None)
+
+        """
+
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.buffer_rows = buffer_rows
+        self.restval = restval
+        self.closed = False
+        self.output = output
+
+        if resume is None:
+            self._handle = open(filename, 'w')
+        else:
+            self._handle = open(filename, 'r+')
+            self._handle.seek(resume['position'])
+            self._handle.truncate()
+
+        self._writer = csv.writer(self._handle)
+        self._columns = [[] for f in self.fieldnames]
+        self._pending = 0
+
+        if header and resume is None:
+            self._run(self._writer.writerow, self.fieldnames)
+
+    def __str__(self):
+        """Produce a string to be used when a BufferedCSVWriter is printed"""
+        return "BufferedCSVWriter [{f}][Buffered rows: {n}]".format(f=self.filename, n=self._pending)
+
+    def writerow(self, row):
+        """Write a row given as a dict mapping fieldnames to values, as with
+        csv.DictWriter
+
+        Parameters:
+
+        *row*
+            A dict containing the values of the row
+
+        """
+
+        restval = self.restval
+        for (column, name) in zip(self._columns, self.fieldnames):
+            column.append(row.get(name, restval))
+        self._added(1)
+
+    def writevalues(self, values):
+        """Write a row given as a list of values in the order of fieldnames.
+        This avoids building a dict for each row.
+
+        Parameters:
+
+        *values*
+            A list of the values of the row
+
+        """
+
+        for (column, value) in zip(self._columns, values):
+            column.append(value)
+        self._added(1)
+
+    def writecolumns(self, columns):
+        """Write a number of rows at once, given as a list of columns in the
+        order of fieldnames.  Each column is a list (or array) of values, and
+        all columns should have the same length.
+
+        Parameters:
+
+        *columns*
+            A list of columns
+
+        """
+
+        length = 0
+        for (column, values) in zip(self._columns, columns):
+            if hasattr(values, 'tolist'):
+                values = values.tolist()
+            column.extend(values)
+            length = len(values)
+        self._added(length)
+
+    def _run(self, func, *args):
+        """Call func with the given arguments, on the OutputManager's
+        background thread if there is one
+        """
+
+        if self.output is None:
+            func(*args)
+        else:
+            self.output.submit(func, *args)
+
+    def _write_columns(self, columns):
+        self._writer.writerows(zip(*columns))
+
+    def _added(self, rows):
+        """Account for newly buffered rows, flushing if the buffer is full"""
+        self._pending += rows
+        if self._pending >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows to the file"""
+        if self.closed:
+            return
+
+        if self._pending > 0:
+            columns = self._columns
+            self._columns = [[] for f in self.fieldnames]
+            self._pending = 0
+            self._run(self._write_columns, columns)
+
+        self._run(self._handle.flush)
+
+    def tell(self):
+        """Get the position in the file after all buffered rows are written"""
+        self.flush()
+        if self.output is not None:
+            self.output.wait()
+        return self._handle.tell()
+
+    def get_checkpoint(self):
+        """Write all buffered rows to disk and get the state of the writer to
+        be saved in a checkpoint
+        """
+
+        position = self.tell()
+        os.fsync(self._handle.fileno())
+        return {'position': position}
+
+    def close(self):
+        """Write all buffered rows and close the file"""
+        if not self.closed:
+            self.flush()
+            self._run(self._handle.close)
+            self.closed = True
+
+
+class OutputManager(object):
+    """Create and keep track of the BufferedCSVWriters used by an Experiment
+
+    Properties:
+
+    experiment
+        A reference to the Experiment
+    data_dir
+        The directory in which data files are written
+    writers
+        A list of the open BufferedCSVWriters and SnapshotWriters
+    buffer_rows
+        The number of rows each writer buffers before writing
+    flush_interval
+        The number of seconds after which buffered rows are written, even if
+        buffers are not full.  This is checked at the end of each epoch, so
+        with an interval of 0, rows are written every epoch.
+    background
+        Whether or not files are written by a background thread
+
+    Configuration: The following options can be set in the [Experiment]
+    section.
+
+    output_buffer_rows
+        The number of rows to buffer for each data file (default: 1000)
+    output_flush_interval
+        The maximum number of seconds to keep rows buffered.  If 0, buffered
+        rows are written at the end of every epoch.  (default: 5)
+    output_thread
+        Whether or not to write files using a background thread (Boolean,
+        default: False)
+    output_queue_size
+        The number of pieces of work (e.g., batches of rows) that can wait for
+        the background thread before the simulation must wait (default: 16)
+
+    """
+
+    def __init__(self, experiment, resume=None):
+        """Initialize an OutputManager object
+
+        Parameters:
+
+        *experiment*
+            A reference to the Experiment
+        *resume*
+            The state of the data files saved in a checkpoint (see
+            get_checkpoint).  Files opened with a saved state are continued
+            from their saved positions.  (default: None)
+
+        """
+
+        self.experiment = experiment
+        self.data_dir = experiment.config.get(experiment.config_section,
+                                              'data_dir', default='data')
+        self.writers = []
+        self.buffer_rows = experiment.config.getint(experiment.config_section,
+                                                    'output_buffer_rows',
+                                                    default=1000)
+        self.flush_interval = experiment.config.getfloat(experiment.config_section,
+                                                         'output_flush_interval',
+                                                         default=5.0)
+        self.background = experiment.config.getboolean(experiment.config_section,
+                                                       'output_thread',
+                                                       default=False)
+        self.queue_size = experiment.config.getint(experiment.config_section,
+                                                   'output_queue_size',
+                                                   default=16)
+        self.last_flush = time.time()
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._resume = dict(resume or {})
+
+        _open_managers.add(self)
+
+    def __str__(self):
+        """Produce a string to be used when an OutputManager is printed"""
+        return "OutputManager [Open files: {n}]".format(n=len(self.writers))
+
+    def open_csv(self, filename, fieldnames, header=True):
+        """Open a data file and get a BufferedCSVWriter for it
+
+        Parameters:
+
+        *filename*
+            The path of the file to write
+        *fieldnames*
+            A list of the names of the columns
+        *header*
+            Whether or not to write a row containing the fieldnames
+            (default: True)
+
+        """
+
+        if self.background:
+            output = self
+        else:
+            output = None
+
+        writer = BufferedCSVWriter(filename, fieldnames, header=header,
+                                   buffer_rows=self.buffer_rows, output=output,
+                                   resume=self._resume_state(filename))
+        self.writers.append(writer)
+        return writer
+
+    def read_discarded_rows(self, filename):
+        """Get the rows of a data file that were written after the position
+        saved in the checkpoint being resumed.  These rows are discarded when
+        the file is opened with open_csv, so this must be called first.  The
+        result is a list of rows, each a list of strings.
+
+        Parameters:
+
+        *filename*
+            The path of the data file
+
+        """
+
+        state = self._resume.get(self._relative_path(filename))
+        if state is None or not os.path.exists(filename):
+            return []
+
+        with open(filename, 'r') as handle:
+            handle.seek(state['position'])
+            return list(csv.reader(handle))
+
+    def write_csv(self, filename, fieldnames, columns, header=True):
+        """Write a complete data file given its columns.  The file is written
+        by the background thread if there is one.
+
+        Parameters:
+
+        *filename*
+            The path of the file to write
+        *fieldnames*
+            A list of the names of the columns
+        *columns*
+            A list of columns in the order of fieldnames.  These should not be
+            changed afterward.
+        *header*
+            Whether or not to write a row containing the fieldnames
+            (default: True)
+
+        """
+
+        self.submit(_write_csv_file, filename, fieldnames, columns, header)
+
+    def open_snapshot(self, filename, compress=False, metadata={}):
+        """Open a binary snapshot file and get a SnapshotWriter for it (see
+        seeds.utils.snapshots).  This requires NumPy.
+
+        Parameters:
+
+        *filename*
+            The path of the file to write
+        *compress*
+            Whether or not to compress each array (default: False)
+        *metadata*
+            A dict of information to store in the file's header
+
+        """
+
+        writer = SnapshotWriter(filename, compress=compress, metadata=metadata,
+                                resume=self._resume_state(filename))
+        self.writers.append(writer)
+        return writer
+
+    def _relative_path(self, filename):
+        return os.path.relpath(filename, self.data_dir)
+
+    def _resume_state(self, filename):
+        """Get the saved state of the file with the given name, if any"""
+        return self._resume.pop(self._relative_path(filename), None)
+
+    def get_checkpoint(self):
+        """Write all buffered data to disk and get the state of the open data
+        files to be saved in a checkpoint.  The result is a dict mapping the
+        path of each file, relative to the data directory, to the state of
+        its writer.
+        """
+
+        self.flush()
+        self.wait()
+
+        state = {}
+        for writer in self.writers:
+            if not writer.closed:
+                state[self._relative_path(writer.filename)] = writer.get_checkpoint()
+        return state
+
+    def close_csv(self, writer):
+        """Write any buffered rows, close the writer's file, and stop tracking
+        it
+
+        Parameters:
+
+        *writer*
+            A writer obtained from open_csv or open_snapshot
+
+        """
+
+        self._close_writer(writer)
+        if writer in self.writers:
+            self.writers.remove(writer)
+
+    def _close_writer(self, writer):
+        if isinstance(writer, BufferedCSVWriter):
+            writer.close()
+        else:
+            self.submit(writer.close)
+
+    def submit(self, func, *args, **kwargs):
+        """Call func with the given arguments on the background thread.  If
+        there is no background thread, func is called immediately.  Calls are
+        made in the order in which they are submitted.  If the queue is full,
+        this waits until there is room.  If an earlier call raised an
+        exception, that exception is raised here.
+
+        Parameters:
+
+        *func*
+            The function to call
+        *args*, *kwargs*
+            The arguments to pass to func.  These should not be changed
+            afterward.
+
+        """
+
+        self._raise_error()
+
+        if not self.background or threading.current_thread() is self._thread:
+            func(*args, **kwargs)
+            return
+
+        if self._thread is None:
+            self._queue = queue.Queue(maxsize=max(self.queue_size, 1))
+            self._thread = threading.Thread(target=self._work,
+                                            name="SEEDS output")
+            self._thread.daemon = True
+            self._thread.start()
+
+        self._queue.put((func, args, kwargs))
+
+    def _work(self):
+        """Make the calls in the queue until None is received"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                elif self._error is None:
+                    (func, args, kwargs) = item
+                    func(*args, **kwargs)
+            except Exception as err:
+                self._error = err
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            err = self._error
+            self._error = None
+            raise err
+
+    def wait(self):
+        """Wait until all submitted calls have been made"""
+        if self._thread is not None:
+            self._queue.join()
+        self._raise_error()
+
+    def update(self):
+        """Flush all writers if flush_interval seconds have passed since they
+        were last flushed
+        """
+
+        now = time.time()
+        if now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows"""
+        for writer in self.writers:
+            if isinstance(writer, BufferedCSVWriter):
+                writer.flush()
+            else:
+                self.submit(writer.flush)
+        self.last_flush = time.time()
+
+    def close(self):
+        """Write all buffered rows, close all files, and stop the background
+        thread once everything has been written
+        """
+
+        _open_managers.discard(self)
+
+        errors = []
+        for writer in self.writers:
+            try:
+                self._close_writer(writer)
+            except Exception as err:
+                errors.append(err)
+        self.writers = []
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        if len(errors) > 0:
+            raise errors[0]
+        self._raise_error()
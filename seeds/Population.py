@@ -11,10 +11,16 @@ __credits__ = "Brian Connelly"
 import itertools
 import random
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from seeds.Experiment import *
 from seeds.SEEDSError import *
+from seeds.StateStore import StateStore
 from seeds.Topology import *
-from seeds.utils.sampling import sample_with_replacement
+from seeds.utils.sampling import SumTree, sample_with_replacement
 
 
 class Population(object):
@@ -35,9 +41,59 @@ class Population(object):
     cell_id_manager
         Keeps track of Cell IDs and provides unique IDs using the get_cell_id
         method.
+    cells
+        A list of the Cells in the population indexed by node ID.  This
+        provides faster access to Cells than the 'cell' property of the
+        topology's nodes.
+    state
+        A StateStore that keeps the type and id of each Cell (plus any
+        state_fields declared by the Cell type) in arrays indexed by node ID.
+        This is None unless the state_store option is enabled.
+    genomes
+        A GenomeStore that keeps the genome of each Cell in a matrix indexed
+        by node ID, for Cell types that have bit string genomes.  It is
+        created by the first such Cell, and is None otherwise.
+    update_mode
+        Either 'asynchronous', 'synchronous', or 'gillespie' (see
+        Configuration)
+    rates
+        In the gillespie update mode, a SumTree storing the rate of each
+        Cell, indexed by node ID.  Otherwise, this is None.
+    events
+        The number of Cell updates performed during the last update of the
+        Population
+    type_listeners
+        A list of objects to be notified when Cells change type or when Cells
+        or connections are added or removed (e.g., a ClusterTracker).  These
+        objects have the methods type_changed(node), types_changed(nodes), and
+        topology_changed().
     _cell_class
         A reference to the proper class for the configured Cell type
 
+    Configuration: Populations are configured in the [Population] section (or
+    [Population:label]).
+
+    topology
+        The Topology type (and optional label) to use (e.g.,
+        CartesianTopology:label1)
+    cell
+        The Cell type (and optional label) to use (e.g., RPSCell:label1)
+    events_per_epoch
+        The number of Cells to update per epoch (default: the number of nodes)
+    state_store
+        Whether or not to keep Cell state in a StateStore.  This requires
+        NumPy.  (Boolean.  Default: False)
+    update_mode
+        How Cells are updated each epoch.  With 'asynchronous', randomly
+        selected Cells are updated one after another.  With 'synchronous',
+        every Cell is updated once per epoch using the state of its neighbors
+        at the beginning of the epoch, as in a cellular automaton.
+        Synchronous updates always use a StateStore.  With 'gillespie', time
+        is continuous: each Cell fires at the rate given by its rate method,
+        and events are drawn one at a time in proportion to these rates (see
+        Cell.rate).  This requires a topology with static neighbors.
+        (Default: asynchronous)
+
     """
 
     def __init__(self, experiment, label=None):
@@ -53,6 +109,8 @@ class Population(object):
             raise ConfigurationError("Configuration section {sec} not defined".format(sec=self.config_section))
 
         self.cell_id_manager = itertools.count(0)
+        self.type_listeners = []
+        self.events = 0
 
         self.experiment.data['population']['type_count'] = []
         self.experiment.data['population']['transitions'] = []
@@ -85,18 +143,49 @@ class Population(object):
         # Get a reference to the object for the type of cell to use
         self._cell_class = self.experiment.plugin_manager.get_cell_plugin(cell_type)
 
+        nodes = self.topology.nodes()
+        if len(nodes) > 0:
+            num_slots = max(nodes) + 1
+        else:
+            num_slots = 0
+
+        self.update_mode = self.experiment.config.get(self.config_section, 'update_mode', default='asynchronous')
+        if self.update_mode not in ('asynchronous', 'synchronous', 'gillespie'):
+            raise ConfigurationError("Population: Unknown update_mode '{mode}'".format(mode=self.update_mode))
+
+        # If enabled, create a StateStore to hold the state of each Cell.  This
+        # must exist before the Cells are created.
+        self.state = None
+        if self.update_mode == 'synchronous' or \
+                self.experiment.config.getboolean(self.config_section, 'state_store', default=False):
+            fields = {'type': 'int32', 'id': 'int64'}
+            fields.update(self._cell_class.state_fields)
+            self.state = StateStore(size=num_slots, fields=fields)
+
+        self.genomes = None
+
         # For each node in the topology, create a Cell and assign it the
         # coordinates of the node
-        for n in self.topology.graph.nodes():
+        self.cells = [None] * num_slots
+        self._all_cells = None
+        for n in nodes:
             c = self._cell_class(experiment=self.experiment, population=self,
                                  node=n, label=label)
-            self.topology.graph.node[n]['cell'] = c
+            self.cells[n] = c
+            self.topology.set_node_attribute(n, 'cell', c)
 
         # Now that all Cells are present, set their neighbors list.  This can
         # help speed updates up when the topology changes less than once per
         # epoch.  This benefit is most significant for fixed topologies.
-        for n in self.topology.graph.nodes():
-            self.topology.graph.node[n]['cell'].update_neighbors()
+        if self.topology.cache_neighbors:
+            for n in nodes:
+                self.cells[n].update_neighbors()
+
+        self.rates = None
+        if self.update_mode == 'gillespie':
+            if not self.topology.static_neighbors:
+                raise ConfigurationError("Population: gillespie update_mode requires a topology with static neighbors")
+            self.build_rates()
 
     def update(self):
         """Update the Population: update the topology stochastically
@@ -108,6 +197,16 @@ class Population(object):
         on average, each epoch.  This number can be changed by setting the
         events_per_epoch parameter in the Experiment section of the
         configuration.
+
+        In synchronous mode, every Cell is instead updated once using the
+        update_synchronous method of the Cell type.
+
+        The selected nodes are given to the update_batch method of the Cell
+        type, which allows Cell types to process all of an epoch's events at
+        once.  When a StateStore is used, nodes are selected using the
+        Experiment's NumPy random number generator.  If the topology uses the
+        mean-field approximation, the selected Cells are instead updated with
+        update_mean_field.
         
         """
 
@@ -116,12 +215,154 @@ class Population(object):
         num_types = self._cell_class.max_types
         self.experiment.data['population']['transitions'] = [[0]*num_types for i in range(num_types)]
 
+        self.events = 0
+        if self.topology.num_nodes() == 0:
+            return
+
+        if self.update_mode == 'synchronous':
+            self.get_batch_cell().update_synchronous()
+            self.events = self.topology.num_nodes()
+            return
+        elif self.update_mode == 'gillespie':
+            self.update_gillespie()
+            return
+
         # Select a set of cells to update and update them
         events = self.experiment.config.getint(section=self.config_section,
                                                name='events_per_epoch',
-                                               default=len(self.topology.graph))
-        nodes_to_update = sample_with_replacement(self.topology.graph.nodes(), k=events)
-        [self.topology.graph.node[n]['cell'].update() for n in nodes_to_update]
+                                               default=self.topology.num_nodes())
+
+        if self.state is not None:
+            nodes_to_update = self.sample_nodes(events)
+        else:
+            nodes_to_update = sample_with_replacement(self.topology.nodes(), k=events)
+
+        if self.topology.mean_field:
+            self.update_mean_field(nodes_to_update)
+        else:
+            self.get_batch_cell().update_batch(nodes_to_update)
+        self.events = events
+
+    def update_mean_field(self, nodes):
+        """Update the Cells on the given nodes, in order, using the mean-field
+        approximation.  Rather than interacting with a list of neighbors, each
+        Cell is given the fraction of the Population that is of each type (see
+        Cell.update_mean_field).  These fractions are taken from the type_count
+        data, so they reflect the changes made by earlier updates.
+
+        Parameters:
+
+        *nodes*
+            A list or array of the IDs of the nodes whose Cells are to be
+            updated
+
+        """
+
+        cells = self.cells
+        type_count = self.experiment.data['population']['type_count']
+        num_types = self._cell_class.max_types
+        if len(type_count) < num_types:
+            type_count.extend([0] * (num_types - len(type_count)))
+
+        total = float(self.topology.num_nodes())
+        if hasattr(nodes, 'tolist'):
+            nodes = nodes.tolist()
+
+        for n in nodes:
+            cells[n].update_mean_field([c / total for c in type_count])
+
+    def update_gillespie(self):
+        """Advance the Population by one epoch in continuous time.  The time
+        until the next event is exponentially distributed with a rate equal to
+        the sum of the rates of all Cells, and the Cell that fires is chosen in
+        proportion to its rate.  After a Cell fires, its rate and the rates of
+        its neighbors are recalculated.  The Experiment's time is advanced
+        with each event.  The first event past the end of the epoch is
+        discarded, which does not change the dynamics since waiting times are
+        memoryless.
+        """
+
+        end = self.experiment.epoch + 1
+        rates = self.rates
+        cells = self.cells
+        get_neighbors = self.topology.get_neighbors
+        events = 0
+
+        while True:
+            total = rates.total()
+            if total <= 0:
+                break
+
+            self.experiment.time += random.expovariate(total)
+            if self.experiment.time >= end:
+                break
+
+            node = rates.select()
+            cells[node].fire()
+            events += 1
+
+            rates[node] = cells[node].rate()
+            for n in get_neighbors(node):
+                rates[n] = cells[n].rate()
+
+        self.experiment.time = float(end)
+        self.events = events
+
+    def build_rates(self):
+        """Create the SumTree holding the rate of each Cell for the gillespie
+        update mode
+        """
+
+        self.rates = SumTree(len(self.cells))
+        for c in self.cells:
+            if c is not None:
+                self.rates[c.node] = c.rate()
+
+    def update_rates(self, node):
+        """Recalculate the rates of the Cell on the given node and its
+        neighbors.  This only has an effect in the gillespie update mode, and
+        should be called when the state of a Cell is changed outside of an
+        update (e.g., by an Action).
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        if self.rates is None:
+            return
+
+        for n in [node] + list(self.topology.get_neighbors(node)):
+            if self.cells[n] is not None:
+                self.rates[n] = self.cells[n].rate()
+
+    def sample_nodes(self, k):
+        """Select k nodes at random (with replacement) using the Experiment's
+        NumPy random number generator.  The result is an array of node IDs.
+
+        Parameters:
+
+        *k*
+            The number of nodes to select
+
+        """
+
+        if self.topology.num_nodes() == len(self.cells):
+            return self.experiment.rng.randint(0, len(self.cells), size=k)
+        else:
+            nodes = np.array(self.topology.nodes(), dtype=np.int64)
+            return nodes[self.experiment.rng.randint(0, len(nodes), size=k)]
+
+    def get_batch_cell(self):
+        """Get a Cell on which to call update_batch.  Any Cell in the
+        Population may be used.
+        """
+
+        for c in self.cells:
+            if c is not None:
+                return c
 
     def teardown(self):
         """Perform teardown at the end of an experiment"""
@@ -153,7 +394,7 @@ class Population(object):
 
         self.experiment.data['population']['type_count'][type] -= 1
 
-    def update_type_count(self, fromtype, totype):
+    def update_type_count(self, fromtype, totype, node=None):
         """Update the cell type counts, subtracting from the 'from' type and
         adding to the 'to' type
 
@@ -163,6 +404,10 @@ class Population(object):
             type that a cell was prior to being updated
         totype*
             type that a cell is after being updated
+        *node*
+            The ID of the node whose Cell changed type.  This is passed on to
+            any type_listeners.  If not given, listeners must assume that any
+            Cell may have changed.
 
         """
 
@@ -170,6 +415,9 @@ class Population(object):
         self.increment_type_count(totype)
         self.add_transition(fromtype, totype)
 
+        for listener in self.type_listeners:
+            listener.type_changed(node)
+
     def add_transition(self, fromtype, totype):
         """Update the transition counts
 
@@ -184,6 +432,70 @@ class Population(object):
 
         self.experiment.data['population']['transitions'][fromtype][totype] += 1
 
+    def update_type_counts(self, fromtypes, totypes, nodes=None):
+        """Update the cell type counts and transitions for a number of Cells
+        at once.  This is equivalent to calling update_type_count for each
+        pair of types, but is faster when many Cells change type.
+
+        Parameters:
+
+        *fromtypes*
+            An array of the types that Cells were prior to being updated
+        *totypes*
+            An array of the types that the same Cells are after being updated
+        *nodes*
+            An array of the IDs of the nodes whose Cells changed type (see
+            update_type_count)
+
+        """
+
+        if len(fromtypes) == 0:
+            return
+
+        for listener in self.type_listeners:
+            listener.types_changed(nodes)
+
+        num_types = self._cell_class.max_types
+        pairs = np.bincount(fromtypes * num_types + totypes,
+                            minlength=num_types * num_types)
+
+        type_count = self.experiment.data['population']['type_count']
+        transitions = self.experiment.data['population']['transitions']
+
+        if len(type_count) < num_types:
+            type_count.extend([0] * (num_types - len(type_count)))
+
+        for pair in np.flatnonzero(pairs).tolist():
+            fromtype, totype = divmod(pair, num_types)
+            count = int(pairs[pair])
+            type_count[fromtype] -= count
+            type_count[totype] += count
+            transitions[fromtype][totype] += count
+
+    def count_types(self):
+        """Count the number of Cells of each type by examining every Cell.
+        Unlike the type_count data, which is updated as Cells change type, this
+        reflects the current state of the population.  When a StateStore is
+        used, counting is done on the stored array of types.
+        """
+
+        num_types = self._cell_class.max_types
+
+        if self.state is not None:
+            if None in self.cells:
+                nodes = [n for n in range(len(self.cells)) if self.cells[n] is not None]
+            else:
+                nodes = slice(0, len(self.cells))
+            return self.state.count('type', minlength=num_types, nodes=nodes).tolist()
+
+        counts = [0] * num_types
+        for c in self.cells:
+            if c is not None:
+                if c.type >= len(counts):
+                    counts.extend([0] * (1 + c.type - len(counts)))
+                counts[c.type] += 1
+        return counts
+
     def cell_distance(self, src, dest):
         """Calculate the Cartesian distance between two cells
 
@@ -196,7 +508,7 @@ class Population(object):
 
         """
 
-        return self.topology.node_distance(src.id, dest.id)
+        return self.topology.node_distance(src.node, dest.node)
 
     def add_cell(self, cell=None, neighbors=[], coords=None):
         """Add a Cell of the appropriate type to the population and connect it
@@ -218,7 +530,7 @@ class Population(object):
         neighbor_ids = []
         [neighbor_ids.append(n.id) for n in neighbors]
 
-        new_id = max(self.topology.graph.nodes()) + 1
+        new_id = max(self.topology.nodes()) + 1
 
         try:
             self.topology.add_node(id=new_id, neighbors=neighbor_ids, coords=coords)
@@ -226,13 +538,32 @@ class Population(object):
             # Perhaps a different exception would make more sense
             raise NonExistentNodeError(new_id)
 
-        if not Cell:
+        if new_id >= len(self.cells):
+            self.cells.extend([None] * (1 + new_id - len(self.cells)))
+        if self.state is not None:
+            self.state.ensure_node(new_id)
+        if self.genomes is not None:
+            self.genomes.ensure_node(new_id)
+
+        if not cell:
             cell = self._cell_class(experiment=self.experiment,
-                                    population=self, id=new_id)
+                                    population=self, node=new_id)
         else:
-            cell.id = new_id
+            cell.node = new_id
+
+        self.cells[new_id] = cell
+        if self._all_cells is not None:
+            self._all_cells.append(cell)
+        self.topology.set_node_attribute(new_id, 'cell', cell)
 
-        self.topology.graph.node[n]['cell'] = cell
+        for listener in self.type_listeners:
+            listener.topology_changed()
+
+        if self.rates is not None:
+            if new_id >= self.rates.size:
+                self.build_rates()
+            else:
+                self.update_rates(new_id)
 
     def remove_cell(self, cell):
         """Remove the given Cell from the Population and its corresponding
@@ -245,8 +576,23 @@ class Population(object):
 
         """
 
+        neighbors = []
+        if self.rates is not None and self.topology.has_node(cell.node):
+            neighbors = list(self.topology.get_neighbors(cell.node))
+
         try:
-            self.topology.remove_node(cell.id)
+            self.topology.remove_node(cell.node)
+            self.cells[cell.node] = None
+            if self._all_cells is not None:
+                self._all_cells[:] = [c for c in self._all_cells if c is not cell]
+
+            if self.rates is not None:
+                self.rates[cell.node] = 0.0
+                for n in neighbors:
+                    self.rates[n] = self.cells[n].rate()
+
+            for listener in self.type_listeners:
+                listener.topology_changed()
         except NonExistentNodeError as err:
             print("Error removing Cell: {e}".format(e=err))
 
@@ -270,7 +616,12 @@ class Population(object):
         """
 
         try:
-            self.topology.add_edge(src.id, dest.id)
+            self.topology.add_edge(src.node, dest.node)
+            self.update_rates(src.node)
+            self.update_rates(dest.node)
+
+            for listener in self.type_listeners:
+                listener.topology_changed()
         except NonExistentNodeError as err:
             print("Error connecting Cells: {e}".format(e=err))
 
@@ -291,14 +642,170 @@ class Population(object):
         """
 
         try:
-            self.topology.remove_edge(src.id, dest.id)
+            self.topology.remove_edge(src.node, dest.node)
+            self.update_rates(src.node)
+            self.update_rates(dest.node)
+
+            for listener in self.type_listeners:
+                listener.topology_changed()
         except NonExistentEdgeError as err:
             print("Error disconnecting Cells: {e}".format(e=err))
 
+    def get_checkpoint(self):
+        """Get the state of the Population to be saved in a checkpoint (see
+        seeds.Checkpoint).  This includes the nodes and edges of the topology
+        and the type, id, state_fields, and checkpoint_fields of each Cell.
+        """
+
+        cells = self.cells
+        nodes = [n for n in range(len(cells)) if cells[n] is not None]
+
+        next_id = next(self.cell_id_manager)
+        self.cell_id_manager = itertools.count(next_id)
+
+        edges = self.topology.edges()
+        if np is not None:
+            edges = np.array(edges, dtype=np.int64).reshape((len(edges), 2))
+
+        state = {'nodes': nodes, 'edges': edges, 'next_cell_id': next_id,
+                 'store': None, 'fields': {}}
+
+        if self.state is not None:
+            state['store'] = self.state.snapshot()
+        else:
+            state['type'] = [cells[n].type for n in nodes]
+            state['id'] = [cells[n].id for n in nodes]
+            for field in self._cell_class.state_fields:
+                state['fields'][field] = [cells[n].get_state(field) for n in nodes]
+
+        for field in self._cell_class.checkpoint_fields:
+            state['fields'][field] = [getattr(cells[n], field) for n in nodes]
+
+        return state
+
+    def restore_checkpoint(self, state):
+        """Restore the state of the Population saved in a checkpoint.  Nodes
+        and edges that were removed or added since setup are removed or added
+        again, but Cells that were added can not be restored.
+
+        Parameters:
+
+        *state*
+            The state saved by get_checkpoint
+
+        """
+
+        topology = self.topology
+        nodes = state['nodes']
+
+        saved_nodes = set(nodes)
+        for n in topology.nodes():
+            if n not in saved_nodes:
+                self.remove_cell(self.cells[n])
+
+        if len(saved_nodes.difference(topology.nodes())) > 0:
+            raise CheckpointError("Population: Cells added after setup can not be restored from a checkpoint")
+
+        saved_edges = state['edges']
+        if hasattr(saved_edges, 'tolist'):
+            saved_edges = saved_edges.tolist()
+
+        saved_edges = set((min(a, b), max(a, b)) for (a, b) in saved_edges)
+        edges = set((min(a, b), max(a, b)) for (a, b) in topology.edges())
+        if saved_edges != edges:
+            for (a, b) in edges - saved_edges:
+                self.topology.remove_edge(a, b)
+            for (a, b) in saved_edges - edges:
+                self.topology.add_edge(a, b)
+            for n in nodes:
+                self.cells[n].update_neighbors()
+
+        cells = self.cells
+        if state['store'] is not None:
+            self.state.restore(state['store'])
+        else:
+            for (n, type, id) in zip(nodes, state['type'], state['id']):
+                cells[n].type = type
+                cells[n].id = id
+
+        for field in state['fields']:
+            if field in self._cell_class.state_fields and self.state is None:
+                for (n, value) in zip(nodes, state['fields'][field]):
+                    cells[n].set_state(field, value)
+            else:
+                for (n, value) in zip(nodes, state['fields'][field]):
+                    setattr(cells[n], field, value)
+
+        self.cell_id_manager = itertools.count(state['next_cell_id'])
+
+        if self.rates is not None:
+            self.build_rates()
+
+        for listener in self.type_listeners:
+            listener.topology_changed()
+
     def get_cell_id(self):
         """Return a unique ID to be used for a Cell"""
         return self.cell_id_manager.next()
 
+    def get_cell_ids(self, k):
+        """Return an array of k unique IDs to be used for Cells.  These are the
+        same IDs that k calls to get_cell_id would return.
+
+        Parameters:
+
+        *k*
+            The number of IDs to get
+
+        """
+
+        start = self.cell_id_manager.next()
+        self.cell_id_manager = itertools.count(start + k)
+        return np.arange(start, start + k, dtype=np.int64)
+
     def get_neighbors(self, cell):
-        """Return a list of the neighbors for the given cell"""
-        return [self.topology.graph.node[n]['cell'] for n in self.topology.get_neighbors(cell.node)]
+        """Return a list of the neighbors for the given cell.  If the topology
+        is fully connected, every Cell is a neighbor, and the same list is
+        given to every Cell.  This list is kept up to date as Cells are added
+        and removed, and must not be modified elsewhere.
+        """
+
+        cells = self.cells
+        if self.topology.fully_connected:
+            if self._all_cells is None:
+                self._all_cells = [c for c in cells if c is not None]
+            return self._all_cells
+
+        return [cells[n] for n in self.topology.get_neighbors(cell.node)]
+
+    def get_nearest_cells(self, coords, n=1):
+        """Return a list of the n Cells located nearest the given coordinates,
+        nearest first (see Topology.get_nearest_node)
+
+        Parameters:
+
+        *coords*
+            A tuple containing the coordinates of the point in question
+        *n*
+            The number of Cells to find (default: 1)
+
+        """
+
+        cells = self.cells
+        return [cells[n] for n in self.topology.get_nearest_node(coords, n=n)]
+
+    def get_cells_within(self, coords, radius):
+        """Return a list of the Cells located within the given distance of the
+        given coordinates, nearest first (see Topology.get_nodes_within)
+
+        Parameters:
+
+        *coords*
+            A tuple containing the coordinates of the point in question
+        *radius*
+            The maximum distance from the point
+
+        """
+
+        cells = self.cells
+        return [cells[n] for n in self.topology.get_nodes_within(coords, radius)]
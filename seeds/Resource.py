@@ -15,6 +15,7 @@ from seeds.Experiment import *
 from seeds.PluginManager import *
 from seeds.ResourceCell import *
 from seeds.SEEDSError import *
+from seeds.StateStore import StateStore
 from seeds.Topology import *
 from seeds.utils.sampling import sample_with_replacement
 
@@ -35,6 +36,14 @@ class Resource(object):
     topology
         The Topology object that stores the graph of ResourceCell (nodes)
         objects and the flow between them (edges)
+    cells
+        A list of the ResourceCells in the resource indexed by node ID
+    update_mode
+        Either 'asynchronous' or 'synchronous' (see below)
+    state
+        In the synchronous update mode, a StateStore that keeps the level of
+        each ResourceCell (plus any state_fields declared by the ResourceCell
+        type) in arrays indexed by node ID.  Otherwise, this is None.
     _resource_type_class
         A reference to the proper class for the configured ResourceCell
 
@@ -53,6 +62,15 @@ class Resource(object):
     For more information about the properties of this resource, see the
     documentation for NormalResource.
 
+    By default, ResourceCells are updated asynchronously: each epoch, a number
+    of randomly selected ResourceCells (events_per_epoch, by default the number
+    of nodes) are updated one after another.  If update_mode is set to
+    synchronous, every ResourceCell is updated once per epoch through the
+    update_synchronous method of the ResourceCell type, and levels are stored
+    in a StateStore (which requires NumPy).  In this mode, the levels data
+    for the resource (experiment.data['resources'][name]['levels']) is the
+    stored array of levels.
+
     """
 
     def __init__(self, experiment, label=None):
@@ -105,21 +123,44 @@ class Resource(object):
         self.topology = tref(experiment=self.experiment,
                              label=top_label)
 
-        self.experiment.data['resources'][self.name]['levels'] = [0] * self.topology.num_nodes()
+        self.update_mode = self.experiment.config.get(self.config_section, 'update_mode', default='asynchronous')
+        if self.update_mode not in ('asynchronous', 'synchronous'):
+            raise ConfigurationError("Resource: Unknown update_mode '{mode}'".format(mode=self.update_mode))
+
+        nodes = self.topology.nodes()
+        if len(nodes) > 0:
+            num_slots = max(nodes) + 1
+        else:
+            num_slots = 0
+
+        # In synchronous mode, create a StateStore to hold the levels.  This
+        # must exist before the ResourceCells are created.
+        self.state = None
+        if self.update_mode == 'synchronous':
+            fields = {'level': 'float64'}
+            fields.update(self._resource_type_class.state_fields)
+            self.state = StateStore(size=num_slots, fields=fields)
+            self.experiment.data['resources'][self.name]['levels'] = self.state['level']
+        else:
+            self.experiment.data['resources'][self.name]['levels'] = [0] * self.topology.num_nodes()
 
         # For each node in the topology, create a ResourceCell object
-        for n in self.topology.graph.nodes():
-            self.topology.graph.node[n]['resource'] = self._resource_type_class(experiment=self.experiment,
-                                                                                resource=self, 
-                                                                                config_section=self.config_section,
-                                                                                id=n)
+        self.cells = [None] * num_slots
+        for n in nodes:
+            rc = self._resource_type_class(experiment=self.experiment,
+                                           resource=self,
+                                           config_section=self.config_section,
+                                           id=n)
+            self.cells[n] = rc
+            self.topology.set_node_attribute(n, 'resource', rc)
 
         # Now that all ResourceCells are present, set their neighbors list.
         # This can help speed updates up when the topology changes less than
         # once per epoch.  This benefit is most significant for fixed
         # topologies.
-        for n in self.topology.graph.nodes():
-            self.topology.graph.node[n]['resource'].update_neighbors()
+        if self.topology.cache_neighbors:
+            for n in nodes:
+                self.cells[n].update_neighbors()
 
     def __str__(self):
         """Produce a string to be used when a Resource object is printed"""
@@ -135,19 +176,76 @@ class Resource(object):
         updated, on average, each epoch.  This number can be changed by setting
         the events_per_epoch parameter in the Experiment section of the
         configuration.
+
+        In synchronous mode, every ResourceCell is instead updated once using
+        the update_synchronous method of the ResourceCell type.
                                                                         
         """
 
+        if self.update_mode == 'synchronous':
+            for rc in self.cells:
+                if rc is not None:
+                    rc.update_synchronous()
+                    break
+            return
+
         events = self.experiment.config.getint(section=self.config_section,
                                                name='events_per_epoch',
-                                               default=len(self.topology.graph))
-        nodes_to_update = sample_with_replacement(self.topology.graph.nodes(), k=events)
-        [self.topology.graph.node[n]['resource'].update() for n in nodes_to_update]
+                                               default=self.topology.num_nodes())
+        nodes_to_update = sample_with_replacement(self.topology.nodes(), k=events)
+        cells = self.cells
+        [cells[n].update() for n in nodes_to_update]
 
     def teardown(self):
         """Perform any necessary cleanup at the end of the experiment"""
         self.topology.teardown()
 
+    def get_checkpoint(self):
+        """Get the state of the Resource to be saved in a checkpoint (see
+        seeds.Checkpoint).  This includes whether or not the Resource is
+        available and the level, state_fields, and checkpoint_fields of each
+        ResourceCell.
+        """
+
+        cells = [rc for rc in self.cells if rc is not None]
+        state = {'available': self.available, 'nodes': [rc.id for rc in cells],
+                 'store': None, 'fields': {}}
+
+        if self.state is not None:
+            state['store'] = self.state.snapshot()
+        else:
+            state['levels'] = [rc.level for rc in cells]
+
+        for field in self._resource_type_class.checkpoint_fields:
+            state['fields'][field] = [getattr(rc, field) for rc in cells]
+
+        return state
+
+    def restore_checkpoint(self, state):
+        """Restore the state of the Resource saved in a checkpoint.  The
+        Experiment's data must already have been restored.
+
+        Parameters:
+
+        *state*
+            The state saved by get_checkpoint
+
+        """
+
+        self.available = state['available']
+        cells = [self.cells[n] for n in state['nodes']]
+
+        if state['store'] is not None:
+            self.state.restore(state['store'])
+            self.experiment.data['resources'][self.name]['levels'] = self.state['level']
+        else:
+            for (rc, level) in zip(cells, state['levels']):
+                rc.level = level
+
+        for field in state['fields']:
+            for (rc, value) in zip(cells, state['fields'][field]):
+                setattr(rc, field, value)
+
     def add_resourcetype(self, rt=None, neighbors=[]):
         """Add a ResourceCell of the appropriate type to the Resource and
         connect it to the given neighbors (optional).
@@ -168,7 +266,7 @@ class Resource(object):
         neighbor_ids = []
         [neighbor_ids.append(n.id) for n in neighbors]
 
-        new_id = max(self.topology.graph.nodes()) + 1
+        new_id = max(self.topology.nodes()) + 1
 
         try:
             self.topology.add_node(id=new_id, neighbors=neighbor_ids)
@@ -181,7 +279,7 @@ class Resource(object):
                                            config_section=self.config_section,
                                            id=new_id)
  
-        self.topology.graph.node[n]['resource'] = rt
+        self.topology.set_node_attribute(new_id, 'resource', rt)
 
     def remove_resourcetype(self, rt):
         """Remove the given ResourceCell from the Resource and its
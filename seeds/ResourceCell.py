@@ -11,6 +11,8 @@ TODO: more understandable description
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
+from seeds.StateStore import StateField
+
 
 class ResourceCell(object):
     """Interface for ResourceCell objects.  A ResourceCell object represents a
@@ -31,18 +33,39 @@ class ResourceCell(object):
         A reference to the Resource to which this ResourceCell belongs
     *neighbors*
         A list of neighbor ResourceCells.  A neighbor is a ResourceCell that
-        exists on an adjacent node.
+        exists on an adjacent node.  This list is kept by the ResourceCell
+        unless the topology's cache_neighbors is False, in which case it is
+        found each time it is used.
+    *state_fields*
+        A dict mapping the names of any additional numeric per-node fields to
+        their NumPy dtypes.  When the Resource uses a StateStore, these fields
+        are allocated in the store alongside level.
+    *checkpoint_fields*
+        A list of the names of any additional attributes of each ResourceCell
+        to be saved when the Experiment is checkpointed (see
+        seeds.Checkpoint).  The values of level and state_fields are always
+        saved.
+
+    If the Resource uses the synchronous update mode (see Resource), the level
+    of each ResourceCell is kept in the Resource's StateStore.
 
     """
 
+    state_fields = {}
+    checkpoint_fields = []
+
+    level = StateField('level', index='id')
+    _state_store = None
+
     def __init__(self, experiment, resource, config_section, id):
         """Initialize the ResourceCell object"""
         self.experiment = experiment
         self.resource = resource
+        self.id = id
+        self._state_store = self.resource.state
         self.level = 0.0
         self.config_section = config_section
-        self.id = id
-        self.neighbors = []
+        self._neighbors = None
 
     def __str__(self):
         """Return a string for when a ResourceCell object is printed"""
@@ -61,21 +84,50 @@ class ResourceCell(object):
         """Update the ResourceCell object in the node"""
         pass
 
+    def update_synchronous(self):
+        """Update every ResourceCell in the Resource once.  This is called by
+        the Resource on a single ResourceCell of the configured type when the
+        synchronous update mode is used.  By default, the update method of
+        each ResourceCell is called in order of node ID.  ResourceCell types
+        can override this to update all levels using NumPy operations on the
+        Resource's StateStore.
+        """
+
+        [rc.update() for rc in self.resource.cells if rc is not None]
+
     def teardown(self):
         """Perform any necessary cleanup at the end of the experiment"""
         pass
 
     def get_neighbors(self):
         """Get a list of neighboring ResourceCells"""
-        return [self.resource.topology.graph.node[n]['resource'] for n in self.resource.topology.get_neighbors(self.id)]
+        cells = self.resource.cells
+        return [cells[n] for n in self.resource.topology.get_neighbors(self.id)]
+
+    @property
+    def neighbors(self):
+        """The list of neighboring ResourceCells"""
+        if self._neighbors is None:
+            return self.get_neighbors()
+        return self._neighbors
+
+    @neighbors.setter
+    def neighbors(self, neighbors):
+        self._neighbors = neighbors
 
     def update_neighbors(self):
-        """Update the list of neighboring ResourceCells"""
-        self.neighbors = self.get_neighbors()
+        """Update the list of neighboring ResourceCells.  If the topology does
+        not cache neighbors, the list is discarded instead.
+        """
+
+        if self.resource.topology.cache_neighbors:
+            self._neighbors = self.get_neighbors()
+        else:
+            self._neighbors = None
 
     def coords(self):
         """Get the coordinates of the ResourceCell in space"""
-        return self.resource.topology.graph.node[self.id]['coords']
+        return self.resource.topology.get_coords(self.id)
 
     def get_neighbor_distance(self, neighbor):
         """Get the Cartesian distance to the given neighbor ResourceCell"""
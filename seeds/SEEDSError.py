@@ -288,3 +288,37 @@ class IntRangelistFormatError(SEEDSError):
 
     def __str__(self):
         return self.s
+
+class ParamStringFormatError(SEEDSError):
+    """Error to be raised when an invalid string setting a configuration
+    parameter is given.  The correct format is <section>.<parameter>=<value>.
+
+    Attributes:
+
+    *message*
+        The message to be displayed (string)
+
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+class CheckpointError(SEEDSError):
+    """Error to be raised when a checkpoint can not be read or does not match
+    the Experiment being resumed.
+
+    Attributes:
+
+    *message*
+        The message to be displayed (string)
+
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+A StateStore keeps the state of every node in a topology (e.g., the type of
+each Cell in a Population) in contiguous NumPy arrays indexed by node ID.
+
+When a StateStore is used, properties such as Cell.type are views into these
+arrays rather than attributes stored on each object.  This greatly reduces the
+memory needed for large populations and allows update kernels, snapshots, and
+type counts to operate on whole arrays at once.
+
+StateStores require NumPy.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from seeds.SEEDSError import *
+from seeds.utils.numeric import require_numpy
+
+
+class StateStore(object):
+    """Store per-node state in contiguous arrays
+
+    Properties:
+
+    size
+        The length of each array.  Since node IDs are used as indices, this is
+        one more than the largest node ID.
+    fields
+        A dict mapping the name of each field to the array that stores the
+        values of that field
+    buffered
+        Whether or not a synchronous step is in progress.  During a step,
+        values are read from the arrays in fields (the front buffer), and
+        values set through StateFields are written to a second set of arrays
+        (the back buffer).  At the end of the step, the two are swapped.
+    versions
+        A dict mapping the name of each field to a counter that is incremented
+        whenever a value is set through a StateField.  Code that writes to
+        the arrays directly should call touch so that results cached from a
+        field (see groups) are recomputed.
+    focus
+        During a synchronous step, the index of the object currently being
+        updated (or None).  Values read through StateFields for this index
+        come from the back buffer, so that an object sees its own changes.
+
+    """
+
+    def __init__(self, size, fields={}):
+        """Initialize a StateStore object
+
+        Parameters:
+
+        *size*
+            The number of nodes for which to store state
+        *fields*
+            A dict mapping the names of fields to be created to their NumPy
+            dtypes (e.g., {'type': 'int32', 'fitness': 'float64'})
+
+        """
+
+        require_numpy("StateStore")
+
+        self.size = size
+        self.fields = {}
+        self.buffered = False
+        self.focus = None
+        self.versions = {}
+        self._back = None
+        self._groups = {}
+        self._filled = {}
+
+        for name in fields:
+            self.add_field(name, fields[name])
+
+    def __str__(self):
+        """Produce a string to be used when a StateStore object is printed"""
+        return "StateStore [Size: {size}][Fields: {fields}]".format(size=self.size, fields=",".join(sorted(self.fields)))
+
+    def __getitem__(self, name):
+        """Get the array storing the given field"""
+        return self.fields[name]
+
+    def __contains__(self, name):
+        """Determine whether or not the given field is stored"""
+        return name in self.fields
+
+    def add_field(self, name, dtype, fill=0):
+        """Add a field to the store.  If the field already exists, it is left
+        unchanged.
+
+        Parameters:
+
+        *name*
+            The name of the field
+        *dtype*
+            The NumPy dtype of the values stored in the field
+        *fill*
+            The initial value of the field for every node (default: 0)
+
+        """
+
+        if name not in self.fields:
+            self.fields[name] = np.empty(self.size, dtype=dtype)
+            self.fields[name].fill(fill)
+            self.versions[name] = 0
+            self._back = None
+
+    def resize(self, size):
+        """Change the number of nodes for which state is stored.  When
+        growing, new entries are set to 0.
+
+        Parameters:
+
+        *size*
+            The new size of the store
+
+        """
+
+        for name in self.fields:
+            old = self.fields[name]
+            new = np.zeros(size, dtype=old.dtype)
+            n = min(size, self.size)
+            new[:n] = old[:n]
+            self.fields[name] = new
+
+        self.size = size
+        self._back = None
+        self._groups = {}
+
+    def ensure_node(self, node):
+        """Make sure that the store is large enough to hold the given node.
+        Capacity is doubled as needed so that repeatedly adding nodes does not
+        copy the arrays each time.
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        if node >= self.size:
+            self.resize(max(node + 1, 2 * self.size))
+
+    def begin_step(self):
+        """Begin a synchronous step.  Until end_step is called, values set
+        through StateFields or the arrays returned by back() are written to the
+        back buffer, while the arrays in fields continue to hold the state at
+        the beginning of the step.  The back buffer starts as a copy of the
+        current state, so values that are not set remain unchanged.
+        """
+
+        if self._back is None:
+            self._back = dict((name, np.empty_like(self.fields[name])) for name in self.fields)
+
+        for name in self.fields:
+            self._back[name][:] = self.fields[name]
+
+        self.buffered = True
+
+    def back(self, name):
+        """Get the back buffer for the given field during a synchronous step
+
+        Parameters:
+
+        *name*
+            The name of the field
+
+        """
+
+        return self._back[name]
+
+    def end_step(self):
+        """End a synchronous step, making the values written during the step
+        the current state
+        """
+
+        self.fields, self._back = self._back, self.fields
+        self.buffered = False
+        self.focus = None
+
+        for name in self.fields:
+            self.touch(name)
+
+    def snapshot(self, names=None):
+        """Get a copy of the stored state.  The result is a dict mapping field
+        names to copies of their arrays.
+
+        Parameters:
+
+        *names*
+            A list of the fields to copy.  If not specified, all fields will be
+            copied.
+
+        """
+
+        if names is None:
+            names = self.fields.keys()
+
+        return dict((name, self.fields[name].copy()) for name in names)
+
+    def restore(self, snapshot):
+        """Restore state previously captured with snapshot()
+
+        Parameters:
+
+        *snapshot*
+            A dict mapping field names to arrays
+
+        """
+
+        for name in snapshot:
+            if len(snapshot[name]) != self.size:
+                self.resize(len(snapshot[name]))
+            self.fields[name][:] = snapshot[name]
+            self.touch(name)
+
+    def touch(self, name):
+        """Record that the values of a field have changed
+
+        Parameters:
+
+        *name*
+            The name of the field
+
+        """
+
+        self.versions[name] += 1
+
+    def fill(self, name, value, size=None):
+        """Set a field to the same value for every node.  If the field was last
+        set to the same value by fill and has not changed since, nothing is
+        written.
+
+        Parameters:
+
+        *name*
+            The name of the field
+        *value*
+            The value to store
+        *size*
+            The number of nodes to set (default: all)
+
+        """
+
+        if size is None:
+            size = self.size
+
+        if self._filled.get(name) == (value, size, self.versions[name]):
+            return
+
+        self.fields[name][:size] = value
+        self.touch(name)
+        self._filled[name] = (value, size, self.versions[name])
+
+    def groups(self, names, size=None):
+        """Group nodes that have the same values for the given fields.  The
+        result is a tuple (values, inverse).  values is a dict mapping each
+        field name to an array with one entry per group, and inverse is an
+        array giving the group of each node.  If every node has the same
+        values, there is one group and inverse is None.  Results are cached
+        until one of the fields is changed (see versions).
+
+        Parameters:
+
+        *names*
+            A list of field names
+        *size*
+            The number of nodes to group (default: all)
+
+        """
+
+        if size is None:
+            size = self.size
+
+        key = (tuple(names), size)
+        versions = tuple(self.versions[name] for name in names)
+        cached = self._groups.get(key)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+
+        columns = [self.fields[name][:size] for name in names]
+        if all(len(c) == 0 or c.min() == c.max() for c in columns):
+            values = dict((name, c[:1].copy()) for (name, c) in zip(names, columns))
+            inverse = None
+        else:
+            (unique, inverse) = np.unique(np.column_stack(columns), axis=0,
+                                          return_inverse=True)
+            values = dict((name, unique[:, i].astype(self.fields[name].dtype))
+                          for (i, name) in enumerate(names))
+
+        self._groups[key] = (versions, (values, inverse))
+        return (values, inverse)
+
+    def count(self, name, minlength=0, nodes=None):
+        """Count the number of nodes having each value of an integer field
+
+        Parameters:
+
+        *name*
+            The name of the field
+        *minlength*
+            The minimum length of the resulting list of counts
+        *nodes*
+            An optional list or array of nodes to be counted.  By default, all
+            nodes are counted.
+
+        """
+
+        values = self.fields[name]
+        if nodes is not None:
+            values = values[nodes]
+
+        return np.bincount(values, minlength=minlength)
+
+    def nbytes(self):
+        """Get the number of bytes used by the stored arrays"""
+        return sum(self.fields[name].nbytes for name in self.fields)
+
+
+class StateField(object):
+    """A StateField exposes one field of a StateStore as an attribute of the
+    objects whose state is kept in that store (e.g., Cell.type).
+
+    Objects using StateFields should set their _state_store attribute to the
+    StateStore holding their state and have an attribute giving their index in
+    the store (e.g., Cell.node).  If _state_store is None, values are kept in
+    the object like any other attribute.  During a synchronous step (see
+    StateStore.begin_step), values are written to the store's back buffer.
+
+    """
+
+    def __init__(self, field, index='node'):
+        """Initialize a StateField
+
+        Parameters:
+
+        *field*
+            The name of the field in the StateStore.  This should match the
+            name of the attribute.
+        *index*
+            The name of the attribute that gives the object's index into the
+            store (default: 'node')
+
+        """
+
+        self.field = field
+        self.index = index
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        store = obj._state_store
+        if store is None:
+            try:
+                return obj.__dict__[self.field]
+            except KeyError:
+                raise AttributeError(self.field)
+
+        index = getattr(obj, self.index)
+        if store.buffered and index == store.focus:
+            return store.back(self.field).item(index)
+        return store.fields[self.field].item(index)
+
+    def __set__(self, obj, value):
+        store = obj._state_store
+        if store is None:
+            obj.__dict__[self.field] = value
+        elif store.buffered:
+            store.back(self.field)[getattr(obj, self.index)] = value
+        else:
+            store.fields[self.field][getattr(obj, self.index)] = value
+            store.versions[self.field] += 1
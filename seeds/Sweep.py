@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+A Sweep runs an Experiment many times, once for each combination of parameter
+settings and random seeds, using a pool of processes.
+
+Each run is given an ID (e.g., run-0007) and writes its data to a directory of
+that name within the sweep directory.  The sweep directory also holds a
+manifest (manifest.json) listing the parameter settings, seed, and status of
+each run.  The manifest is rewritten whenever a run finishes, so if a sweep is
+interrupted, running it again with the same sweep directory only runs the
+Experiments that have not completed.  New settings or seeds can also be added
+to an existing sweep in this way.
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+
+from seeds.Experiment import Experiment
+from seeds.OutputManager import install_signal_handler
+from seeds.SEEDSError import *
+
+
+def run_experiment(configfile, params, seed, data_dir, label=None):
+    """Run an Experiment to completion and write the configuration used to
+    experiment.cfg in its data directory.  The Experiment is returned.
+
+    Parameters:
+
+    *configfile*
+        The name of the configuration file
+    *params*
+        A list of (section, parameter, value) tuples to set in the
+        configuration, in order
+    *seed*
+        The seed for the pseudorandom number generators
+    *data_dir*
+        The directory in which to write data
+    *label*
+        The label of the Experiment's configuration section (default: None)
+
+    """
+
+    experiment = Experiment(configfile=configfile, seed=seed, label=label)
+    experiment.config.set(experiment.config_section, 'data_dir', data_dir)
+
+    for (section, parameter, value) in params:
+        experiment.config.set(section, parameter, value)
+
+    # As with runseeds, plugins can also be found in $SEEDSPLUGINPATH
+    seedspluginpath = os.environ.get("SEEDSPLUGINPATH")
+    if seedspluginpath:
+        plugindirs = experiment.config.get("Experiment", "plugin_dirs")
+        plugindirs = [d for d in [plugindirs] if d] + seedspluginpath.split(":")
+        experiment.config.set("Experiment", "plugin_dirs", ",".join(plugindirs))
+
+    for epoch in experiment:
+        pass
+
+    experiment.teardown()
+    experiment.config.write(filename='experiment.cfg')
+    return experiment
+
+def _init_worker():
+    """Leave handling of interrupts to the process running the Sweep, and
+    write buffered data if the worker is terminated
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    install_signal_handler()
+
+def _run_worker(task):
+    """Run one Experiment of a Sweep and return a dict describing the result"""
+    (run_id, configfile, params, seed, data_dir, label) = task
+
+    result = {'run_id': run_id, 'status': 'complete', 'error': None,
+              'traceback': None, 'uuid': None, 'epochs': None}
+    start = time.time()
+
+    try:
+        experiment = run_experiment(configfile, params, seed, data_dir,
+                                    label=label)
+        result['uuid'] = str(experiment.uuid)
+        result['epochs'] = experiment.epoch
+    except Exception as err:
+        result['status'] = 'failed'
+        result['error'] = str(err)
+        result['traceback'] = traceback.format_exc()
+
+    result['elapsed'] = time.time() - start
+    return result
+
+
+class Sweep(object):
+    """Run an Experiment for each combination of parameter settings and seeds
+
+    The settings for each run are those of one of param_sets, followed by one
+    value for each parameter in grid.  Every combination of these is run with
+    each seed.
+
+    Properties:
+
+    configfile
+        The name of the configuration file used by every run
+    sweep_dir
+        The directory holding the manifest and each run's data directory
+    grid
+        A list of (section, parameter, values) tuples.  Each value in values
+        is used in turn.
+    param_sets
+        A list of lists of (section, parameter, value) tuples
+    seeds
+        A list of seeds with which each combination of settings is run
+    label
+        The label of the Experiment's configuration section
+    manifest_file
+        The name of the manifest file
+    manifest
+        A dict describing the sweep.  Its 'runs' entry maps each run ID to a
+        dict with the run's params, seed, data_dir, and status ('pending',
+        'complete', or 'failed').
+
+    """
+
+    def __init__(self, configfile, sweep_dir, grid=[], param_sets=[], seeds=[1],
+                 label=None):
+        """Initialize a Sweep object, reading the manifest if the sweep
+        directory already has one
+
+        Parameters:
+
+        *configfile*
+            The name of the configuration file
+        *sweep_dir*
+            The directory in which to write the manifest and data
+        *grid*
+            A list of (section, parameter, values) tuples (default: [])
+        *param_sets*
+            A list of lists of (section, parameter, value) tuples (default:
+            [], which runs the configuration as given)
+        *seeds*
+            A list of seeds (default: [1])
+        *label*
+            The label of the Experiment's configuration section (default:
+            None)
+
+        """
+
+        if len(seeds) == 0:
+            raise ConfigurationError("Sweep requires at least one seed")
+
+        for seed in seeds:
+            if seed < 0:
+                raise ConfigurationError("Sweep seeds must not be negative")
+
+        self.configfile = os.path.abspath(configfile)
+        self.sweep_dir = os.path.abspath(sweep_dir)
+        self.grid = grid
+        self.param_sets = param_sets
+        self.seeds = seeds
+        self.label = label
+        self.manifest_file = os.path.join(self.sweep_dir, 'manifest.json')
+
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as handle:
+                self.manifest = json.load(handle)
+        else:
+            self.manifest = {'configfile': self.configfile, 'label': label,
+                             'runs': {}}
+
+        if self.manifest['configfile'] != self.configfile or \
+                self.manifest['label'] != label:
+            raise ConfigurationError("Sweep directory '{d}' holds a sweep of a different configuration".format(d=sweep_dir))
+
+    def __str__(self):
+        """Produce a string to be used when a Sweep object is printed"""
+        return "Sweep [{d}][Runs: {n}]".format(d=self.sweep_dir, n=len(self.runs()))
+
+    def combinations(self):
+        """Get a list of the parameter settings to run, each of which is a
+        list of (section, parameter, value) tuples
+        """
+
+        if len(self.param_sets) > 0:
+            cases = self.param_sets
+        else:
+            cases = [[]]
+
+        choices = [[(section, parameter, v) for v in values]
+                   for (section, parameter, values) in self.grid]
+
+        return [list(case) + list(chosen) for case in cases
+                for chosen in itertools.product(*choices)]
+
+    def runs(self):
+        """Get a list of (run_id, params, seed) tuples for every run.  Runs
+        already in the manifest keep their ID, and new runs are numbered after
+        those.
+        """
+
+        runs = self.manifest['runs']
+        known = {}
+        for (run_id, run) in runs.items():
+            params = tuple(tuple(p) for p in run['params'])
+            known[(params, run['seed'])] = run_id
+
+        next_id = 0
+        for run_id in runs:
+            next_id = max(next_id, int(run_id.split('-')[1]) + 1)
+
+        retval = []
+        for params in self.combinations():
+            for seed in self.seeds:
+                key = (tuple(tuple(p) for p in params), seed)
+                run_id = known.get(key)
+                if run_id is None:
+                    run_id = "run-{n:04d}".format(n=next_id)
+                    known[key] = run_id
+                    next_id += 1
+                retval.append((run_id, params, seed))
+
+        return retval
+
+    def is_complete(self, run_id):
+        """Whether or not the given run has completed and its data directory
+        still exists
+        """
+
+        run = self.manifest['runs'].get(run_id)
+        return run is not None and run['status'] == 'complete' and \
+                os.path.isdir(run['data_dir'])
+
+    def write_manifest(self):
+        """Write the manifest.  It is first written to a temporary file, which
+        then replaces the manifest, so that an interruption does not leave a
+        partially-written manifest.
+        """
+
+        tmpfile = self.manifest_file + '.tmp'
+        with open(tmpfile, 'w') as handle:
+            json.dump(self.manifest, handle, indent=2, sort_keys=True)
+        os.rename(tmpfile, self.manifest_file)
+
+    def _next_result(self, results):
+        """Wait for the next result from a pool's imap iterator.  Waiting
+        with a timeout allows interrupts to be received.  The timeout is kept
+        short, since very long timeouts are not supported on every platform.
+        """
+
+        while True:
+            try:
+                return results.next(timeout=1.0)
+            except multiprocessing.TimeoutError:
+                pass
+
+    def run(self, processes=None, callback=None):
+        """Run every Experiment that has not completed.  The result is a list
+        of the results of the runs performed, each of which is a dict with the
+        run_id, status, elapsed time, and any error.
+
+        Parameters:
+
+        *processes*
+            The number of processes to use (default: the number of CPUs).  If
+            1, Experiments are run in this process.
+        *callback*
+            A function called with the result of each run as it finishes
+            (default: None)
+
+        """
+
+        if not os.path.isdir(self.sweep_dir):
+            os.makedirs(self.sweep_dir)
+
+        tasks = []
+        for (run_id, params, seed) in self.runs():
+            if self.is_complete(run_id):
+                continue
+
+            data_dir = os.path.join(self.sweep_dir, run_id)
+            self.manifest['runs'][run_id] = {'params': [list(p) for p in params],
+                                             'seed': seed,
+                                             'data_dir': data_dir,
+                                             'status': 'pending'}
+            tasks.append((run_id, self.configfile, params, seed, data_dir,
+                          self.label))
+
+        self.write_manifest()
+
+        if len(tasks) == 0:
+            return []
+
+        if processes == 1:
+            pool = None
+            results = (_run_worker(t) for t in tasks)
+        else:
+            # Each process runs one Experiment so that plugins and global
+            # random state do not carry over between runs
+            pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                        maxtasksperchild=1)
+            results = pool.imap_unordered(_run_worker, tasks)
+
+        finished = []
+        try:
+            for i in range(len(tasks)):
+                if pool is None:
+                    result = next(results)
+                else:
+                    result = self._next_result(results)
+
+                run = self.manifest['runs'][result['run_id']]
+                for key in ['status', 'error', 'traceback', 'uuid', 'epochs',
+                            'elapsed']:
+                    run[key] = result[key]
+                self.write_manifest()
+
+                finished.append(result)
+                if callback is not None:
+                    callback(result)
+        except:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            raise
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        return finished
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Measure where the time of each epoch is spent.
+
+When the timing option is enabled, the Experiment creates a Timer, which runs
+each phase of an epoch and records how long it took: the update of each Action
+(by configuration section), each Resource, and the Population, followed by
+writing data files and checkpoints.  For the Population, the number of Cell
+updates (events) is also recorded.  When timing is disabled, no Timer is
+created, and epochs are run exactly as before.
+
+Times are written to a data file with one row per phase per epoch, and a
+summary of all epochs is written when the Experiment is torn down.  The
+totals for each phase are saved in checkpoints, so the summary of a resumed
+Experiment covers every epoch.  Since the time taken to write a checkpoint is
+only known once it has been written, the 'checkpoint' and 'epoch' rows of a
+checkpointed epoch follow the position saved in the checkpoint.  When
+resuming, these rows are kept rather than discarded.
+
+A Timer can also run profilers at chosen epochs.  Each profile hook is a pair
+of functions, start(epoch) and stop(epoch), that are called before and after
+the epochs listed in profile_epochs.  By default, cProfile is used, and the
+statistics for each profiled epoch are saved to a file that can be read with
+the pstats module.  Other profilers (e.g., a sampling profiler attached to the
+process) can be started and stopped by adding hooks with add_profile_hook.
+
+Configuration: The following options can be set in the [Experiment] section.
+
+timing
+    Whether or not to time each phase of every epoch (Boolean, default: False)
+timing_file
+    The name of the data file to which times are written (default:
+    timing.csv).  Columns are epoch, phase, seconds, and events.
+timing_summary_file
+    The name of the file to which the summary is written (default:
+    timing_summary.txt)
+profile_epochs
+    A list of the epochs to profile, given as a comma-separated list of
+    epochs and ranges of epochs (e.g., 10,100-102).  (default: none)
+profiler
+    The profiler to run at those epochs.  If 'cprofile', cProfile is used and
+    its statistics are written to profile-<epoch>.prof.  If 'none', only
+    hooks added with add_profile_hook are run.  (default: cprofile)
+
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import os
+import time
+
+from seeds.SEEDSError import *
+from seeds.utils.parsing import parse_int_rangelist
+
+# The most precise clock available for measuring intervals
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class Timer(object):
+    """Time the phases of each epoch of an Experiment
+
+    Properties:
+
+    experiment
+        A reference to the Experiment
+    phases
+        A dict mapping the name of each phase to a list [count, total
+        seconds, minimum seconds, maximum seconds, total events]
+    order
+        A list of the names of the phases in the order in which they were
+        first recorded
+    profile_epochs
+        A set of the epochs at which profile hooks are run
+    profile_hooks
+        A list of (start, stop) tuples of functions that are called with the
+        epoch before and after each profiled epoch
+    writer
+        The BufferedCSVWriter to which times are written
+
+    """
+
+    def __init__(self, experiment):
+        """Initialize a Timer object and open its data file
+
+        Parameters:
+
+        *experiment*
+            A reference to the Experiment
+
+        """
+
+        self.experiment = experiment
+        self.epoch = experiment.epoch
+        self.phases = {}
+        self.order = []
+        self.profile_hooks = []
+
+        config = experiment.config
+        section = experiment.config_section
+
+        self.filename = config.get(section, 'timing_file', default='timing.csv')
+        self.summary_filename = config.get(section, 'timing_summary_file',
+                                           default='timing_summary.txt')
+        self.profile_epochs = set(parse_int_rangelist(config.get(section, 'profile_epochs', default='')))
+
+        profiler = config.get(section, 'profiler', default='cprofile')
+        if profiler == 'cprofile':
+            self._profile = None
+            self.add_profile_hook(self._start_cprofile, self._stop_cprofile)
+        elif profiler != 'none':
+            raise ConfigurationError("Timer: Unknown profiler '{p}'".format(p=profiler))
+
+        # Keep the rows of the checkpointed epoch that were written after the
+        # checkpoint, up to and including its 'epoch' row
+        path = self.datafile_path(self.filename)
+        self._resumed_rows = []
+        for row in experiment.output.read_discarded_rows(path):
+            self._resumed_rows.append(row)
+            if row[1] == 'epoch':
+                break
+
+        self.writer = experiment.output.open_csv(path, ['epoch', 'phase', 'seconds', 'events'])
+        for row in self._resumed_rows:
+            self.writer.writevalues(row)
+
+    def __str__(self):
+        """Produce a string to be used when a Timer object is printed"""
+        return "Timer [Phases: {n}]".format(n=len(self.phases))
+
+    def datafile_path(self, filename):
+        """Get the path of a file in the data directory"""
+        return os.path.join(self.experiment.output.data_dir, filename)
+
+    def add_profile_hook(self, start, stop):
+        """Add functions to be called before and after each profiled epoch
+
+        Parameters:
+
+        *start*
+            A function called with the epoch before the epoch is run
+        *stop*
+            A function called with the epoch after the epoch is run, including
+            writing data files
+
+        """
+
+        self.profile_hooks.append((start, stop))
+
+    def record(self, phase, seconds, events=None):
+        """Record the time taken by a phase of the current epoch
+
+        Parameters:
+
+        *phase*
+            The name of the phase
+        *seconds*
+            The time taken, in seconds
+        *events*
+            The number of events performed during the phase, if meaningful
+            (default: None)
+
+        """
+
+        self._add(phase, seconds, events)
+        if events is None:
+            events = ''
+
+        self.writer.writevalues([self.epoch, phase, seconds, events])
+
+    def _add(self, phase, seconds, events):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = [0, 0.0, seconds, seconds, 0]
+            self.order.append(phase)
+
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = min(stats[2], seconds)
+        stats[3] = max(stats[3], seconds)
+        if events is not None:
+            stats[4] += events
+
+    def begin_epoch(self):
+        """Start timing an epoch.  The result is the time at which it
+        started.
+        """
+
+        self.epoch = self.experiment.epoch
+        if self.epoch in self.profile_epochs:
+            for (start, stop) in self.profile_hooks:
+                start(self.epoch)
+
+        return clock()
+
+    def update(self):
+        """Update the Actions, Resources, and Population, recording the time
+        taken by each
+        """
+
+        experiment = self.experiment
+
+        for a in experiment.actions:
+            start = clock()
+            a.update()
+            self.record('action:' + a.config_section, clock() - start)
+
+        for name in experiment.resources:
+            start = clock()
+            experiment.resources[name].update()
+            self.record('resource:' + name, clock() - start)
+
+        population = experiment.population
+        start = clock()
+        population.update()
+        self.record('population', clock() - start, events=population.events)
+
+    def run(self, phase, func):
+        """Call func and record the time it took as the given phase
+
+        Parameters:
+
+        *phase*
+            The name of the phase
+        *func*
+            The function to call
+
+        """
+
+        start = clock()
+        func()
+        self.record(phase, clock() - start)
+
+    def end_epoch(self, started):
+        """Finish timing an epoch
+
+        Parameters:
+
+        *started*
+            The time at which the epoch started, as given by begin_epoch
+
+        """
+
+        self.record('epoch', clock() - started)
+
+        if self.epoch in self.profile_epochs:
+            for (start, stop) in reversed(self.profile_hooks):
+                stop(self.epoch)
+
+    def _start_cprofile(self, epoch):
+        import cProfile
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def _stop_cprofile(self, epoch):
+        self._profile.disable()
+        self._profile.dump_stats(self.datafile_path("profile-%06d.prof" % (epoch)))
+        self._profile = None
+
+    def get_checkpoint(self):
+        """Get the state of the Timer to be saved in a checkpoint (see
+        seeds.Checkpoint)
+        """
+
+        return {'phases': dict((phase, list(stats)) for (phase, stats) in self.phases.items()),
+                'order': list(self.order)}
+
+    def restore_checkpoint(self, state):
+        """Restore the state of the Timer saved in a checkpoint.  The times of
+        the checkpointed epoch that were recorded after the checkpoint was
+        written (see above) are added back.
+
+        Parameters:
+
+        *state*
+            The state saved by get_checkpoint
+
+        """
+
+        self.epoch = self.experiment.epoch
+        self.phases = dict((phase, list(stats)) for (phase, stats) in state['phases'].items())
+        self.order = list(state['order'])
+
+        for (epoch, phase, seconds, events) in self._resumed_rows:
+            if events == '':
+                events = None
+            else:
+                events = int(events)
+            self._add(phase, float(seconds), events)
+        self._resumed_rows = []
+
+    def summary(self):
+        """Get a summary of the time taken by each phase as a string.  For
+        each phase, the number of times it was run and the total, mean,
+        minimum, and maximum time are given, along with its share of the time
+        spent in epochs.  For phases that record events, the number of events
+        per second is also given.
+        """
+
+        epoch_total = self.phases.get('epoch', [0, 0.0])[1]
+
+        lines = ["%-40s %8s %12s %12s %12s %12s %7s %14s" % ('phase', 'count',
+                                                           'total (s)',
+                                                           'mean (s)',
+                                                           'min (s)',
+                                                           'max (s)',
+                                                           'share',
+                                                           'events/s')]
+
+        for phase in self.order:
+            (count, total, low, high, events) = self.phases[phase]
+            if epoch_total > 0 and phase != 'setup':
+                share = "%6.1f%%" % (100.0 * total / epoch_total)
+            else:
+                share = ''
+            if events > 0 and total > 0:
+                rate = "%14.1f" % (events / total)
+            else:
+                rate = ''
+
+            lines.append("%-40s %8d %12.6f %12.6f %12.6f %12.6f %7s %14s" % (phase, count, total,
+                                                                          total / count,
+                                                                          low, high,
+                                                                          share, rate))
+
+        return "\n".join(lines) + "\n"
+
+    def teardown(self):
+        """Write the summary"""
+        with open(self.datafile_path(self.summary_filename), 'w') as handle:
+            handle.write(self.summary())
@@ -12,13 +12,27 @@ can potentially interact with each other.
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly, Luis Zaman"
 
-from math import sqrt
+from math import ceil, sqrt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 import networkx as nx
 from networkx.exception import *
 
 from seeds.SEEDSError import *
 from seeds.utils.geometry import euclidean_distance
+from seeds.utils.graphs import csr_adjacency, csr_edges, csr_graph, \
+        csr_neighbor_sum, csr_row_cumsum, lattice_adjacency, lattice_degrees, lattice_graph, \
+        lattice_nth_neighbors, lattice_neighbor_sum, lattice_neighbors
+from seeds.utils.spatial import KDTree
+
+# A very small number added to distances when they are inverted to weigh
+# interactions, which avoids dividing by zero for neighbors at the same
+# location (e.g., a Cell that is its own neighbor in a well-mixed topology)
+DISTANCE_EPSILON = pow(1.02, -10000)
 
 
 class Topology(object):
@@ -38,9 +52,53 @@ class Topology(object):
             the edges of the space (default: False)
         label
             A unique label identifying a configuration for the Topology
+        static_neighbors
+            Whether or not the neighbors of each node are given by the edges
+            of the graph.  Topologies that choose neighbors in some other way
+            (e.g., randomly) should set this to False.  (default: True)
+
+    Topologies whose structure can be computed directly (e.g., lattices) may
+    create their adjacency without a graph.  These set graph to None when
+    initialized and define make_graph, which is then used to build the graph
+    the first time it is requested.  Until then, attributes given to nodes
+    with set_node_attribute are held by the Topology and are added to the
+    graph when it is built.  Code that does not need a graph should use
+    nodes, num_nodes, has_node, edges, get_neighbors, and get_coords, which
+    do not require one.
+
+    For topologies with static neighbors, get_adjacency provides the adjacency
+    of the graph in compressed sparse row (CSR) form.  This is built once and
+    is invalidated whenever nodes or edges are added or removed.  neighbor_sum
+    uses this to sum values over each node's neighbors.  The distance spanned
+    by each edge (get_edge_distances) and the inverse of these distances
+    (get_inverse_edge_distances) are stored in arrays aligned with the
+    adjacency and are invalidated along with it.  get_degrees,
+    get_nth_neighbors, and choose_neighbors look up the neighbors of many
+    nodes at once.
+
+    Cells and ResourceCells keep a list of their neighbors unless
+    cache_neighbors is False, in which case the list is found each time it is
+    used.
+
+    If fully_connected is True, every node (including itself) is a neighbor
+    of every node, so a Population gives every Cell the same list of
+    neighbors.
+
+    If mean_field is True, Cells are updated as if their neighbors were drawn
+    from the whole population (see Population.update_mean_field).
+
+    Nodes can be found by location with get_nearest_node and
+    get_nodes_within, which use a KDTree of the nodes' coordinates.  This is
+    built the first time it is needed and is kept up to date as nodes are
+    added and removed.
 
     """
 
+    static_neighbors = True
+    cache_neighbors = True
+    fully_connected = False
+    mean_field = False
+
     def __init__(self, experiment, label=None):
         """Initialize a Topology object.
 
@@ -56,16 +114,96 @@ class Topology(object):
         """
 
         self.experiment = experiment
-        self.graph = nx.Graph()
+        self._graph = nx.Graph()
+        self._node_attributes = {}
         self.periodic = False
         self.label = label
         self.config_section = None
         self.dimensions = 0
+        self._adjacency = None
+        self._edge_data = {}
+        self._spatial_index = None
 
     def __str__(self):
         """Return a string to be used when a Topology object is printed"""
         return 'SEEDS Topology'
 
+    @property
+    def graph(self):
+        """The NetworkX graph defining the connections between nodes.  If the
+        Topology has not yet built its graph, it is built by make_graph.
+        """
+
+        if self._graph is None:
+            graph = self.make_graph()
+            for (name, values) in self._node_attributes.items():
+                for (n, value) in values.items():
+                    graph.node[n][name] = value
+            self._node_attributes = {}
+            self._graph = graph
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph):
+        self._graph = graph
+
+    def make_graph(self):
+        """Build the graph of a Topology that was created without one.  By
+        default, the graph is built from the adjacency given by get_adjacency,
+        and each node is given its coordinates from get_coords.
+        """
+
+        (indptr, indices) = self.get_adjacency()
+        graph = csr_graph(indptr, indices)
+        for n in graph.nodes():
+            graph.node[n]['coords'] = self.get_coords(n)
+        return graph
+
+    def nodes(self):
+        """Get a list of the IDs of the nodes in the topology"""
+        return self.graph.nodes()
+
+    def edges(self):
+        """Get a list of the edges in the topology as (src, dest) tuples"""
+        return self.graph.edges()
+
+    def has_node(self, node):
+        """Determine whether or not the topology contains the given node"""
+        return self.graph.has_node(node)
+
+    def get_coords(self, node):
+        """Get the coordinates of the given node as a tuple
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        return self.graph.node[node]['coords']
+
+    def set_node_attribute(self, node, name, value):
+        """Give a node an attribute, such as the Cell residing in it.  If the
+        graph has been built, this is stored as a property of the node.
+        Otherwise, it is held until the graph is built.
+
+        Parameters:
+
+        *node*
+            The ID of the node
+        *name*
+            The name of the attribute
+        *value*
+            The value of the attribute
+
+        """
+
+        if self._graph is None:
+            self._node_attributes.setdefault(name, {})[node] = value
+        else:
+            self._graph.node[node][name] = value
+
     def get_neighbors(self, node):
         """Get a list of neighboring nodes (ids) for a given node
 
@@ -78,6 +216,181 @@ class Topology(object):
 
         return self.graph.neighbors(node)
 
+    def get_adjacency(self):
+        """Get the adjacency of the graph in compressed sparse row (CSR) form.
+        This is a tuple (indptr, indices) of read-only int32 arrays, where the
+        neighbors of node n are indices[indptr[n]:indptr[n+1]] (in the same
+        order given by get_neighbors).  The arrays are built the first time
+        they are requested and reused until the graph changes.  This requires
+        NumPy.
+
+        ConfigurationError is raised if the topology does not have static
+        neighbors.
+
+        """
+
+        if not self.static_neighbors:
+            raise ConfigurationError("{top} does not have a fixed adjacency".format(top=self.__class__.__name__))
+
+        if self._adjacency is None:
+            self._adjacency = csr_adjacency(self.graph)
+        return self._adjacency
+
+    def get_degrees(self, nodes):
+        """Get the number of neighbors of each of the given nodes as an
+        array.  This requires NumPy and static neighbors.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        (indptr, indices) = self.get_adjacency()
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return indptr[nodes + 1] - indptr[nodes]
+
+    def get_nth_neighbors(self, nodes, positions):
+        """Get the neighbor at the given position in the neighbor list (as
+        given by get_neighbors) of each of the given nodes.  The result is an
+        array aligned with nodes.  Each position must be less than that node's
+        degree.  This requires NumPy and static neighbors.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+        *positions*
+            An array of positions in the neighbor lists, aligned with nodes
+
+        """
+
+        (indptr, indices) = self.get_adjacency()
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return indices[indptr[nodes] + positions]
+
+    def choose_neighbors(self, nodes):
+        """Choose one neighbor of each of the given nodes uniformly at random
+        using the Experiment's NumPy random number generator.  The result is
+        an array aligned with nodes.  Each node must have at least one
+        neighbor.  This requires NumPy and, unless a topology overrides it,
+        static neighbors.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        degrees = self.get_degrees(nodes)
+        draws = self.experiment.rng.random_sample(len(degrees))
+        return self.get_nth_neighbors(nodes, (draws * degrees).astype(np.int64))
+
+    def neighbor_sum(self, values):
+        """Sum the values of each node's neighbors.  The result is an array
+        indexed by node ID.  This requires NumPy and static neighbors.
+        Topologies with more structure (e.g., lattices) may override this with
+        faster methods.
+
+        Parameters:
+
+        *values*
+            An array of values indexed by node ID
+
+        """
+
+        (indptr, indices) = self.get_adjacency()
+        return csr_neighbor_sum(indptr, indices, values)
+
+    def get_edge_distances(self):
+        """Get the distance between the nodes connected by each edge.  The
+        result is a read-only array aligned with the indices array of the
+        adjacency (see get_adjacency), so the distances from node n to its
+        neighbors are at positions indptr[n]:indptr[n+1].  Distances are
+        calculated from the nodes' 'coords' in the same way as node_distance.
+        This requires NumPy and static neighbors.
+        """
+
+        if 'distance' not in self._edge_data:
+            (indptr, indices) = self.get_adjacency()
+            size = len(indptr) - 1
+
+            coords = np.zeros((size, self.dimensions))
+            for n in self.nodes():
+                coords[n] = self.get_coords(n)
+
+            rows = np.repeat(np.arange(size), np.diff(indptr))
+            diff = np.abs(coords[rows] - coords[indices])
+            if self.periodic:
+                diff = np.minimum(diff, np.abs(1 - diff))
+
+            distances = np.sqrt((diff**2).sum(axis=1))
+            distances.flags.writeable = False
+            self._edge_data['distance'] = distances
+
+        return self._edge_data['distance']
+
+    def get_inverse_edge_distances(self, cumulative=False):
+        """Get the inverse of the distance spanned by each edge.  These are
+        the weights used for distance-dependent interactions, where nearby
+        neighbors are more likely to be chosen.  DISTANCE_EPSILON is added to
+        each distance to avoid dividing by zero.  The result is a read-only
+        array aligned with get_edge_distances.
+
+        Parameters:
+
+        *cumulative*
+            If True, return the running sums of the inverse distances within
+            each node's edges instead (see csr_row_cumsum).  This allows a
+            neighbor to be chosen in proportion to its weight with a binary
+            search (see csr_row_select).  (default: False)
+
+        """
+
+        if 'inverse_distance' not in self._edge_data:
+            inverse = 1.0 / (self.get_edge_distances() + DISTANCE_EPSILON)
+            inverse.flags.writeable = False
+            self._edge_data['inverse_distance'] = inverse
+
+            total = csr_row_cumsum(self.get_adjacency()[0], inverse)
+            total.flags.writeable = False
+            self._edge_data['cumulative_inverse_distance'] = total
+
+        if cumulative:
+            return self._edge_data['cumulative_inverse_distance']
+        return self._edge_data['inverse_distance']
+
+    def get_neighbor_distances(self, node):
+        """Get a list of the distances from the given node to each of its
+        neighbors, in the order given by get_neighbors.  For topologies with
+        static neighbors, these are read from get_edge_distances if NumPy is
+        available.
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        if self.static_neighbors and np is not None:
+            (indptr, indices) = self.get_adjacency()
+            return self.get_edge_distances()[indptr[node]:indptr[node+1]].tolist()
+
+        return [self.node_distance(node, n) for n in self.get_neighbors(node)]
+
+    def invalidate_adjacency(self):
+        """Discard any cached representations of the graph's adjacency,
+        including edge distances.  This should be called by any code that
+        changes the graph directly rather than through add_node, remove_node,
+        add_edge, or remove_edge.
+        """
+
+        self._adjacency = None
+        self._edge_data = {}
+
     def num_nodes(self):
         """Get the number of nodes in the topology"""
         return len(self.graph)
@@ -101,13 +414,12 @@ class Topology(object):
 
         """
 
-        if src not in self.graph.nodes():
+        if not self.has_node(src):
             raise NonExistentNodeError(src)
-        elif dest not in self.graph.nodes():
+        elif not self.has_node(dest):
             raise NonExistentNodeError(dest)
 
-        return euclidean_distance(self.graph.node[src]['coords'],
-                                  self.graph.node[dest]['coords'],
+        return euclidean_distance(self.get_coords(src), self.get_coords(dest),
                                   periodic=self.periodic)
 
     def add_node(self, id=None, neighbors=[], coords=None):
@@ -153,11 +465,14 @@ class Topology(object):
         self.graph.node[id]['coords'] = coords
 
         for n in neighbors:
-            if n not in self.graph.nodes():
+            if not self.graph.has_node(n):
                 raise NonExistentNodeError(n)
             self.graph.add_edge(id, n)
 
         self.size = len(self.graph)
+        self.invalidate_adjacency()
+        if self._spatial_index is not None:
+            self._spatial_index.insert(id, coords)
 
     def remove_node(self, id):
         """Remove a node from the graph.  Topologies that do not wish to
@@ -180,6 +495,10 @@ class Topology(object):
         except NetworkXError as err:
             raise NonExistentNodeError(id)
 
+        self.invalidate_adjacency()
+        if self._spatial_index is not None:
+            self._spatial_index.remove(id)
+
     def add_edge(self, src, dest):
         """Add an edge between the given two nodes.  Although NetworkX creates
         new node(s) when non-existent nodes are given as arguments to
@@ -195,12 +514,13 @@ class Topology(object):
 
         """
 
-        if src not in self.graph.nodes():
+        if not self.graph.has_node(src):
             raise NonExistentNodeError(src)
-        elif dest not in self.graph.nodes():
+        elif not self.graph.has_node(dest):
             raise NonExistentNodeError(dest)
         else:
             self.graph.add_edge(src, dest)
+            self.invalidate_adjacency()
 
     def remove_edge(self, src, dest):
         """Remove the edge between the given two nodes.  This method will raise
@@ -221,8 +541,27 @@ class Topology(object):
         except NetworkXError as err:
             raise NonExistentEdgeError(src, dest)
 
+        self.invalidate_adjacency()
+
+    def spatial_index(self):
+        """Get the KDTree of the coordinates of the nodes, keyed by node ID.
+        This is built the first time it is requested and updated by add_node
+        and remove_node.
+        """
+
+        if self._spatial_index is None:
+            self._spatial_index = KDTree(((n, self.get_coords(n)) for n in self.nodes()),
+                                         dimensions=self.dimensions,
+                                         periodic=self.periodic)
+        return self._spatial_index
+
+    def _check_coords(self, coords):
+        if not coords or len(coords) != self.dimensions:
+            raise SEEDSError("Coordinates do not match topology dimensions")
+
     def get_nearest_node(self, coords, n=1):
-        """Return a list of  the node(s) located nearest the given coordinates
+        """Return a list of  the node(s) located nearest the given coordinates,
+        nearest first.  Nodes at the same distance are ordered by ID.
 
         Parameters:
 
@@ -234,12 +573,29 @@ class Topology(object):
 
         """
 
-        if not coords or len(coords) < 1:
-            return
-        elif n < 1:
-            # TODO: print warning or throw an exception 
-            # TODO: search the KD tree for the coordinates
-            return
+        self._check_coords(coords)
+        if n < 1:
+            raise SEEDSError("Number of nearest nodes must be at least 1")
+
+        return [node for (d, node) in self.spatial_index().nearest(coords, k=n)]
+
+    def get_nodes_within(self, coords, radius):
+        """Return a list of the nodes located within the given distance of the
+        given coordinates, nearest first.  Nodes at the same distance are
+        ordered by ID.
+
+        Parameters:
+
+        coords
+            Tuple defining the point in question.  The number of dimensions
+            should match the number of dimensions of the topology.
+        radius
+            The maximum distance from the point
+
+        """
+
+        self._check_coords(coords)
+        return [node for (d, node) in self.spatial_index().within(coords, radius)]
 
     def relabel_nodes(self):
         """Relabel the nodes in the graph so that labels are numbers from
@@ -251,3 +607,298 @@ class Topology(object):
             M[self.graph.nodes()[i]] = i
         
         self.graph = nx.relabel_nodes(self.graph, M)
+        self.invalidate_adjacency()
+        self._spatial_index = None
+
+
+class LatticeTopology(Topology):
+    """
+    Base for topologies whose nodes are arranged on a square lattice of size
+    x size nodes.  The node at a given row and column has ID row * size +
+    column, and its coordinates are (row / size, column / size).  Each node is
+    connected to the nodes at the (row, column) offsets given by
+    lattice_offsets, which subclasses define.
+
+    The adjacency of the lattice is computed directly from these offsets, so
+    no graph is built unless the graph property is used.  Without NumPy, the
+    graph is always built.
+
+    In implicit mode, nothing is stored for the edges of the lattice.  Each
+    node's neighbors are computed from the offsets whenever they are needed,
+    Cells and ResourceCells do not keep lists of their neighbors, and batch
+    lookups (get_degrees, get_nth_neighbors, neighbor_sum) are computed one
+    offset at a time.  get_adjacency still works, but the adjacency is built
+    each time it is requested, and edge distances (used for distance-dependent
+    interactions) are still stored per edge.  This allows very large lattices
+    to be used at the cost of recomputing neighbors on each use.  Without
+    NumPy, implicit mode also avoids building the graph.
+
+    Properties (in addition to those of Topology):
+
+        size
+            The number of nodes along each side of the lattice
+        radius
+            The radius of each node's neighborhood
+        implicit
+            Whether or not neighbors are computed on demand instead of stored
+
+    """
+
+    def __init__(self, experiment, label=None):
+        """Initialize a LatticeTopology object.  Subclasses must set size,
+        radius, and periodic.
+
+        Parameters:
+
+        *experiment*
+            A reference to the Experiment
+        *label*
+            A unique label identifying a configuration for the Topology
+
+        """
+
+        super(LatticeTopology, self).__init__(experiment, label=label)
+        self.graph = None
+        self.size = 0
+        self.radius = 0
+        self.dimensions = 2
+        self.implicit = False
+        self._offsets = None
+
+    @property
+    def cache_neighbors(self):
+        """Cells keep lists of their neighbors unless implicit mode is used"""
+        return not self.implicit
+
+    def row(self, nodeid):
+        """Get the number of the row in which the given node is located
+
+        Parameters:
+
+        *nodeid*
+            The ID of the node in question
+
+        """
+        return nodeid // self.size
+
+    def column(self, nodeid):
+        """Get the number of the column in which the given node is located
+
+        Parameters:
+
+        *nodeid*
+            The ID of the node in question
+
+        """
+        return nodeid % self.size
+
+    def node_id(self, row, col):
+        """Get the ID of the node at the given row and column
+
+        Parameters:
+
+        *row*
+            The row in which the node is located
+        *col*
+            The column in which the node is located
+
+        """
+        return row * self.size + col
+
+    def lattice_offsets(self):
+        """Get a list of the (row, column) offsets from a node to each of its
+        neighbors on the lattice.  This must be defined by subclasses.
+        """
+        raise NotImplementedError
+
+    def offsets(self):
+        """Get the lattice offsets (see lattice_offsets), which are only
+        computed once
+        """
+
+        if self._offsets is None:
+            self._offsets = self.lattice_offsets()
+        return self._offsets
+
+    def lattice_graph(self):
+        """Build a NetworkX graph of the lattice (see make_graph)"""
+        return lattice_graph(self.size, self.size, self.offsets(),
+                             periodic=self.periodic)
+
+    def make_graph(self):
+        """Build the graph of the lattice, giving each node its coordinates"""
+        graph = self.lattice_graph()
+        for n in graph.nodes():
+            graph.node[n]['coords'] = self.get_coords(n)
+        return graph
+
+    def get_adjacency(self):
+        """Get the adjacency of the lattice in compressed sparse row (CSR)
+        form (see Topology.get_adjacency).  Unless the graph has been built,
+        this is computed from the lattice offsets.  In implicit mode, it is
+        computed each time and not kept.  This requires NumPy.
+        """
+
+        if self.implicit:
+            return lattice_adjacency(self.size, self.size,
+                                     self.offsets(),
+                                     periodic=self.periodic)
+
+        if self._adjacency is None and self._graph is None:
+            self._adjacency = lattice_adjacency(self.size, self.size,
+                                                self.offsets(),
+                                                periodic=self.periodic)
+        return super(LatticeTopology, self).get_adjacency()
+
+    def get_neighbors(self, node):
+        """Get a list of neighboring nodes (ids) for a given node.  These are
+        in the order of the lattice offsets.
+
+        Parameters:
+
+        *node*
+            The ID of the node whose neighboring cells to get
+
+        """
+
+        if self.implicit:
+            return lattice_neighbors(self.size, self.size,
+                                     self.offsets(), node,
+                                     periodic=self.periodic)
+        elif np is None:
+            return self.graph.neighbors(node)
+
+        (indptr, indices) = self.get_adjacency()
+        return indices[indptr[node]:indptr[node+1]].tolist()
+
+    def get_degrees(self, nodes):
+        """Get the number of neighbors of each of the given nodes as an array
+        (see Topology.get_degrees)
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        if self.implicit:
+            return lattice_degrees(self.size, self.size,
+                                   self.offsets(), nodes,
+                                   periodic=self.periodic)
+        return super(LatticeTopology, self).get_degrees(nodes)
+
+    def get_nth_neighbors(self, nodes, positions):
+        """Get the neighbor at the given position in the neighbor list of each
+        of the given nodes (see Topology.get_nth_neighbors)
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+        *positions*
+            An array of positions in the neighbor lists, aligned with nodes
+
+        """
+
+        if self.implicit:
+            return lattice_nth_neighbors(self.size, self.size,
+                                         self.offsets(), nodes,
+                                         positions, periodic=self.periodic)
+        return super(LatticeTopology, self).get_nth_neighbors(nodes, positions)
+
+    def nodes(self):
+        """Get a list of the IDs of the nodes in the topology"""
+        if self._graph is None:
+            return list(range(self.size * self.size))
+        return self._graph.nodes()
+
+    def edges(self):
+        """Get a list of the edges in the topology as (src, dest) tuples"""
+        if self._graph is None:
+            if np is not None:
+                (src, dest) = csr_edges(*self.get_adjacency())
+                return list(zip(src.tolist(), dest.tolist()))
+            elif self.implicit:
+                return [(n, m) for n in self.nodes()
+                        for m in self.get_neighbors(n) if n < m]
+        return self.graph.edges()
+
+    def has_node(self, node):
+        """Determine whether or not the topology contains the given node"""
+        if self._graph is None:
+            return 0 <= node < self.size * self.size
+        return self._graph.has_node(node)
+
+    def num_nodes(self):
+        """Get the number of nodes in the topology"""
+        if self._graph is None:
+            return self.size * self.size
+        return len(self._graph)
+
+    def get_coords(self, node):
+        """Get the coordinates of the given node as a tuple
+
+        Parameters:
+
+        *node*
+            The ID of the node
+
+        """
+
+        return (self.row(node) / float(self.size),
+                self.column(node) / float(self.size))
+
+    def get_nearest_node(self, coords, n=1):
+        """Return a list of the node(s) located nearest the given coordinates
+        (see Topology.get_nearest_node).  The single nearest node is found
+        directly from the coordinates, without the KDTree.
+
+        Parameters:
+
+        coords
+            Tuple defining the point in question.  The number of dimensions
+            should match the number of dimensions of the topology.
+        n
+            The number of nearest neighbors to find
+
+        """
+
+        if n != 1:
+            return super(LatticeTopology, self).get_nearest_node(coords, n=n)
+
+        self._check_coords(coords)
+
+        # Points halfway between two rows or columns go to the lower one
+        position = []
+        for x in coords:
+            p = int(ceil(x * self.size - 0.5))
+            if self.periodic:
+                p %= self.size
+            else:
+                p = min(max(p, 0), self.size - 1)
+            position.append(p)
+
+        return [self.node_id(*position)]
+
+    def neighbor_sum(self, values):
+        """Sum the values of each node's neighbors.  The result is an array
+        indexed by node ID.  The sums are computed by shifting the lattice of
+        values rather than by visiting the edges of the graph.
+
+        Parameters:
+
+        *values*
+            An array of values indexed by node ID
+
+        """
+
+        # With periodic boundaries, a neighborhood that wraps onto itself
+        # contains some nodes more than once.  The adjacency only has one edge
+        # to each, so it must be used.
+        if self.periodic and 2 * self.radius + 1 > self.size:
+            return super(LatticeTopology, self).neighbor_sum(values)
+
+        grid = values[:self.size * self.size].reshape(self.size, self.size)
+        return lattice_neighbor_sum(grid, self.offsets(),
+                                    periodic=self.periodic).ravel()
@@ -6,10 +6,15 @@ Print the coordinates of each cell and its type
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
-import csv
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from seeds.Action import *
 from seeds.Plugin import *
+from seeds.SEEDSError import *
 
 
 class PrintCellLocations(Action, Plugin):
@@ -33,12 +38,26 @@ class PrintCellLocations(Action, Plugin):
         Base name for files.  The epoch at which the file was created and the
         extension (see format) will also comprise the resulting file name.  For
         example, a filename of 'cell_locations' when run at epoch 1200 would
-        produce the file cell_locations-001200.csv.  (default:
-        'cell_locations')
+        produce the file cell_locations-001200.csv.  With the binary format,
+        all epochs are written to one file with the extension .snap (e.g.,
+        cell_locations.snap).  (default: 'cell_locations')
     header
         Whether or not to write a header to the output file.  The header will
         be an uncommented, comma-separated list of property names corresponding
         to the data in each row. (default: True)
+    format
+        Either 'csv' or 'binary'.  With 'csv', a comma-separated file is
+        written at each epoch.  With 'binary', the ID of each node and its x
+        and y coordinates are written once (and again only if they change),
+        and the type and ID of each Cell are written at each epoch as compact
+        arrays appended to a single snapshot file (see
+        seeds.utils.snapshots).  These files can be read with
+        contrib/utils/read_snapshots.py.  The binary format requires NumPy.
+        (default: csv)
+    compress
+        Whether or not to compress the arrays in binary snapshot files.
+        Compressed files are smaller but can not be memory-mapped.  (default:
+        False)
 
     Configuration Example:
 
@@ -49,6 +68,7 @@ class PrintCellLocations(Action, Plugin):
     priority = 0
     filename = cell_locations
     header = True
+    format = csv
 
     """
 
@@ -71,30 +91,81 @@ class PrintCellLocations(Action, Plugin):
         self.priority = self.experiment.config.getint(self.config_section, 'priority', 0)
         self.filename = self.experiment.config.get(self.config_section, 'filename', 'cell_locations')
         self.header = self.experiment.config.getboolean(self.config_section, 'header', default=True)
+        self.format = self.experiment.config.get(self.config_section, 'format', default='csv')
+        self.compress = self.experiment.config.getboolean(self.config_section, 'compress', default=False)
+
+        if self.format not in ('csv', 'binary'):
+            raise ConfigurationError("PrintCellLocations: Unknown format '{f}'".format(f=self.format))
+
+        self.snapshot = None
+        self.nodes = None
+        if self.format == 'binary':
+            population = self.experiment.population
+            types = population._cell_class.types
+            metadata = {'experiment': str(self.experiment.uuid),
+                        'types': types}
+            self.snapshot = self.experiment.output.open_snapshot(self.datafile_path("%s.snap" % (self.filename)),
+                                                                 compress=self.compress,
+                                                                 metadata=metadata)
+            self.type_dtype = np.min_scalar_type(max(population._cell_class.max_types, len(types), 1) - 1)
 
     def update(self):
         """Execute the Action"""
         if self.skip_update():
 	        return
 
+        if self.snapshot is not None:
+            self.write_snapshot()
+            return
+
         filename = "%s-%06d.csv" % (self.filename, self.experiment.epoch)
-        data_file = self.datafile_path(filename)
         fieldnames = ['epoch','cell_id','node_id','x','y','type']
-        with open(data_file, 'w') as handle:
-            self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-            if self.header:
-                self.writer.writeheader()
-
-            g = self.experiment.population.topology.graph
-            for n in g.nodes():
-                cell = g.node[n]['cell']
-                (xpos, ypos) = cell.coords()
-
-                row = { 'epoch' : self.experiment.epoch,
-                        'cell_id' : cell.id,
-                        'node_id' : cell.node,
-                        'x' : xpos,
-                        'y' : ypos,
-                        'type' : cell.type}
-                self.writer.writerow(row)
 
+        population = self.experiment.population
+        nodes = population.topology.nodes()
+        cells = [population.cells[n] for n in nodes]
+        coords = [cell.coords() for cell in cells]
+
+        columns = [[self.experiment.epoch] * len(cells),
+                   [cell.id for cell in cells],
+                   [cell.node for cell in cells],
+                   [xpos for (xpos, ypos) in coords],
+                   [ypos for (xpos, ypos) in coords],
+                   [cell.type for cell in cells]]
+        self.experiment.output.write_csv(self.datafile_path(filename),
+                                         fieldnames, columns,
+                                         header=self.header)
+
+    def write_snapshot(self):
+        """Append the current epoch to the binary snapshot file.  Copies of
+        the arrays are written by the Experiment's OutputManager, so this may
+        be done in the background.
+        """
+        population = self.experiment.population
+        topology = population.topology
+        nodes = np.array(topology.nodes(), dtype=np.int64)
+
+        if population.state is not None:
+            types = population.state['type'][nodes]
+            ids = population.state['id'][nodes]
+        else:
+            cells = population.cells
+            types = np.array([cells[n].type for n in nodes])
+            ids = np.array([cells[n].id for n in nodes], dtype=np.int64)
+
+        epoch = self.experiment.epoch
+        output = self.experiment.output
+
+        # Node coordinates do not change, so they are only gathered and
+        # written when nodes have been added or removed
+        if self.nodes is None or not np.array_equal(self.nodes, nodes):
+            coords = np.array([topology.get_coords(n)[:2] for n in nodes], dtype=np.float64)
+            coords = coords.reshape((len(nodes), 2))
+            output.submit(self.snapshot.write_static, epoch,
+                          [('node_id', nodes),
+                           ('x', coords[:, 0]),
+                           ('y', coords[:, 1])])
+            self.nodes = nodes
+        output.submit(self.snapshot.write_epoch, epoch,
+                      [('type', types.astype(self.type_dtype)),
+                       ('cell_id', ids)])
@@ -6,9 +6,6 @@ Print the number of Cells for each cell type
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
-
-import csv
-
 from seeds.Action import *
 from seeds.Plugin import *
 
@@ -75,19 +72,14 @@ class PrintCellTypeCount(Action, Plugin):
         self.types = self.experiment.population._cell_class.types
         fieldnames = ['epoch'] + self.types
 
-        data_file = self.datafile_path(self.filename)
-        self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-
-        if self.header:
-            self.writer.writeheader()
+        self.writer = self.open_writer(self.filename, fieldnames)
 
     def update(self):
         """Execute the action"""
         if self.skip_update():
 	        return
 
-        row = {'epoch':self.experiment.epoch}
-        for type, count in zip(self.types, self.experiment.data['population']['type_count']):
-            row[type] = count
-        self.writer.writerow(row)
+        counts = self.experiment.data['population']['type_count'][:len(self.types)]
+        counts = counts + [''] * (len(self.types) - len(counts))
+        self.writer.writevalues([self.experiment.epoch] + counts)
 
@@ -6,9 +6,6 @@ Print the number of transitions between each cell type
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
-
-import csv
-
 from seeds.Action import *
 from seeds.Plugin import *
 
@@ -75,29 +72,21 @@ class PrintCellTypeTransitions(Action, Plugin):
         self.types = self.experiment.population._cell_class.types
         self.max_types = self.experiment.population._cell_class.max_types
 
-        data_file = self.datafile_path(self.filename)
         self.transitions = ['%s->%s' % (ftype, ttype) for ftype in self.types for ttype in self.types]
         fieldnames = ['epoch'] + self.transitions
-        self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-
-        if self.header:
-            self.writer.writeheader()
+        self.writer = self.open_writer(self.filename, fieldnames)
 
     def update(self):
         """Execute the action"""
         if self.skip_update():
 	        return
 
-        row = {'epoch' : self.experiment.epoch}
-
         if self.experiment.epoch == 0:
-            for transition in self.transitions:
-                row[transition] = 0
+            trans_counts = [0] * len(self.transitions)
         else:
-            trans_counts = [self.experiment.data['population']['transitions'][f][t]
+            transitions = self.experiment.data['population']['transitions']
+            trans_counts = [transitions[f][t]
                     for f in range(self.max_types)
-                    for t in range(self.max_types)]
-            for transition, count in zip (self.transitions, trans_counts):
-                row[transition] = count
+                    for t in range(self.max_types)][:len(self.transitions)]
 
-        self.writer.writerow(row)
+        self.writer.writevalues([self.experiment.epoch] + trans_counts)
@@ -10,7 +10,6 @@ __credits__ = "Brian Connelly"
 
 import networkx as nx
 
-import csv
 
 from seeds.Action import *
 from seeds.Plugin import *
@@ -74,16 +73,12 @@ class PrintPopulationGraphProperties(Action, Plugin):
         self.frequency = self.experiment.config.getint(self.config_section, 'frequency', 1)
         self.priority = self.experiment.config.getint(self.config_section, 'priority', 0)
         self.filename = self.experiment.config.get(self.config_section, 'filename', 'population_graph_properties.csv')
-        self.header = self.experiment.config.get(self.config_section, 'header', default=True)
+        self.header = self.experiment.config.getboolean(self.config_section, 'header', default=True)
 
-        data_file = self.datafile_path(self.filename)
         fieldnames = ['epoch', 'nodes', 'edges', 'avg_degree', 'std_degree',
                       'avg_clustering_coefficient','diameter',
                       'num_connected_components']
-        self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-
-        if self.header:
-            self.writer.writeheader()
+        self.writer = self.open_writer(self.filename, fieldnames)
 
     def update(self):
         """Execute the Action"""
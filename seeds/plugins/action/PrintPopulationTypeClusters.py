@@ -6,12 +6,13 @@ in the population.
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
-import networkx as nx
-
-import csv
-import random
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from seeds.Action import *
+from seeds.ClusterTracker import ClusterTracker, label_type_clusters
 from seeds.utils.statistics import mean, std
 
 class PrintPopulationTypeClusters(Action):
@@ -38,7 +39,12 @@ class PrintPopulationTypeClusters(Action):
         Whether or not to write a header to the output file.  The header will
         be an uncommented, comma-separated list of property names corresponding
         to the data in each row. (default: True)
-
+    incremental
+        Whether or not to keep track of clusters as Cells change type rather
+        than finding all clusters each time (see ClusterTracker).  This is
+        faster when only a small fraction of Cells change type between
+        updates.  This requires a topology with static neighbors.  (default:
+        False)
 
     Configuration Example:
 
@@ -49,6 +55,7 @@ class PrintPopulationTypeClusters(Action):
     priority = 0
     filename = population_type_clusters.csv
     header = True
+    incremental = False
 
     """
 
@@ -72,74 +79,90 @@ class PrintPopulationTypeClusters(Action):
         self.frequency = self.experiment.config.getint(self.config_section, 'frequency', 1)
         self.priority = self.experiment.config.getint(self.config_section, 'priority', 0)
         self.filename = self.experiment.config.get(self.config_section, 'filename', 'population_type_clusters.csv')
-        self.header = self.experiment.config.get(self.config_section, 'header', default=True)
+        self.header = self.experiment.config.getboolean(self.config_section, 'header', default=True)
         self.name = "PrintPopulationTypeClusters"
         self.types = self.experiment.population._cell_class.types
 
+        self.tracker = None
+        if self.experiment.config.getboolean(self.config_section, 'incremental', default=False):
+            self.tracker = ClusterTracker(self.experiment.population)
+
         fieldnames = ['epoch', 'total_clusters', 'total_size_mean', 'total_size_std']
         for t in self.types:
             fieldnames.append('%s_clusters' % (t))
             fieldnames.append('%s_size_mean' % (t))
             fieldnames.append('%s_size_std' % (t))
 
-        data_file = self.datafile_path(self.filename)
-        self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-
-        if self.header:
-            self.writer.writeheader()
+        self.writer = self.open_writer(self.filename, fieldnames)
 
     def update(self):
         """Execute the Action"""
         if self.skip_update():
 	        return
 
-        g = self.experiment.population.topology.graph
-        cluster_counts = [0] * len(self.types)
-        cluster_sizes = {}
-
-        for i in range(len(self.types) + 1):
-            cluster_sizes[i] = []
-
-        unvisited = g.nodes()
-
-        while len(unvisited) > 0:
-            node = random.choice(unvisited)
-            type = g.node[node]["cell"].type
-
-            c = cluster(g, node)
-            c_size = len(c)
-            cluster_counts[type] += 1
-            cluster_sizes[type].append(c_size)
-            cluster_sizes[len(self.types)].append(c_size)
-
-            [unvisited.remove(x) for x in c]
+        if self.tracker is not None:
+            summary = [self.tracker.stats(type=i) for i in range(len(self.types))]
+            total = self.tracker.stats()
+        else:
+            summary, total = self.summarize_clusters()
 
         row = { 'epoch' : self.experiment.epoch,
-                'total_clusters' : sum(cluster_counts),
-                'total_size_mean' : mean(cluster_sizes[len(self.types)]),
-                'total_size_std' : std(cluster_sizes[len(self.types)]) }
+                'total_clusters' : total[0],
+                'total_size_mean' : total[1],
+                'total_size_std' : total[2] }
 
         for index, t in enumerate(self.types):
-            if cluster_counts[index] == 0:
-                row['%s_clusters' % (t)] = 0
-                row['%s_size_mean' % (t)] = 0
-                row['%s_size_std' % (t)] = 0
-            else:
-                row['%s_clusters' % (t)] = cluster_counts[index]
-                row['%s_size_mean' % (t)] = mean(cluster_sizes[index])
-                row['%s_size_std' % (t)] = std(cluster_sizes[index])
+            row['%s_clusters' % (t)] = summary[index][0]
+            row['%s_size_mean' % (t)] = summary[index][1]
+            row['%s_size_std' % (t)] = summary[index][2]
 
         self.writer.writerow(row)
 
-def cluster(graph, node):
-    visited_nodes = []
+    def summarize_clusters(self):
+        """Find the number of clusters of each Cell type along with the mean
+        and standard deviation of their sizes.  The result is a tuple
+        (summary, total), where summary is a list of (count, mean, std) tuples
+        indexed by type and total describes all clusters in the same way.
+        Types with no clusters have count, mean, and standard deviation 0.
+        """
 
-    def visit(node):
-        visited_nodes.append(node)
-        for n in graph.neighbors(node):
-            if n not in visited_nodes and graph.node[n]['cell'].type == graph.node[node]['cell'].type:
-                visit(n)
+        cluster_types, sizes = self.find_clusters()
 
-    visit(node)
-    return visited_nodes
+        cluster_sizes = {}
+        for i in range(len(self.types) + 1):
+            cluster_sizes[i] = []
 
+        for (type, c_size) in zip(cluster_types, sizes):
+            cluster_sizes[type].append(c_size)
+            cluster_sizes[len(self.types)].append(c_size)
+
+        summary = []
+        for index in range(len(self.types) + 1):
+            if len(cluster_sizes[index]) == 0:
+                summary.append((0, 0, 0))
+            else:
+                summary.append((len(cluster_sizes[index]),
+                                mean(cluster_sizes[index]),
+                                std(cluster_sizes[index])))
+
+        return (summary[:-1], summary[-1])
+
+    def find_clusters(self):
+        """Find the clusters of connected Cells of the same type.  The result
+        is a tuple of two lists giving the type and the size of each cluster.
+        """
+
+        (nodes, labels, types) = label_type_clusters(self.experiment.population)
+
+        if np is not None and hasattr(labels, 'dtype'):
+            sizes = np.bincount(labels)
+            cluster_types = np.zeros(len(sizes), dtype=np.int64)
+            cluster_types[labels] = types
+            return (cluster_types.tolist(), sizes.tolist())
+
+        cluster_types = {}
+        sizes = {}
+        for (label, type) in zip(labels, types):
+            cluster_types[label] = type
+            sizes[label] = sizes.get(label, 0) + 1
+        return ([cluster_types[l] for l in sizes], [sizes[l] for l in sizes])
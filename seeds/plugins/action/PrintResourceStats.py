@@ -5,9 +5,6 @@
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
-
-import csv
-
 from seeds.Action import *
 from seeds.Plugin import *
 from seeds.SEEDSError import *
@@ -85,12 +82,8 @@ class PrintResourceStats(Action, Plugin):
             raise ConfigurationError("PrintResourceStats: Resource '%s' is undefined" % (self.resource))
 
         full_filename = "%s-%s.csv" % (self.filename, self.resource)
-        data_file = self.datafile_path(full_filename)
         fieldnames = ['epoch', 'mean', 'standard_deviation', 'available']
-        self.writer = csv.DictWriter(open(data_file, 'w'), fieldnames)
-
-        if self.header:
-            self.writer.writerowheader()
+        self.writer = self.open_writer(full_filename, fieldnames)
 
     def update(self):
         """Execute the action"""
@@ -98,9 +91,6 @@ class PrintResourceStats(Action, Plugin):
 	        return
 
         levels = self.experiment.data['resources'][self.resource]['levels']
-        row = { 'epoch' : self.experiment.epoch,
-                'mean' : mean(levels),
-                'standard_deviation' : std(levels),
-                'available' : int(self.res.available)}
-        self.writer.writerow(row)
+        self.writer.writevalues([self.experiment.epoch, mean(levels),
+                                 std(levels), int(self.res.available)])
 
@@ -15,6 +15,11 @@ __credits__ = "Brian Connelly"
 
 import random
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from seeds.Cell import *
 from seeds.Plugin import *
 from seeds.SEEDSError import *
@@ -28,6 +33,12 @@ class GameOfLifeCell(Cell, Plugin):
         ALIVE: Cells that are alive
         DEAD: Cells that are dead
 
+    The Game of Life is a synchronous cellular automaton.  To update all Cells
+    at once from the state of the previous generation, set update_mode to
+    synchronous in the Population configuration.  In this case, each epoch is
+    one generation, and the number of live neighbors of every Cell is counted
+    with NumPy operations on the Population's StateStore.
+
     """
 
     __name__ = "Game of Life Cell"
@@ -74,10 +85,6 @@ class GameOfLifeCell(Cell, Plugin):
         """Produce a string to be used when the object is printed"""
         return 'GameOfLifeCell %d Type %d (%s)' % (self.id, self.type, self.types[self.type])
 
-    def type(self):
-        """Return the name of the type of this cell"""
-        return self.types[self.type]
-
     def update(self):
         """Update the cell based on the following rules:
 
@@ -101,10 +108,50 @@ class GameOfLifeCell(Cell, Plugin):
 
         if self.type == self.ALIVE and num_live_neighbors < 2:
             self.type = self.DEAD
-            self.population.update_type_count(self.ALIVE, self.DEAD)            
+            self.population.update_type_count(self.ALIVE, self.DEAD, node=self.node)            
         elif self.type == self.ALIVE and num_live_neighbors > 3:
             self.type = self.DEAD
-            self.population.update_type_count(self.ALIVE, self.DEAD)            
+            self.population.update_type_count(self.ALIVE, self.DEAD, node=self.node)            
         elif self.type == self.DEAD and num_live_neighbors == 3:
             self.type = self.ALIVE
-            self.population.update_type_count(self.DEAD, self.ALIVE)            
+            self.population.update_type_count(self.DEAD, self.ALIVE, node=self.node)            
+
+    def update_synchronous(self):
+        """Update every Cell in the Population at once.  The number of live
+        neighbors of each Cell is found using the neighbor_sum method of the
+        topology, and the rules of the Game of Life are applied to the whole
+        population.  As in update, Cells with no neighbors are not changed.
+        """
+
+        population = self.population
+        topology = population.topology
+
+        if not topology.static_neighbors:
+            return super(GameOfLifeCell, self).update_synchronous()
+
+        state = population.state
+        size = len(population.cells)
+        types = state['type'][:size]
+
+        live = (types == self.ALIVE).astype(np.int32)
+        live_neighbors = topology.neighbor_sum(live)
+        has_neighbors = topology.neighbor_sum(np.ones(size, dtype=np.int32)) > 0
+
+        isolated = np.flatnonzero(~has_neighbors).tolist()
+        if any(population.cells[n] is not None for n in isolated):
+            warn("Can not update GameOfLifeCell with 0 neighbors")
+
+        alive = (types == self.ALIVE) & has_neighbors
+        dead = (types == self.DEAD) & has_neighbors
+        dies = alive & ((live_neighbors < 2) | (live_neighbors > 3))
+        born = dead & (live_neighbors == 3)
+
+        state.begin_step()
+        newtypes = state.back('type')
+        newtypes[:size][dies] = self.DEAD
+        newtypes[:size][born] = self.ALIVE
+        state.end_step()
+
+        changed = np.flatnonzero(dies | born)
+        population.update_type_counts(types[changed], state['type'][changed],
+                                      nodes=changed)
@@ -21,6 +21,7 @@ __credits__ = "Brian Connelly, Luis Zaman, Ben Kerr"
 
 from seeds.Cell import *
 from seeds.Plugin import *
+from seeds.utils.sampling import roulette_select
 
 import random
 
@@ -65,6 +66,12 @@ class Kerr07Cell(Cell, Plugin):
         death_producer = 0.333
         toxicity = 0.650
 
+    When the Population uses the gillespie update mode, only events that change
+    a Cell are simulated.  Each Cell's rate is the probability that an update
+    would change it: the fraction of non-empty neighbors for EMPTY cells, and
+    the death rate (plus toxin-induced death for SENSITIVE cells) otherwise.
+    This is much faster than the asynchronous mode when death rates are low.
+
     """
 
     __name__ = "Kerr07 Cell"
@@ -118,10 +125,6 @@ class Kerr07Cell(Cell, Plugin):
         """Produce a string to be used when the object is printed"""
         return 'Kerr07 Cell %d Type %d (%s)' % (self.id, self.type, self.types[self.type])
 
-    def type(self):
-        """Return the name of the type of this cell"""
-        return self.types[self.type]
-
     def update(self):
         """Update the cell based on its neighbors
 
@@ -138,16 +141,19 @@ class Kerr07Cell(Cell, Plugin):
 
         typecount = {0: 0, 1: 0, 2: 0, 3: 0}
 
+        # Neighbor lists may be found each time they are used (see
+        # Topology.cache_neighbors), so the list is only requested once
         if self.type == self.EMPTY:
             parent = random.choice(self.neighbors)
             self.type = parent.type
-            self.population.update_type_count(self.EMPTY, self.type)            
+            self.population.update_type_count(self.EMPTY, self.type, node=self.node)            
 
         elif self.type == self.SENSITIVE:
-            for n in self.neighbors:
+            neighbors = self.neighbors
+            for n in neighbors:
                 typecount[n.type] += 1
 
-            num_neighbors = len(self.neighbors)
+            num_neighbors = len(neighbors)
         
             fs = float(typecount[self.SENSITIVE])/num_neighbors
             fr = float(typecount[self.RESISTANT])/num_neighbors
@@ -155,17 +161,89 @@ class Kerr07Cell(Cell, Plugin):
            
             if random.random() < (self.ds + self.tp * fp):
                 self.type = self.EMPTY
-                self.population.update_type_count(self.SENSITIVE, self.EMPTY)            
+                self.population.update_type_count(self.SENSITIVE, self.EMPTY, node=self.node)            
                 
         elif self.type == self.RESISTANT:
             if random.random() < self.dr:
                 self.type = self.EMPTY
-                self.population.update_type_count(self.RESISTANT, self.EMPTY)            
+                self.population.update_type_count(self.RESISTANT, self.EMPTY, node=self.node)            
 
         elif self.type == self.PRODUCER:
             if random.random() < self.dp:
                 self.type = self.EMPTY
-                self.population.update_type_count(self.PRODUCER, self.EMPTY)            
+                self.population.update_type_count(self.PRODUCER, self.EMPTY, node=self.node)            
 
         else:
             print("Error: Invalid cell type %d for cell %d" % (self.type, self.id))
+
+    def update_mean_field(self, frequencies):
+        """Update the cell as in update, but with the frequency of each type in
+        the Population in place of the frequency among its neighbors (see
+        Cell.update_mean_field).  Empty cells take the type of a parent chosen
+        in proportion to these frequencies, and Sensitive cells are killed by
+        toxin according to the frequency of Producers.
+
+        Parameters:
+
+        *frequencies*
+            A list of the fraction of the Population that is of each type
+
+        """
+
+        if self.type == self.EMPTY:
+            self.type = roulette_select(items=list(range(len(frequencies))),
+                                        fitnesses=frequencies, k=1)[0]
+            self.population.update_type_count(self.EMPTY, self.type, node=self.node)
+
+        elif self.type == self.SENSITIVE:
+            if random.random() < (self.ds + self.tp * frequencies[self.PRODUCER]):
+                self.type = self.EMPTY
+                self.population.update_type_count(self.SENSITIVE, self.EMPTY, node=self.node)
+
+        else:
+            # The death of Resistant and Producer cells does not depend on
+            # their neighbors
+            self.update()
+
+    def rate(self):
+        """Get the rate at which this Cell changes state.  This is the
+        probability that a call to update would change the Cell.
+        """
+
+        num_neighbors = len(self.neighbors)
+
+        if self.type == self.EMPTY:
+            if num_neighbors == 0:
+                return 0.0
+            occupied = [n for n in self.neighbors if n.type != self.EMPTY]
+            return float(len(occupied))/num_neighbors
+
+        elif self.type == self.SENSITIVE:
+            if num_neighbors == 0:
+                return self.ds
+            producers = [n for n in self.neighbors if n.type == self.PRODUCER]
+            fp = float(len(producers))/num_neighbors
+            return min(1.0, self.ds + self.tp * fp)
+
+        elif self.type == self.RESISTANT:
+            return self.dr
+
+        elif self.type == self.PRODUCER:
+            return self.dp
+
+        return 0.0
+
+    def fire(self):
+        """Change the state of the Cell.  Empty cells are replaced by a
+        randomly-chosen non-empty neighbor, and all other cells die.
+        """
+
+        if self.type == self.EMPTY:
+            occupied = [n for n in self.neighbors if n.type != self.EMPTY]
+            parent = random.choice(occupied)
+            self.type = parent.type
+            self.population.update_type_count(self.EMPTY, self.type, node=self.node)
+        else:
+            oldtype = self.type
+            self.type = self.EMPTY
+            self.population.update_type_count(oldtype, self.EMPTY, node=self.node)
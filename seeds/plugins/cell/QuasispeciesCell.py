@@ -23,16 +23,29 @@ the empty space are chosen proportional to fitness (roulette wheel selection). W
 organisms reproduce, there is a per-site probability of flipping a bit, thus mutating
 the genotype. 
 
+Genotypes are kept as packed bit strings in the Population's GenomeStore, which
+also keeps the fitness of each genotype, so the cost of reproduction depends on
+the number of sites that mutate rather than the length of the genotype.  This
+Cell type requires NumPy.
+
 """
 
 __author__ = "Luis Zaman <zamanlui@msu.edu>"
 __credits__ = "Luis Zaman, Brian Connelly"
 
 from seeds.Cell import *
+from seeds.GenomeStore import GenomeStore
 from seeds.Plugin import *
+from seeds.SEEDSError import *
+from seeds.utils.numeric import require_numpy
 
 import random
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 class QuasispeciesCell(Cell, Plugin):
     """
     This cell type is an implementation of a quasispecies model using
@@ -65,6 +78,10 @@ class QuasispeciesCell(Cell, Plugin):
         narrow_polynomail_order = 4
         wide_max_value = 0.75
 
+    The genotype of each Cell is stored on the Cell's node in the Population's
+    GenomeStore (see Population.genomes).  The genotype property gives it as a
+    list of 0s and 1s.
+
     """
 
     __name__ = "Quasispecies Cell"
@@ -78,6 +95,7 @@ class QuasispeciesCell(Cell, Plugin):
     types = ['Empty', 'Narrow', 'Wide']
     type_colors = ['#777777','b','r']
     max_types = 3
+    checkpoint_fields = ['genotype']
 
     EMPTY = 0
     NARROW = 1
@@ -97,7 +115,8 @@ class QuasispeciesCell(Cell, Plugin):
         *node*
             The ID of the node on which this Cell resides
         *type*
-            The type of cell to initialize (randomly chosen if not provided)
+            The type of cell to initialize (randomly chosen if not provided or
+            -1)
         *name*
             The name of this Cell type
         *label*
@@ -105,6 +124,11 @@ class QuasispeciesCell(Cell, Plugin):
 
         """
 
+        require_numpy("QuasispeciesCell")
+
+        if type == -1:
+            type = None
+
         super(QuasispeciesCell, self).__init__(experiment, population, node=node, type=type, name=name, label=label)
 
         self.death_rate = self.experiment.config.getfloat(self.config_section, 'death_rate')
@@ -120,24 +144,37 @@ class QuasispeciesCell(Cell, Plugin):
         assert self.narrow_polynomail_order > 0
         assert self.wide_max_value >= 0
 
+        # All Cells share the Population's GenomeStore, which is created by
+        # the first Cell
+        genomes = self.population.genomes
+        if genomes is None:
+            genomes = GenomeStore(size=len(self.population.cells),
+                                  length=self.genotype_length,
+                                  fitness_function=self.genome_fitness)
+            self.population.genomes = genomes
+        elif genomes.length != self.genotype_length:
+            raise ConfigurationError("QuasispeciesCell: genotype_length does not match the Population's genomes")
+        genomes.ensure_node(self.node)
+
         #generate a random genotype
-        self.genotype = [random.randint(0,1) for i in range(self.genotype_length)]
-        
-        if type == -1:
-            #determine type from bitstring genotype, we'll say that 0 = narrow and 1 = wide
-            #that way we can just add one to get our defined types 
-            self.type = random.randint(0,len(self.types)-1)
-        else:
-            self.type = type
-            
-            #don't let this bit go negative... even though it will only happen wwith empty types
-            #and they don't technically have genotypes anyway
-        
-        #set first bit of genotype appropriately 
-        self.genotype[0] = max(self.type-1,0)
-        
-        self.world.increment_type_count(self.type)
+        genomes.randomize([self.node], self.experiment.rng)
+
+        #set first bit of genotype appropriately, we'll say that 0 = narrow
+        #and 1 = wide, so we can just add one to get our defined types.  Empty
+        #cells don't technically have genotypes, so they get 0.
+        genomes.set_site(self.node, 0, max(self.type-1, 0))
         
+        self.population.increment_type_count(self.type)
+
+    @property
+    def genotype(self):
+        """The genotype of the Cell as a list of 0s and 1s"""
+        return self.population.genomes.get_bits(self.node)
+
+    @genotype.setter
+    def genotype(self, genotype):
+        self.population.genomes.set_bits(self.node, genotype)
+
     def flip_bit(self, bit):
         """Helper function to handle single bit mutations"""
         if bit == 0:
@@ -146,7 +183,10 @@ class QuasispeciesCell(Cell, Plugin):
             return 0
             
     def mutate(self, genotype):
-        """Mutate genotype based on mutation rate"""
+        """Mutate genotype based on mutation rate.  genotype is a list of 0s
+        and 1s, and a new list is returned.  Offspring are mutated in the
+        GenomeStore (see GenomeStore.mutate) rather than with this method.
+        """
         new_genotype = []
         for bit in genotype:
             if random.random() < self.site_mut_rate:
@@ -159,7 +199,7 @@ class QuasispeciesCell(Cell, Plugin):
       
     def get_fitness(self, genotype):
         """ Calculate fitness based on the number of bits set to 1 and the peak
-        the organism is on.
+        the organism is on.  genotype is a list of 0s and 1s.
 
         """
         
@@ -172,28 +212,46 @@ class QuasispeciesCell(Cell, Plugin):
         else:
             #use linear for wide type
             return genotype_perc_one*self.wide_max_value
-            
+
+    def genome_fitness(self, genomes, nodes):
+        """Calculate the fitness of the genotypes on the given nodes of a
+        GenomeStore, as get_fitness does for a single genotype.  The fitness
+        depends only on the first bit and the number of bits set to 1, which
+        the GenomeStore keeps for each genotype.
+
+        Parameters:
+
+        *genomes*
+            The GenomeStore
+        *nodes*
+            An array of node IDs
+
+        """
+
+        first = genomes.get_site(nodes, 0)
+        perc_one = (genomes.ones[nodes] - first) / float(genomes.length - 1)
+        return np.where(first == 0, perc_one**self.narrow_polynomail_order,
+                        perc_one*self.wide_max_value)
             
     def choose_neighbor(self, orgs):
         """Do roulettle wheel selection between passed organisms (neighbors)
-        and return winner
+        and return winner.  The fitnesses of all organisms are read from the
+        GenomeStore at once.
 
         """
 
-        fitnesses = [self.get_fitness(o.genotype) for o in orgs]
+        nodes = np.fromiter((o.node for o in orgs), dtype=np.int64, count=len(orgs))
+        cumulative = np.cumsum(self.population.genomes.fitness[nodes])
         #add small amount to avoid division by 0
-        sum_fitness = sum(fitnesses) + 0.0000001
-        #would be faster with numpy arrays!
-        norm_fitnesses = [f/float(sum_fitness) for f in fitnesses]
-        
-        #roll the ball, see where it falls
-        r = random.random()
-        partial_sum = 0
-        for i in range(len(norm_fitnesses)):
-            if partial_sum <= r <= partial_sum + norm_fitnesses[i]:
-                return orgs[i]
-            partial_sum += norm_fitnesses[i] 
-        
+        sum_fitness = cumulative[-1] + 0.0000001
+
+        #roll the ball, see where it falls.  The winner is the first organism
+        #whose running sum reaches the ball.
+        r = random.random() * sum_fitness
+        i = np.searchsorted(cumulative, r)
+        if i < len(orgs):
+            return orgs[i]
+
         print("didn't find a neighbor... ", sum_fitness)
         return orgs[-1]
         
@@ -201,10 +259,6 @@ class QuasispeciesCell(Cell, Plugin):
         """Produce a string to be used when the object is printed"""
         return "Quasispecies Cell %d Type %d (%s)" % (self.id, self.type, self.types[self.type])
 
-    def type(self):
-        """Return the name of the type of this cell"""
-        return self.types[self.type]
-
     def update(self):
         """ Update the cell based on its neighbors
 
@@ -217,15 +271,16 @@ class QuasispeciesCell(Cell, Plugin):
             parent = self.choose_neighbor(self.neighbors)
             self.type = parent.type
             
-            #if we're not staying empty, mutate
+            #if we're not staying empty, copy the parent's genotype and mutate
             if self.type != self.EMPTY:
-                self.genotype = self.mutate(parent.genotype)
+                genomes = self.population.genomes
+                genomes.copy(self.node, parent.node)
+                genomes.mutate([self.node], self.site_mut_rate, self.experiment.rng)
                 #and update type to reflect the new genotype
-                self.type = self.genotype[0]+1
-            self.world.update_type_count(self.EMPTY, self.type)
+                self.type = int(genomes.get_site(self.node, 0)) + 1
+            self.population.update_type_count(self.EMPTY, self.type, node=self.node)
         else:
             #check if we should die
             if random.random() < self.death_rate:
-                self.world.update_type_count(self.type, self.EMPTY)
+                self.population.update_type_count(self.type, self.EMPTY, node=self.node)
                 self.type = self.EMPTY
-                
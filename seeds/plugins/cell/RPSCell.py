@@ -14,9 +14,16 @@ __credits__ = "Brian Connelly"
 
 import random
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from seeds.Cell import *
 from seeds.Plugin import *
 from seeds.SEEDSError import *
+from seeds.Topology import DISTANCE_EPSILON
+from seeds.utils.graphs import csr_row_select
 from seeds.utils.sampling import roulette_select
 
 
@@ -39,6 +46,14 @@ class RPSCell(Cell, Plugin):
         given neighbor is proportional to the distance to that neighbor.
         (Default: False)
 
+    When the Population uses a StateStore (see Population), all of the events
+    in an epoch are processed together by update_batch using NumPy.  The
+    results follow the same sequential asynchronous semantics as updating each
+    Cell in turn: events are applied in order in blocks that contain no two
+    events where one changes a Cell that the other reads.  Because a different
+    random number generator is used, the results are statistically equivalent
+    to (but not the same as) those produced without a StateStore.
+
     """
 
     __name__ = "RPSCell"
@@ -90,10 +105,6 @@ class RPSCell(Cell, Plugin):
         """Produce a string to be used when the object is printed"""
         return 'RPSCell %d Type %d (%s)' % (self.id, self.type, self.types[self.type])
 
-    def type(self):
-        """Return the name of the type of this cell"""
-        return self.types[self.type]
-
     def update(self):
         """Update the cell based on a competition with a randomly-selected
         neighbor
@@ -107,7 +118,8 @@ class RPSCell(Cell, Plugin):
 
         """
 
-        if len(self.neighbors) < 1:
+        neighbors = self.neighbors
+        if len(neighbors) < 1:
             warn("Can not update RPSCell with 0 neighbors")
             return
 
@@ -119,23 +131,158 @@ class RPSCell(Cell, Plugin):
             # divide-by-zero errors, which can occur in well-mixed topologies,
             # where a Cell can exist in its own neighbor list
 
-            distances = self.get_neighbor_distances()
-            inv_dist = [1.0/(d + pow(1.02,-10000)) for d in distances]
-            competitor = roulette_select(items=self.neighbors, fitnesses=inv_dist, k=1)[0]
+            # Topologies without static neighbors may give a different list
+            # each time, so distances are measured to the neighbors at hand
+            if self.population.topology.static_neighbors:
+                distances = self.get_neighbor_distances()
+            else:
+                distances = [self.population.cell_distance(self, n) for n in neighbors]
+            inv_dist = [1.0/(d + DISTANCE_EPSILON) for d in distances]
+            competitor = roulette_select(items=neighbors, fitnesses=inv_dist, k=1)[0]
         else:
             # Pick a random neighbor to compete with.  If that neighbor wins, it
             # gets the current cell.
-            competitor = random.choice(self.neighbors)
+            competitor = random.choice(neighbors)
 
         if self.type == self.ROCK and competitor.type == self.PAPER:
             self.type = self.PAPER
-            self.population.update_type_count(self.ROCK, self.type)            
+            self.population.update_type_count(self.ROCK, self.type, node=self.node)            
             self.id = self.population.get_cell_id()
         elif self.type == self.PAPER and competitor.type == self.SCISSORS:
             self.type = self.SCISSORS
-            self.population.update_type_count(self.PAPER, self.type)            
+            self.population.update_type_count(self.PAPER, self.type, node=self.node)            
             self.id = self.population.get_cell_id()
         elif self.type == self.SCISSORS and competitor.type == self.ROCK:
             self.type = self.ROCK
-            self.population.update_type_count(self.SCISSORS, self.type)            
+            self.population.update_type_count(self.SCISSORS, self.type, node=self.node)            
             self.id = self.population.get_cell_id()
+
+    def update_mean_field(self, frequencies):
+        """Update the cell based on a competition with a competitor whose type
+        is chosen in proportion to the frequency of each type in the
+        Population (see Cell.update_mean_field).  Since competitors have no
+        location, distance-dependent competition does not apply.
+
+        Parameters:
+
+        *frequencies*
+            A list of the fraction of the Population that is of each type
+
+        """
+
+        competitor_type = roulette_select(items=list(range(len(frequencies))),
+                                          fitnesses=frequencies, k=1)[0]
+
+        # Rock is beaten by Paper, Paper by Scissors, and Scissors by Rock
+        if competitor_type == (self.type + 1) % 3:
+            oldtype = self.type
+            self.type = competitor_type
+            self.population.update_type_count(oldtype, self.type, node=self.node)
+            self.id = self.population.get_cell_id()
+
+    def update_batch(self, nodes):
+        """Update the Cells on the given nodes, in order.  If the Population
+        uses a StateStore, all events are processed with NumPy operations on
+        the stored types.  Otherwise, the update method of each Cell is called
+        in turn.
+
+        Competitors are chosen by the topology's choose_neighbors.  With
+        distance-dependent competition, they are instead chosen using the
+        running sums of the topology's inverse edge distances, which requires
+        static neighbors.
+
+        Parameters:
+
+        *nodes*
+            An array of the IDs of the nodes whose Cells are to be updated
+
+        """
+
+        population = self.population
+        topology = population.topology
+
+        if population.state is None or \
+                (self.distance_dependent and not topology.static_neighbors):
+            return super(RPSCell, self).update_batch(nodes)
+
+        state = population.state
+        types = state['type']
+        ids = state['id']
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        degrees = topology.get_degrees(nodes)
+
+        # Events on Cells with no neighbors have no effect
+        has_neighbors = degrees > 0
+        if not has_neighbors.all():
+            warn("Can not update RPSCell with 0 neighbors")
+            nodes = nodes[has_neighbors]
+            degrees = degrees[has_neighbors]
+
+        # Pick a neighbor for each event to compete with
+        if self.distance_dependent:
+            # Each node's edges have their own running sums of the edge
+            # weights, so a neighbor can be chosen in proportion to its
+            # weight by searching within that node's edges
+            draws = self.experiment.rng.random_sample(len(nodes))
+            indptr, indices = topology.get_adjacency()
+            cumulative = topology.get_inverse_edge_distances(cumulative=True)
+            targets = draws * cumulative[indptr[nodes + 1] - 1]
+            competitors = indices[csr_row_select(indptr, cumulative, nodes, targets)]
+        else:
+            competitors = topology.choose_neighbors(nodes)
+
+        # Events are applied in blocks in which no event reads a Cell that
+        # was changed by an earlier event in the same block.  Within such a
+        # block, applying all events at once gives the same result as applying
+        # them one at a time.  first_write records, for each node, the position
+        # in the current block of the first event that may change it.
+        num_events = len(nodes)
+        first_write = np.empty(state.size, dtype=np.int64)
+        first_write.fill(num_events)
+
+        fromtypes = []
+        totypes = []
+        changed = []
+
+        pos = 0
+        window = 64
+        while pos < num_events:
+            block_nodes = nodes[pos:pos + window]
+            block_comps = competitors[pos:pos + window]
+            order = np.arange(len(block_nodes))
+
+            written, first = np.unique(block_nodes, return_index=True)
+            first_write[written] = first
+            conflicts = np.flatnonzero((first_write[block_nodes] < order) |
+                                       (first_write[block_comps] < order))
+            first_write[written] = num_events
+
+            if len(conflicts) > 0:
+                length = conflicts[0]
+                block_nodes = block_nodes[:length]
+                block_comps = block_comps[:length]
+                window = max(64, 2 * length)
+            else:
+                length = len(block_nodes)
+                window *= 2
+
+            # Rock is beaten by Paper, Paper by Scissors, and Scissors by Rock
+            focal_types = types[block_nodes]
+            comp_types = types[block_comps]
+            lost = comp_types == (focal_types + 1) % 3
+
+            losers = block_nodes[lost]
+            if len(losers) > 0:
+                types[losers] = comp_types[lost]
+                ids[losers] = population.get_cell_ids(len(losers))
+                fromtypes.append(focal_types[lost])
+                totypes.append(comp_types[lost])
+                changed.append(losers)
+
+            pos += length
+
+        if len(fromtypes) > 0:
+            population.update_type_counts(np.concatenate(fromtypes),
+                                          np.concatenate(totypes),
+                                          nodes=np.concatenate(changed))
@@ -10,10 +10,16 @@ __credits__ = "Brian Connelly"
 
 from math import sin, pi
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from seeds.Action import *
 from seeds.Plugin import *
 from seeds.ResourceCell import *
 from seeds.SEEDSError import *
+from seeds.StateStore import StateField
 from seeds.utils.parsing import parse_int_rangelist
 
 
@@ -52,6 +58,11 @@ class SineResource(ResourceCell, Plugin):
         period = 100
         phase = 5
 
+    If the Resource uses the synchronous update mode (see Resource), the
+    levels of all nodes are calculated at once with NumPy.  Nodes with the
+    same parameters share one calculation, so a resource whose parameters are
+    the same everywhere costs the same regardless of the number of nodes.
+
     """
 
     __name__ = "SineResource"
@@ -62,6 +73,12 @@ class SineResource(ResourceCell, Plugin):
     __type__ = 3
     __requirements__ = []
 
+    state_fields = {'amplitude': 'float64', 'period': 'float64', 'phase': 'float64'}
+
+    amplitude = StateField('amplitude', index='id')
+    period = StateField('period', index='id')
+    phase = StateField('phase', index='id')
+
     def __init__(self, experiment, resource, config_section, id):
         """ Initialize a SineResource object
 
@@ -146,6 +163,32 @@ class SineResource(ResourceCell, Plugin):
         self.level = (self.amplitude * sin(position_radians + phase_radians)) + self.amplitude
         self.experiment.data['resources'][self.resource.name]['levels'][self.id] = self.level
 
+    def update_synchronous(self):
+        """Update the levels of every node in the Resource at once.  Since the
+        level depends only on the epoch and the node's parameters, it is
+        calculated once for each distinct set of parameters.  When every node
+        has the same parameters, this takes constant time (plus filling the
+        array of levels).
+        """
+
+        resource = self.resource
+        state = resource.state
+        size = len(resource.cells)
+
+        (params, inverse) = state.groups(['amplitude', 'period', 'phase'], size)
+        amplitude = params['amplitude']
+        period = params['period']
+
+        position_radians = ((self.experiment.epoch * 1.0) / period) * 2 * pi
+        phase_radians = ((params['phase'] * 1.0) / period) * 2 * pi
+        levels = (amplitude * np.sin(position_radians + phase_radians)) + amplitude
+
+        if inverse is None:
+            state.fill('level', levels[0], size)
+        else:
+            np.take(levels, inverse, out=state['level'][:size])
+            state.touch('level')
+
 
 class SetSineResourceProperties(Action):
     """ Action to set the properties (period, high, low, or duty cycle) of a
@@ -225,10 +268,10 @@ class SetSineResourceProperties(Action):
         self.cells_str = self.experiment.config.get(self.config_section, 'cells')
 
         if not self.cells_str:
-            self.cells = self.res.topology.graph.nodes()
+            self.cells = self.res.topology.nodes()
         else:
             self.cells = parse_int_rangelist(self.cells_str, sorted=True)
-            nids = self.res.topology.graph.nodes()
+            nids = self.res.topology.nodes()
             for c in self.cells:
                 if c not in nids:
                     raise ConfigurationError("SetSineResourceProperties: Cell %d does not exist in Resource '%s'" % (c, self.resource))
@@ -240,6 +283,6 @@ class SetSineResourceProperties(Action):
 
         for c in self.cells:
             if self.period:
-                self.res.topology.graph.node[c]['resource'].period = self.period
+                self.res.cells[c].period = self.period
             if self.amplitude:
-                self.res.topology.graph.node[c]['resource'].amplitude = self.amplitude
+                self.res.cells[c].amplitude = self.amplitude
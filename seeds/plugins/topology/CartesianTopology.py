@@ -16,14 +16,21 @@ This topology was originally presented and used used in the publication:
 __author__ = "Luis Zaman <zamanlui@msu.edu>"
 __credits__ = "Luis Zaman, Brian Connelly, Philip McKinley, Charles Ofria"
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import gc
 import networkx as nx
 import random
-from math import sqrt, floor, ceil, pi
+from math import sqrt, floor, pi
 
 from seeds.Plugin import *
 from seeds.SEEDSError import *
 from seeds.Topology import *
 from seeds.utils.geometry import euclidean_distance
+from seeds.utils.spatial import CellList
 
 
 class CartesianTopology(Topology, Plugin):
@@ -109,12 +116,15 @@ class CartesianTopology(Topology, Plugin):
                                       expected_neighbors=self.expected_neighbors,
                                       periodic=self.periodic)
 
-        if self.remove_disconnected and len(self.graph.nodes()) < self.size:
-            self.relabel_nodes()
-
     def build_graph(self, size=0, expected_neighbors=0,
                     periodic=False):
-        """Build the graph
+        """Build the graph.  Nodes are labeled 0..n-1, where n is the number
+        of nodes remaining after any disconnected nodes are removed.
+
+        If NumPy is available, the coordinates of the nodes are drawn from the
+        Experiment's NumPy random number generator, and neighbors are found
+        with a CellList.  Otherwise, they are drawn from the random module and
+        each candidate pair of nodes is checked in turn.
 
         Parameters:
 
@@ -133,69 +143,144 @@ class CartesianTopology(Topology, Plugin):
         else:
             radius = sqrt( (expected_neighbors / (size - 1.0)) / pi)
 
-        # Create bins in which to put node so we only check a fraction of
-        # candidate neighbors
-        num_bins = int(ceil(1/radius))
-        neighbor_bins = []
-        for i in range(num_bins):
-            neighbor_bins.append([])
-            for j in range(num_bins):
-                neighbor_bins[i].append([])
-
-        G = nx.empty_graph()
-        G.name = "Cartesian Topology Graph"
-        G.add_nodes_from(list(range(size)))
-
-        # Create the collection of nodes and put them into bins with
-        # candidate neighbors
+        # Garbage collection is paused while the many small objects making up
+        # the graph are created, since none of them can be garbage
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            if np is not None and self.experiment.rng is not None:
+                (coords, edges) = self.find_edges_array(size, radius, periodic)
+            else:
+                (coords, edges) = self.find_edges(size, radius, periodic)
+
+            G = nx.empty_graph()
+            G.name = "Cartesian Topology Graph"
+            G.add_nodes_from((n, {'coords': c}) for (n, c) in enumerate(coords))
+            G.add_edges_from(edges)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        return G
+
+    def find_edges_array(self, size, radius, periodic):
+        """Place nodes and find the pairs of nodes within radius of each other
+        using NumPy.  The result is a tuple containing a list of the
+        coordinates of each node and a list of edges.
+        """
+
+        rng = self.experiment.rng
+        coords = rng.random_sample((size, 2))
+        cells = CellList(coords, radius, periodic)
+        (src, dest) = cells.pairs()
+
+        degrees = np.bincount(src, minlength=size) + np.bincount(dest, minlength=size)
+        disconnected = np.flatnonzero(degrees == 0)
+
+        if len(disconnected) > 0 and self.remove_disconnected:
+            keep = degrees > 0
+            labels = np.cumsum(keep) - 1
+            coords = coords[keep]
+            src = labels[src]
+            dest = labels[dest]
+        elif len(disconnected) > 0 and size > 1:
+            # Connect each disconnected node to a random node nearby
+            partners = []
+            for node in disconnected:
+                candidates = cells.neighborhood(node)
+                candidates = candidates[candidates != node]
+                if len(candidates) == 0:
+                    candidates = np.delete(np.arange(size), node)
+                partners.append(candidates[rng.randint(len(candidates))])
+            src = np.concatenate((src, disconnected))
+            dest = np.concatenate((dest, partners))
+
+        coords = [tuple(c) for c in coords.tolist()]
+        return (coords, list(zip(src.tolist(), dest.tolist())))
+
+    def find_edges(self, size, radius, periodic):
+        """Place nodes and find the pairs of nodes within radius of each other
+        without NumPy.  The result is a tuple containing a list of the
+        coordinates of each node and a list of edges.
+        """
+
         _rndm = random.random
-        for n in G.nodes():
-            xcoord = _rndm()
-            ycoord = _rndm()
-            G.node[n]['coords'] = (xcoord, ycoord)
-
-            # Put node into bin with candidate neighbors
-            bin_x = int(floor(xcoord/radius))
-            bin_y = int(floor(ycoord/radius))
+        coords = [(_rndm(), _rndm()) for n in range(size)]
+
+        # Put nodes into bins at least radius wide so that only nodes in
+        # adjacent bins need to be checked.  With fewer than 3 bins per side,
+        # all nodes are in one bin.
+        if radius > 0:
+            num_bins = int(min(floor(1/radius), sqrt(size) + 1))
+        else:
+            num_bins = 1
+        if num_bins < 3:
+            num_bins = 1
+
+        neighbor_bins = [[[] for j in range(num_bins)] for i in range(num_bins)]
+        for n in range(size):
+            (xcoord, ycoord) = coords[n]
+            bin_x = min(int(floor(xcoord*num_bins)), num_bins - 1)
+            bin_y = min(int(floor(ycoord*num_bins)), num_bins - 1)
             neighbor_bins[bin_x][bin_y].append(n)
 
-        # Find actual neighbors and create edges between nodes
+        edges = []
+        degrees = [0] * size
+        potentials = {}
+
+        # Find actual neighbors.  Each pair is found from the node with the
+        # smaller ID.
         for x in range(num_bins):
             for y in range(num_bins):
 
                 # Get all potential neighbors (those in adjacent bins)
-                potentials = []
+                bins = set()
                 for px in range(x-1, x+1+1):
                     if (periodic == False and
                         (px < 0 or px >= num_bins)):
                         continue
 
-                    for py in range(y-y, y+1+1):
+                    for py in range(y-1, y+1+1):
                         if (periodic == False and
                             (py < 0 or py >= num_bins)):
                             continue
 
-                        potentials += neighbor_bins[px % num_bins][py % num_bins]
+                        bins.add((px % num_bins, py % num_bins))
 
-                for node in neighbor_bins[x][y]:
-                    node_coords = G.node[node]['coords']
-                    for potential in potentials:
-                        p_coords = G.node[potential]['coords']
-                        if (self.within_range(node_coords, p_coords, radius,
-                                              periodic) and
-                            node != potential):
-                            G.add_edge(node, potential)
-
-                    if G.degree(node) == 0:
-                        if self.remove_disconnected:
-                            G.remove_node(node)
-                            neighbor_bins[x][y].remove(node)
-                        else:
-                            G.add_edge(node, random.choice(potentials))
-
-                neighbor_bins[x][y] = []
+                candidates = []
+                for (px, py) in sorted(bins):
+                    candidates += neighbor_bins[px][py]
 
-        return G
+                for node in neighbor_bins[x][y]:
+                    potentials[node] = candidates
+                    node_coords = coords[node]
+                    for potential in candidates:
+                        if (node < potential and
+                            self.within_range(node_coords, coords[potential],
+                                              radius, periodic)):
+                            edges.append((node, potential))
+                            degrees[node] += 1
+                            degrees[potential] += 1
+
+        disconnected = [n for n in range(size) if degrees[n] == 0]
+
+        if len(disconnected) > 0 and self.remove_disconnected:
+            labels = {}
+            for n in range(size):
+                if degrees[n] > 0:
+                    labels[n] = len(labels)
+            coords = [coords[n] for n in range(size) if degrees[n] > 0]
+            edges = [(labels[a], labels[b]) for (a, b) in edges]
+        elif len(disconnected) > 0 and size > 1:
+            # Connect each disconnected node to a random node nearby
+            for node in disconnected:
+                candidates = [p for p in potentials[node] if p != node]
+                if len(candidates) == 0:
+                    candidates = [p for p in range(size) if p != node]
+                edges.append((node, random.choice(candidates)))
+
+        return (coords, edges)
 
     def within_range(self, node1, node2, distance, periodic):
         """Determine whether or not two nodes are within a given distance from
@@ -16,16 +16,24 @@ This topology was originally presented and used used in the publication:
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly, Luis Zaman, Philip McKinley, Charles Ofria"
 
-from math import floor
-
-import networkx as nx
 
 from seeds.Plugin import *
 from seeds.SEEDSError import *
 from seeds.Topology import *
+from seeds.utils.graphs import lattice_graph
+
+
+def moore_offsets(radius):
+    """Get a list of the (row, column) offsets from a node to each of the
+    nodes in its Moore neighborhood of the given radius
+    """
+
+    return [(dr, dc) for dr in range(-radius, radius + 1)
+            for dc in range(-radius, radius + 1)
+            if (dr, dc) != (0, 0)]
 
 
-class MooreTopology(Topology, Plugin):
+class MooreTopology(LatticeTopology, Plugin):
     """
     Lattice topology with Moore Neighborhoods with configurable radius
 
@@ -45,6 +53,9 @@ class MooreTopology(Topology, Plugin):
             nodes on the right border. (default: False)
         radius: Number of hops within a focal node's neighborhood
             (default: 1)
+        implicit: Whether or not to compute each node's neighbors whenever
+            they are needed instead of storing them.  This allows very large
+            lattices to be used, but updates are slower.  (default: False)
 
     Example:
         [MooreTopology]
@@ -52,6 +63,10 @@ class MooreTopology(Topology, Plugin):
         periodic = True
         radius = 4
 
+    The neighbors of each node are computed from row and column offsets, and
+    a graph is only built if the graph property is used.  In implicit mode,
+    nothing is stored for the edges at all (see LatticeTopology).
+
     """
 
     __name__ = "MooreTopology"
@@ -74,6 +89,7 @@ class MooreTopology(Topology, Plugin):
         self.size = self.experiment.config.getint(self.config_section, 'size')
         self.periodic = self.experiment.config.getboolean(self.config_section, 'periodic', default=False)
         self.radius = self.experiment.config.getint(self.config_section, 'radius', default=1)
+        self.implicit = self.experiment.config.getboolean(self.config_section, 'implicit', default=False)
         self.dimensions = 2
 
         if not self.size:
@@ -85,51 +101,21 @@ class MooreTopology(Topology, Plugin):
         elif self.radius >= self.size:
             raise ConfigurationError("MooreTopology: radius can not exceed grid size")
 
-        self.graph = self.moore_2d_graph(self.size, self.size,
-                                         radius=self.radius,
-                                         periodic=self.periodic)
-
-        for n in self.graph.nodes():
-            self.graph.node[n]['coords'] = (self.row(n)/float(self.size), self.column(n)/float(self.size))
-
     def __str__(self):
         """Produce a string to be used when an object is printed"""
         return 'Moore Topology (%d nodes, %d radius)' % (self.size * self.size, self.radius)
 
-    def row(self, nodeid):
-        """Get the number of the row in which the given node is located
-
-        Parameters:
-
-        *nodeid*
-            The ID of the node in question
-
+    def lattice_offsets(self):
+        """Get a list of the (row, column) offsets from a node to each of its
+        neighbors on the lattice
         """
-        return (nodeid//self.size)
-
-    def column(self, nodeid):
-        """Get the number of the column in which the given node is located
-
-        Parameters:
-
-        *nodeid*
-            The ID of the node in question
 
-        """
-        return nodeid % self.size
+        return moore_offsets(self.radius)
 
-    def node_id(self, row, col):
-        """Get the ID of the node at the given row and column
-
-        Parameters:
-
-        *row*
-            The row in which the node is located
-        *col*
-            The column in which the node is located
-
-        """
-        return row * self.size + col
+    def lattice_graph(self):
+        """Build a NetworkX graph of the lattice"""
+        return self.moore_2d_graph(self.size, self.size, radius=self.radius,
+                                   periodic=self.periodic)
 
     def moore_2d_graph(self, rows=0, columns=0, radius=0,
                        periodic=False):
@@ -152,28 +138,10 @@ class MooreTopology(Topology, Plugin):
             Prevent edge effects using periodic boundaries
 
         """
-        G = nx.empty_graph()
-        G.name = "moore_2d_radius_graph"
-        G.add_nodes_from(list(range(rows * columns)))
-
-        for n in G.nodes():
-            myrow = self.row(n)
-            mycol = self.column(n)
-
-            for r in range(myrow - radius, myrow + radius + 1):
-                if periodic == False and (r < 0 or r >= rows):
-                    continue
-
-                for c in range(mycol - radius, mycol + radius + 1):
-                    if periodic == False and (c < 0 or c >= columns):
-                        continue
-
-                    nid = self.node_id(r % rows, c % columns)
-
-                    if nid != n:
-                        neighbor_id = ((r % rows) * self.size) + (c % columns)
-                        G.add_edge(n, neighbor_id)
 
+        G = lattice_graph(rows, columns, moore_offsets(radius),
+                          periodic=periodic)
+        G.name = "moore_2d_radius_graph"
         return G
 
     def add_node(self, id=-1, neighbors=[]):
@@ -197,46 +165,3 @@ class MooreTopology(Topology, Plugin):
         type"""
         raise ConfigurationError("remove_edge is not supported by MooreTopology")
         return
-
-
-    def get_nearest_node(self, coords, n=1):
-        """Return a list of the node(s) located nearest the given coordinates
-
-        Note that this overwrites the get_nearest_node method defined by
-        Topology (due to its simplicity vs using a k-d Tree).  This specific
-        implementation may be removed in future releases if the more complete
-        version in Topology is found to be better.
-
-        Parameters:
-
-        coords
-            Tuple defining the point in question.  The number of dimensions
-            should match the number of dimensions of the topology.
-        n
-            The number of nearest neighbors to find
-
-        """
-
-        if not coords or len(coords) < 1:
-            print("ERROR: Invalid coordinates for get_nearest_node")
-            return
-        elif n < 1:
-            print("ERROR: Invalid number of neighbors for get_nearest_node")
-            return
-
-        cell_width = 1.0 / self.size
-
-        nearest_x = floor(float(coords[0]) / cell_width) * cell_width
-        nearest_y = floor(float(coords[1]) / cell_width) * cell_width
-
-        nearest_col = int(floor(coords[0] / cell_width))
-        nearest_row = int(floor(coords[1] / cell_width))
-        nearest_node = self.node_id(nearest_row, nearest_col)
-
-        nearest = [nearest_node]
-
-        for i in range(n - 1):
-            print("ERROR: get_nearest_node only supports 1 neighbor at the moment")
-            # TODO: look at neighbors of calculated nearest point and expand out.  Append to nearest.
-
-        return nearest
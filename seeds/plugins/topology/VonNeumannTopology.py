@@ -9,14 +9,24 @@ __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
 
-import networkx as nx
-
 from seeds.Plugin import *
 from seeds.SEEDSError import *
 from seeds.Topology import *
+from seeds.utils.graphs import lattice_graph
+
+
+def vonneumann_offsets(radius):
+    """Get a list of the (row, column) offsets from a node to each of the
+    nodes in its von Neumann neighborhood of the given radius (those within
+    radius steps along rows and columns)
+    """
+
+    return [(dr, dc) for dr in range(-radius, radius + 1)
+            for dc in range(-radius, radius + 1)
+            if 0 < abs(dr) + abs(dc) <= radius]
 
 
-class VonNeumannTopology(Topology, Plugin):
+class VonNeumannTopology(LatticeTopology, Plugin):
     """
     Lattice topology with von Neumann Neighborhoods with configurable radius
 
@@ -37,6 +47,10 @@ class VonNeumannTopology(Topology, Plugin):
             border. (default: False)
         radius
             Number of hops within a focal node's neighborhood (default: 1)
+        implicit
+            Whether or not to compute each node's neighbors whenever they are
+            needed instead of storing them.  This allows very large lattices to
+            be used, but updates are slower.  (default: False)
 
     Example:
         [VonNeumannTopology]
@@ -44,6 +58,10 @@ class VonNeumannTopology(Topology, Plugin):
         periodic = True
         radius = 4
 
+    The neighbors of each node are computed from row and column offsets, and
+    a graph is only built if the graph property is used.  In implicit mode,
+    nothing is stored for the edges at all (see LatticeTopology).
+
     """
 
     __name__ = "VonNeumannTopology"
@@ -66,6 +84,7 @@ class VonNeumannTopology(Topology, Plugin):
         self.size = self.experiment.config.getint(self.config_section, 'size')
         self.periodic = self.experiment.config.getboolean(self.config_section, 'periodic', default=False)
         self.radius = self.experiment.config.getint(self.config_section, 'radius', default=1)
+        self.implicit = self.experiment.config.getboolean(self.config_section, 'implicit', default=False)
         self.dimensions = 2
 
         if not self.size:
@@ -77,51 +96,22 @@ class VonNeumannTopology(Topology, Plugin):
         elif self.radius >= self.size:
             raise ConfigurationError("VonNeumannTopology: radius can not exceed grid size")
 
-        self.graph = self.vonneumann_2d_graph(self.size, self.size,
-                                              radius=self.radius,
-                                              periodic=self.periodic)
-
-        for n in self.graph.nodes():
-            self.graph.node[n]['coords'] = (self.row(n)/float(self.size), self.column(n)/float(self.size))
-
     def __str__(self):
         """Produce a string to be used when an object is printed"""
         return 'Von Neumann Topology (%d nodes, %d radius)' % (self.size * self.size, self.radius)
 
-    def row(self, nodeid):
-        """Get the number of the row in which the given node is located
-
-        Parameters:
-
-        *nodeid*
-            The ID of the node in question
-
-        """
-        return (nodeid/self.size)
-
-    def column(self, nodeid):
-        """Get the number of the column in which the given node is located
-
-        Parameters:
-
-        *nodeid*
-            The ID of the node in question
-
+    def lattice_offsets(self):
+        """Get a list of the (row, column) offsets from a node to each of its
+        neighbors on the lattice
         """
-        return nodeid % self.size
-
-    def node_id(self, row, col):
-        """Get the ID of the node at the given row and column
-
-        Parameters:
 
-        *row*
-            The row in which the node is located
-        *col*
-            The column in which the node is located
+        return vonneumann_offsets(self.radius)
 
-        """
-        return row * self.size + col
+    def lattice_graph(self):
+        """Build a NetworkX graph of the lattice"""
+        return self.vonneumann_2d_graph(self.size, self.size,
+                                        radius=self.radius,
+                                        periodic=self.periodic)
 
     def vonneumann_2d_graph(self, rows=0, columns=0, radius=0,
                             periodic=False):
@@ -143,27 +133,9 @@ class VonNeumannTopology(Topology, Plugin):
             Prevent edge effects using periodic boundaries
 
         """
-        
-        if radius == 0:
-            G = nx.empty_graph()
-            G.add_edges_from(rows * columns)
-        else:
-            H = nx.grid_graph(dim=[rows,columns], periodic=periodic)
-
-            m = {}
-            for r in range(rows):
-                for c in range(columns):
-                    m[(r,c)] = (r * columns) + c
-
-            H = nx.relabel_nodes(H, m)
-            G = H.copy()
-
-            for i in range(radius - 1):
-                for n in H.nodes():
-                    for neighbor in H.neighbors(n):
-                        for nn in H.neighbors(neighbor):
-                            G.add_edge(n, nn)
 
+        G = lattice_graph(rows, columns, vonneumann_offsets(radius),
+                          periodic=periodic)
         G.name = "vonneumann_2d_radius_graph"
         return G
 
@@ -188,45 +160,3 @@ class VonNeumannTopology(Topology, Plugin):
         type"""
         raise ConfigurationError("remove_edge is not supported by VonNeumannTopology")
         return
-
-    def get_nearest_node(self, coords, n=1):
-        """Return a list of the node(s) located nearest the given coordinates
-
-        Note that this overwrites the get_nearest_node method defined by
-        Topology (due to its simplicity vs using a k-d Tree).  This specific
-        implementation may be removed in future releases if the more complete
-        version in Topology is found to be better.
-
-        Parameters:
-
-        coords
-            Tuple defining the point in question.  The number of dimensions
-            should match the number of dimensions of the topology.
-        n
-            The number of nearest neighbors to find
-
-        """
-
-        if not coords or len(coords) < 1:
-            print("ERROR: Invalid coordinates for get_nearest_node")
-            return
-        elif n < 1:
-            print("ERROR: Invalid number of neighbors for get_nearest_node")
-            return
-
-        cell_width = 1.0 / self.size
-
-        nearest_x = floor(float(coords[0]) / cell_width) * cell_width
-        nearest_y = floor(float(coords[1]) / cell_width) * cell_width
-
-        nearest_col = int(floor(coords[0] / cell_width))
-        nearest_row = int(floor(coords[1] / cell_width))
-        nearest_node = self.node_id(nearest_row, nearest_col)
-
-        nearest = [nearest_node]
-
-        for i in range(n - 1):
-            print("ERROR: get_nearest_node only supports 1 neighbor at the moment")
-            # TODO: look at neighbors of calculated nearest point and expand out.  Append to nearest.
-
-        return nearest
@@ -20,9 +20,15 @@ __credits__ = "Brian Connelly"
 import random
 import networkx as nx
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from seeds.Plugin import *
 from seeds.SEEDSError import *
 from seeds.Topology import *
+from seeds.utils.sampling import sample_range
 
 
 class WellMixedTopology(Topology, Plugin):
@@ -43,12 +49,24 @@ class WellMixedTopology(Topology, Plugin):
         dimensions
             The number of dimensions in space that this topology occupies.
             (default: 2)
+        mean_field
+            Whether or not to update Cells using the frequency of each type
+            in the whole population instead of lists of neighbors (see
+            Population.update_mean_field).  The Cell type must support this.
+            (default: False)
 
     Example:
         [WellMixedTopology]
         size = 100000
         num_interactions = 10
 
+    When num_interactions is the size of the population (as it is by
+    default), every node is a neighbor of every node, including nodes added
+    later, and the topology is fully connected (see Topology).  Otherwise,
+    neighbors are drawn from the range of node IDs each time they are
+    requested, and Cells do not keep neighbor lists.  choose_neighbors draws
+    one neighbor for each of many nodes at once, which allows Cell types to
+    process an epoch's events in batches.
 
     """
 
@@ -60,6 +78,8 @@ class WellMixedTopology(Topology, Plugin):
     __type__ = 2        
     __requirements__ = []
 
+    static_neighbors = False
+
     def __init__(self, experiment, label=None):
         """Initialize a WellMixedTopology object
 
@@ -87,6 +107,9 @@ class WellMixedTopology(Topology, Plugin):
         self.dimensions = self.experiment.config.getint(section=self.config_section,
                                                         name="dimensions",
                                                         default=2)
+        self.mean_field = self.experiment.config.getboolean(self.config_section,
+                                                            'mean_field',
+                                                            default=False)
         if not self.size:
             raise ConfigurationError("WellMixedTopology: size must be defined")
         elif self.size < 1:
@@ -103,7 +126,15 @@ class WellMixedTopology(Topology, Plugin):
         self.graph.add_nodes_from(list(range(self.size)))
 
         for n in self.graph.nodes():
-            self.graph.node[n]['coords'] = tuple([random.random() for i in xrange(self.dimensions)])
+            self.graph.node[n]['coords'] = tuple([random.random() for i in range(self.dimensions)])
+
+        self._node_list = None
+
+        # When every node interacts with every other, Cells can share a
+        # single list of neighbors.  Otherwise, neighbors are drawn anew each
+        # time they are needed.
+        self.fully_connected = self.num_interactions == self.size
+        self.cache_neighbors = self.fully_connected
 
     def __str__(self):
         """Produce a string to be used when an object is printed"""
@@ -119,7 +150,66 @@ class WellMixedTopology(Topology, Plugin):
 
         """
 
-        return random.sample(self.graph.nodes(), self.num_interactions)
+        num_nodes = len(self.graph)
+        k = min(self.num_interactions, num_nodes)
+        if self.fully_connected or k == num_nodes:
+            return self.graph.nodes()
+
+        node_list = self.node_list()
+        if node_list is None:
+            return sample_range(num_nodes, k)
+        return [node_list[i] for i in sample_range(num_nodes, k)]
+
+    def node_list(self):
+        """Get a sorted list of the IDs of the nodes, or None if the nodes are
+        numbered 0..n-1 with no gaps (as they are unless nodes have been added
+        or removed).  This is kept until nodes are added or removed.
+        """
+
+        if self._node_list is None:
+            nodes = sorted(self.graph.nodes())
+            if len(nodes) > 0 and nodes[-1] != len(nodes) - 1:
+                self._node_list = nodes
+            else:
+                self._node_list = False
+        return self._node_list or None
+
+    def get_degrees(self, nodes):
+        """Get the number of neighbors of each of the given nodes as an array
+        (see Topology.get_degrees).  This is the same for every node.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        degrees = np.empty(len(nodes), dtype=np.int64)
+        if self.fully_connected:
+            degrees.fill(len(self.graph))
+        else:
+            degrees.fill(min(self.num_interactions, len(self.graph)))
+        return degrees
+
+    def choose_neighbors(self, nodes):
+        """Choose one neighbor of each of the given nodes uniformly at random
+        (see Topology.choose_neighbors).  Since each node's neighbors are a
+        random sample of the population, this is a node chosen uniformly from
+        the whole population.
+
+        Parameters:
+
+        *nodes*
+            An array of node IDs
+
+        """
+
+        draws = self.experiment.rng.randint(0, len(self.graph), size=len(nodes))
+        node_list = self.node_list()
+        if node_list is None:
+            return draws
+        return np.asarray(node_list, dtype=np.int64)[draws]
 
     def add_edge(self, src, dest):
         """Add an edge to the graph.  Not supported by this topology type"""
@@ -132,7 +222,7 @@ class WellMixedTopology(Topology, Plugin):
         raise ConfigurationError("remove_edge is not supported by WellMixedTopology")
         return
 
-    def add_node(self, id=-1, neighbors=[]):
+    def add_node(self, id=-1, neighbors=[], coords=None):
         """Add a node to the graph.  Topologies that do not wish to support
         this should redefine this method to do nothing.  This method will
         not place a Cell or ResourceCell in the newly-created node.  That
@@ -150,13 +240,33 @@ class WellMixedTopology(Topology, Plugin):
             An optional list of node IDs that will be connected to the new node
             via an edge. NonExistentNodeError will be raised if any of these
             nodes do not exist. ***This argument is ignored***
+        coords
+            A tuple containing the coordinates of the new node.  If none are
+            provided, random coordinates are used.
 
         """
 
         if id == -1:
-            self.graph.add_node(max(self.graph.nodes()) + 1)
-        else:
-            self.graph.add_node(id)
+            id = max(self.graph.nodes()) + 1
+        if not coords:
+            coords = tuple([random.random() for i in range(self.dimensions)])
+
+        self.graph.add_node(id)
+        self.graph.node[id]['coords'] = coords
+        if self._spatial_index is not None:
+            self._spatial_index.insert(id, coords)
+        self._node_list = None
+
+    def remove_node(self, id):
+        """Remove a node from the graph (see Topology.remove_node)
+
+        Parameters:
+
+        id
+            The ID to use of the node to be deleted.
+
+        """
 
-        self.graph.node[id]['coords'] = (random.random(),random.random())
+        super(WellMixedTopology, self).remove_node(id)
+        self._node_list = None
 
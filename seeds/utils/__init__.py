@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from seeds.utils.geometry import *
+from seeds.utils.graphs import *
 from seeds.utils.numeric import *
 from seeds.utils.sampling import *
+from seeds.utils.snapshots import *
+from seeds.utils.spatial import *
 from seeds.utils.statistics import *
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+"""
+Collection of functions that operate on the graphs used by topologies, such as
+building array-based representations of their adjacency and finding connected
+components.
+
+Except for UnionFind, these functions require NumPy.
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import gc
+import itertools
+
+import networkx as nx
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from seeds.utils.numeric import require_numpy
+
+
+def csr_adjacency(graph):
+    """Build a compressed sparse row (CSR) representation of the adjacency of
+    a graph.  The result is a tuple (indptr, indices) of int32 arrays.  The
+    neighbors of node n are indices[indptr[n]:indptr[n+1]], in the same order
+    as they are given by graph.neighbors(n).  Rows are indexed by node ID, so
+    the graph's nodes should be integers.  Any IDs between 0 and the largest
+    node ID that are not in the graph have no neighbors.
+
+    The returned arrays are read-only.
+
+    Parameters:
+
+    *graph*
+        A NetworkX graph
+
+    """
+
+    require_numpy("CSR adjacency")
+
+    nodes = graph.nodes()
+    if len(nodes) > 0:
+        size = max(nodes) + 1
+    else:
+        size = 0
+
+    adj = graph.adj
+    degrees = np.zeros(size + 1, dtype=np.int32)
+    for n in nodes:
+        degrees[n + 1] = len(adj[n])
+
+    indptr = np.cumsum(degrees, dtype=np.int32)
+    neighbor_lists = [adj[n] if n in adj else () for n in range(size)]
+    indices = np.fromiter(itertools.chain.from_iterable(neighbor_lists),
+                          dtype=np.int32, count=int(indptr[-1]))
+
+    indptr.flags.writeable = False
+    indices.flags.writeable = False
+    return (indptr, indices)
+
+def lattice_neighbor_columns(rows, columns, offsets, nodes, periodic=False):
+    """Find the neighbors of the given nodes of a 2D lattice one offset at a
+    time (see lattice_adjacency).  For each offset in turn, this yields a
+    tuple (neighbors, valid) of arrays aligned with nodes, where neighbors
+    holds the ID of the node at that offset from each node and valid is True
+    where that node is a neighbor.  Only one offset's arrays are held at a
+    time unless the neighborhood wraps onto itself.
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *nodes*
+        An array of the IDs of the nodes whose neighbors to find
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    nodes = np.asarray(nodes, dtype=np.int64)
+    node_rows = nodes // columns
+    node_columns = nodes % columns
+
+    # A neighborhood wider than the lattice wraps onto itself, so neighbors
+    # must be compared with the node and with those found at earlier offsets
+    wraps = False
+    if periodic and len(offsets) > 0:
+        reach_r = max(abs(dr) for (dr, dc) in offsets)
+        reach_c = max(abs(dc) for (dr, dc) in offsets)
+        wraps = 2 * reach_r + 1 > rows or 2 * reach_c + 1 > columns
+    earlier = []
+
+    for (dr, dc) in offsets:
+        r = node_rows + dr
+        c = node_columns + dc
+        if periodic:
+            r %= rows
+            c %= columns
+            valid = np.ones(len(nodes), dtype=bool)
+        else:
+            valid = (r >= 0) & (r < rows) & (c >= 0) & (c < columns)
+        neighbors = r * columns + c
+
+        if wraps:
+            valid &= neighbors != nodes
+            for e in earlier:
+                valid &= neighbors != e
+            earlier.append(neighbors)
+
+        yield (neighbors, valid)
+
+def lattice_adjacency(rows, columns, offsets, periodic=False):
+    """Build a compressed sparse row (CSR) representation of the adjacency of
+    a 2D lattice, where the node at (row, column) has ID row * columns +
+    column.  The neighbors of each node are the nodes at (row + dr, column +
+    dc) for each (dr, dc) in offsets, in that order.  Without periodic
+    boundaries, offsets that fall outside of the lattice are skipped.  With
+    periodic boundaries, they wrap around, and on lattices too small for the
+    neighborhood, each neighbor is only given once and nodes are not their
+    own neighbors.  The result is a tuple (indptr, indices) of read-only
+    int32 arrays, as with csr_adjacency.
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    require_numpy("Lattice adjacency")
+
+    size = rows * columns
+    neighbors = np.empty((size, len(offsets)), dtype=np.int32)
+    valid = np.empty((size, len(offsets)), dtype=bool)
+
+    columns_found = lattice_neighbor_columns(rows, columns, offsets,
+                                             np.arange(size), periodic=periodic)
+    for (i, (n, v)) in enumerate(columns_found):
+        neighbors[:, i] = n
+        valid[:, i] = v
+
+    indptr = np.zeros(size + 1, dtype=np.int32)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    indices = neighbors[valid]
+
+    indptr.flags.writeable = False
+    indices.flags.writeable = False
+    return (indptr, indices)
+
+def lattice_degrees(rows, columns, offsets, nodes, periodic=False):
+    """Get the number of neighbors of each of the given nodes of a 2D lattice
+    (see lattice_adjacency) without building its adjacency
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *nodes*
+        An array of node IDs
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    require_numpy("Lattice degrees")
+
+    degrees = np.zeros(len(nodes), dtype=np.int64)
+    for (neighbors, valid) in lattice_neighbor_columns(rows, columns, offsets,
+                                                       nodes, periodic=periodic):
+        degrees += valid
+    return degrees
+
+def lattice_nth_neighbors(rows, columns, offsets, nodes, positions,
+                          periodic=False):
+    """Get the neighbor at the given position in the neighbor list of each of
+    the given nodes of a 2D lattice (see lattice_adjacency) without building
+    its adjacency.  Each position must be less than that node's degree.
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *nodes*
+        An array of node IDs
+    *positions*
+        An array of positions in the neighbor lists, aligned with nodes
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    require_numpy("Lattice neighbors")
+
+    positions = np.asarray(positions, dtype=np.int64)
+    found = np.empty(len(positions), dtype=np.int64)
+    seen = np.zeros(len(positions), dtype=np.int64)
+
+    for (neighbors, valid) in lattice_neighbor_columns(rows, columns, offsets,
+                                                       nodes, periodic=periodic):
+        chosen = valid & (seen == positions)
+        found[chosen] = neighbors[chosen]
+        seen += valid
+    return found
+
+def lattice_neighbors(rows, columns, offsets, node, periodic=False):
+    """Get a list of the neighbors of a single node of a 2D lattice (see
+    lattice_adjacency).  This does not require NumPy.
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *node*
+        The ID of the node
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    (row, column) = divmod(node, columns)
+
+    if periodic:
+        neighbors = [((row + dr) % rows) * columns + (column + dc) % columns
+                     for (dr, dc) in offsets]
+
+        # A neighborhood wider than the lattice wraps onto itself
+        if node in neighbors or len(set(neighbors)) < len(neighbors):
+            unique = []
+            for n in neighbors:
+                if n != node and n not in unique:
+                    unique.append(n)
+            neighbors = unique
+        return neighbors
+
+    return [(row + dr) * columns + column + dc for (dr, dc) in offsets
+            if 0 <= row + dr < rows and 0 <= column + dc < columns]
+
+def csr_edges(indptr, indices):
+    """Get the edges of an undirected graph given by a CSR adjacency.  The
+    result is a tuple (src, dest) of arrays, where src < dest for each edge.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *indices*
+        The indices array of a CSR adjacency
+
+    """
+
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    upper = rows < indices
+    return (rows[upper], np.asarray(indices[upper], dtype=np.int64))
+
+def csr_graph(indptr, indices):
+    """Build a NetworkX graph from a CSR adjacency.  The graph has a node for
+    each row of the adjacency.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *indices*
+        The indices array of a CSR adjacency
+
+    """
+
+    (src, dest) = csr_edges(indptr, indices)
+
+    # Garbage collection is paused while the graph's many small objects are
+    # created, since none of them can be garbage
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        graph = nx.empty_graph()
+        graph.add_nodes_from(range(len(indptr) - 1))
+        graph.add_edges_from(zip(src.tolist(), dest.tolist()))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return graph
+
+def lattice_graph(rows, columns, offsets, periodic=False):
+    """Build a NetworkX graph of a 2D lattice with the neighborhood given by
+    offsets (see lattice_adjacency).  If NumPy is available, the graph is
+    built from lattice_adjacency.  Otherwise, each node's neighbors are found
+    in turn with lattice_neighbors.
+
+    Parameters:
+
+    *rows*
+        The number of rows in the lattice
+    *columns*
+        The number of columns in the lattice
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    if np is not None:
+        return csr_graph(*lattice_adjacency(rows, columns, offsets,
+                                            periodic=periodic))
+
+    graph = nx.empty_graph()
+    graph.add_nodes_from(range(rows * columns))
+    for n in range(rows * columns):
+        graph.add_edges_from((n, neighbor) for neighbor in
+                             lattice_neighbors(rows, columns, offsets, n,
+                                               periodic=periodic))
+
+    return graph
+
+def csr_degrees(indptr):
+    """Get the degree of each node from the indptr array of a CSR adjacency
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+
+    """
+
+    return np.diff(indptr)
+
+def csr_neighbor_sum(indptr, indices, values):
+    """Sum the values of each node's neighbors using a CSR adjacency.  The
+    result is an array with one entry per row of the adjacency.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *indices*
+        The indices array of a CSR adjacency
+    *values*
+        An array of values indexed by node ID
+
+    """
+
+    totals = np.zeros(len(indices) + 1, dtype=values.dtype)
+    np.cumsum(values[indices], out=totals[1:])
+    return totals[indptr[1:]] - totals[indptr[:-1]]
+
+def csr_row_cumsum(indptr, weights):
+    """Get the running sums of per-edge weights within each row of a CSR
+    adjacency.  Each row's sums start over from its first edge, so the
+    weights in one row have no effect on the sums in another.  The result is
+    an array aligned with weights.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *weights*
+        An array with one weight per edge, aligned with the indices array
+
+    """
+
+    totals = np.array(weights, dtype=np.float64)
+    degrees = np.diff(indptr)
+
+    # Add the k-th edge of every row with more than k edges at once
+    rows = np.flatnonzero(degrees > 1)
+    k = 1
+    while len(rows) > 0:
+        positions = indptr[rows] + k
+        totals[positions] += totals[positions - 1]
+        k += 1
+        rows = rows[degrees[rows] > k]
+
+    return totals
+
+def csr_row_select(indptr, cumulative, rows, values):
+    """Select one edge from each of the given rows of a CSR adjacency.  For
+    each row, the selected edge is the first whose running sum (see
+    csr_row_cumsum) is greater than the corresponding value, or the last edge
+    of the row if there is none.  If values are drawn uniformly from [0,
+    row total), each edge is selected with probability proportional to its
+    weight.  The result is an array of positions in the indices array.  Every
+    row must have at least one edge.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *cumulative*
+        The running sums of the edge weights within each row
+    *rows*
+        An array of row (node) IDs
+    *values*
+        An array of values to look up, aligned with rows
+
+    """
+
+    low = indptr[rows].astype(np.int64)
+    high = indptr[np.asarray(rows) + 1].astype(np.int64) - 1
+
+    # Binary search within every row at once
+    active = low < high
+    while active.any():
+        middle = (low + high) // 2
+        right = cumulative[middle] <= values
+        low = np.where(active & right, middle + 1, low)
+        high = np.where(active & ~right, middle, high)
+        active = low < high
+
+    return low
+
+def lattice_neighbor_sum(grid, offsets, periodic=False):
+    """Sum the values of each site's neighbors on a 2D lattice.  The neighbors
+    of the site at (row, column) are the sites at (row + dr, column + dc) for
+    each (dr, dc) in offsets.  The result is an array with the same shape and
+    dtype as grid.
+
+    Parameters:
+
+    *grid*
+        A 2D array of values
+    *offsets*
+        A list of (row, column) offsets defining the neighborhood
+    *periodic*
+        Whether or not the edges of the lattice wrap around (default: False)
+
+    """
+
+    rows, columns = grid.shape
+    pad = max([max(abs(dr), abs(dc)) for (dr, dc) in offsets] + [0])
+
+    if periodic:
+        padded = np.pad(grid, pad, mode='wrap')
+    else:
+        padded = np.pad(grid, pad, mode='constant')
+
+    totals = np.zeros_like(grid)
+    for (dr, dc) in offsets:
+        totals += padded[pad + dr:pad + dr + rows, pad + dc:pad + dc + columns]
+
+    return totals
+
+def label_components(indptr, indices, edge_mask=None):
+    """Find the connected components of a graph given by a CSR adjacency.  The
+    result is an array giving the component of each node, where components
+    are numbered 0, 1, 2, ... in order of their smallest node ID.  If SciPy is
+    available, its connected_components is used.  Otherwise, components are
+    found by repeatedly joining the labels at either end of each edge.
+
+    Parameters:
+
+    *indptr*
+        The indptr array of a CSR adjacency
+    *indices*
+        The indices array of a CSR adjacency
+    *edge_mask*
+        An optional boolean array aligned with indices.  If given, only edges
+        for which this is True are used.
+
+    """
+
+    size = len(indptr) - 1
+    rows = np.repeat(np.arange(size), np.diff(indptr))
+    cols = np.asarray(indices, dtype=np.int64)
+    if edge_mask is not None:
+        rows = rows[edge_mask]
+        cols = cols[edge_mask]
+
+    try:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        connected_components = None
+
+    if connected_components is not None:
+        matrix = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                            shape=(size, size))
+        (num, labels) = connected_components(matrix, directed=False)
+    else:
+        # Each node points to a node with a smaller ID in its component.  Roots
+        # (nodes that point to themselves) of trees joined by an edge are
+        # hooked onto the smaller root, and paths are then shortened until
+        # every node points directly to its root.
+        labels = np.arange(size)
+        while True:
+            lrows = labels[rows]
+            lcols = labels[cols]
+            differ = lrows != lcols
+            if not differ.any():
+                break
+
+            lrows = lrows[differ]
+            lcols = lcols[differ]
+            np.minimum.at(labels, np.maximum(lrows, lcols), np.minimum(lrows, lcols))
+
+            while True:
+                jumped = labels[labels]
+                if (jumped == labels).all():
+                    break
+                labels = jumped
+
+    # Number components in order of their smallest node
+    (first, labels) = np.unique(labels, return_index=True,
+                                return_inverse=True)[1:]
+    order = np.argsort(np.argsort(first))
+    return order[labels]
+
+
+class UnionFind(object):
+    """A disjoint-set forest for finding connected components without NumPy.
+    Any hashable items can be used, and items are added the first time they
+    are seen.  Union by size and path halving keep each operation nearly
+    constant time.
+    """
+
+    def __init__(self, items=[]):
+        """Initialize a UnionFind with each of the given items in its own set
+
+        Parameters:
+
+        *items*
+            A list of items
+
+        """
+
+        self.parent = {}
+        self.size = {}
+        for i in items:
+            self.add(i)
+
+    def add(self, item):
+        """Add an item in its own set, unless it is already present"""
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        """Get the representative item of the set containing the given item"""
+        self.add(item)
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        """Merge the sets containing the two given items"""
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra == rb:
+            return ra
+
+        if self.size[ra] < self.size[rb]:
+            (ra, rb) = (rb, ra)
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+    def components(self):
+        """Get a dict mapping the representative of each set to a list of its
+        items
+        """
+
+        members = {}
+        for item in self.parent:
+            members.setdefault(self.find(item), []).append(item)
+        return members
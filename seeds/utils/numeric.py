@@ -6,6 +6,8 @@ Collection of functions that implement commonly-used numeric algorithms
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
+from seeds.SEEDSError import *
+
 
 def is_numeric(s):
     """Test whether or not a given value is numeric (integer or float)"""
@@ -17,3 +19,20 @@ def is_numeric(s):
         return False
     except TypeError:
         return False
+
+def require_numpy(feature):
+    """Raise a ConfigurationError if NumPy is not available.  This is used by
+    features that store or process data in NumPy arrays, which are optional in
+    SEEDS.
+
+    Parameters:
+
+    *feature*
+        A string describing the feature that requires NumPy
+
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        raise ConfigurationError("{feature} requires NumPy".format(feature=feature))
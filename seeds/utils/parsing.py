@@ -83,3 +83,39 @@ def parse_version_string(s):
         return retval
     else:
         raise VersionStringFormatError("'{s}' is not a valid version string".format(s=s))
+
+def parse_param(s):
+    """Parse a string setting a configuration parameter, as given to runseeds
+    with -p, and return a tuple (section, parameter, value).  Strings are of
+    the form:
+
+            <section>.<parameter>=<value>
+
+    Parameters:
+
+    s
+        A string setting a parameter
+
+    """
+
+    # This is perhaps not the best regexp for comma-separated lists as values... need spaces.
+    pattern = r"^\s*(?P<section>[A-Za-z0-9:_]+)\.(?P<parameter>[A-Za-z0-9:_]+)\s*=\s*(?P<value>[A-Za-z0-9_\.\,\-:]+)\s*$"
+    match = re.match(pattern, s)
+
+    if match:
+        return (match.group('section'), match.group('parameter'), match.group('value'))
+    else:
+        raise ParamStringFormatError("'{s}' is not a valid parameter setting".format(s=s))
+
+def parse_param_string(s):
+    """Parse a semicolon-separated list of parameter settings (see
+    parse_param) and return a list of (section, parameter, value) tuples
+
+    Parameters:
+
+    s
+        A string containing a semicolon-separated list of parameter settings
+
+    """
+
+    return [parse_param(p) for p in re.split("\s*;\s*", s.strip()) if p]
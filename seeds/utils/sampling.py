@@ -2,18 +2,63 @@
 """
 Collection of functions that implement commonly-used sampling/selection
 algorithms, such as roulette selection.
+
+For repeated weighted selection, AliasTable draws from fixed weights in O(1)
+time, while FenwickTree and SumTree support weights that change over time.
 """
 
 __author__ = "Brian Connelly <bdc@msu.edu>"
 __credits__ = "Brian Connelly"
 
+import bisect
 import itertools
 import random
 
 
+def cumulative_weights(weights):
+    """Get the running sums of a list of weights.  The result can be used with
+    bisect_select to draw items in proportion to their weights.
+
+    Parameters:
+
+    *weights*
+        A list of non-negative weights
+
+    """
+
+    totals = []
+    total = 0
+    for w in weights:
+        total += w
+        totals.append(total)
+    return totals
+
+def bisect_select(cumulative, value=None):
+    """Get the index of the first running sum that is at least the given
+    value.  If value is drawn uniformly from [0, cumulative[-1]), each index is
+    selected with probability proportional to its weight.  This takes
+    O(log n) time.
+
+    Parameters:
+
+    *cumulative*
+        A list of running sums of weights (see cumulative_weights)
+    *value*
+        The value to look up.  If not given, a random value in
+        [0, cumulative[-1]) is used.
+
+    """
+
+    if value is None:
+        value = random.random() * cumulative[-1]
+    return bisect.bisect_left(cumulative, value)
+
 def roulette_select(items=[], fitnesses=[], k=1):
     """Perform a fitness-proportional selection using a roulette wheel
 
+    The running sums of the fitnesses are computed once, and each of the k
+    selections is made by a binary search of these sums.
+
     Parameters:
 
     *items*
@@ -34,18 +79,15 @@ def roulette_select(items=[], fitnesses=[], k=1):
     elif len(items) < 1:
         print("Error: Must supply items to choose from")
 
-    total_fitness = float(sum(fitnesses))
-    rel_fitnesses = [f/total_fitness for f in fitnesses]
-    p = [sum(rel_fitnesses[:i+1]) for i in range(len(rel_fitnesses))]
-
-    winners = []
-    while len(winners) < k:
-        for i in range(len(items)):
-            if random.random() < p[i]:
-                winners.append(items[i])
-                break
+    cumulative = cumulative_weights(fitnesses)
+    total = float(cumulative[-1])
+    last = len(items) - 1
 
-    return winners
+    # Items with zero fitness share their running sum with the item before
+    # them, so bisect_right is used to never select them.  min() guards
+    # against random() * total rounding up to total.
+    _random, _bisect = random.random, bisect.bisect_right
+    return [items[min(_bisect(cumulative, _random() * total), last)] for i in range(k)]
 
 def sample_with_replacement(items=[], k=1):
     """Get a list of samples from a given set of items with replacement.
@@ -86,3 +128,305 @@ def sample_without_replacement(items=[], k=1):
     """
 
     return random.sample(items, k)
+
+def sample_range(n, k=1):
+    """Get a list of k distinct integers selected at random from 0..n-1
+    without replacement.  Unlike random.sample(range(n), k), the range is not
+    built unless k is a large fraction of n, so this takes O(k) time.
+
+    Parameters:
+
+    *n*
+        The number of integers from which to select
+    *k*
+        Number of integers to select (default: 1)
+
+    """
+
+    if k > n:
+        raise ValueError("Can not select {k} of {n} integers".format(k=k, n=n))
+    elif 4 * k > n:
+        return random.sample(range(n), k)
+
+    _random, _int = random.random, int
+    selected = set()
+    samples = []
+    while len(samples) < k:
+        i = _int(_random() * n)
+        if i not in selected:
+            selected.add(i)
+            samples.append(i)
+    return samples
+
+
+class SumTree(object):
+    """A binary tree storing a non-negative weight for each of a fixed number
+    of items, where each internal node holds the sum of the weights below it.
+    Changing a weight and selecting an item with probability proportional to
+    its weight both take O(log n) time.
+
+    Properties:
+
+    size
+        The number of items
+
+    """
+
+    def __init__(self, size):
+        """Initialize a SumTree with all weights set to 0
+
+        Parameters:
+
+        *size*
+            The number of items
+
+        """
+
+        self.size = size
+        self._capacity = 1
+        while self._capacity < size:
+            self._capacity *= 2
+        self._tree = [0.0] * (2 * self._capacity)
+
+    def __getitem__(self, index):
+        """Get the weight of the given item"""
+        return self._tree[self._capacity + index]
+
+    def __setitem__(self, index, weight):
+        """Set the weight of the given item"""
+        # Sums are recomputed from the children rather than adjusted by the
+        # change in weight so that rounding errors do not accumulate
+        tree = self._tree
+        i = self._capacity + index
+        tree[i] = weight
+        i //= 2
+        while i >= 1:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i //= 2
+
+    def total(self):
+        """Get the sum of all weights"""
+        return self._tree[1]
+
+    def find(self, value):
+        """Get the item at which the running sum of weights exceeds the given
+        value.  If value is drawn uniformly from [0, total()), items are
+        selected with probability proportional to their weights.
+
+        Parameters:
+
+        *value*
+            A number between 0 and total()
+
+        """
+
+        tree = self._tree
+        i = 1
+        while i < self._capacity:
+            left = 2 * i
+            if value < tree[left] or tree[left + 1] <= 0.0:
+                i = left
+            else:
+                value -= tree[left]
+                i = left + 1
+        return i - self._capacity
+
+    def select(self):
+        """Select an item with probability proportional to its weight"""
+        return self.find(random.random() * self._tree[1])
+
+
+class AliasTable(object):
+    """Walker's alias method for drawing repeatedly from a fixed set of
+    weights.  Building the table takes O(n) time, after which each draw takes
+    O(1) time and uses a single random number.
+
+    Properties:
+
+    size
+        The number of items
+
+    """
+
+    def __init__(self, weights):
+        """Initialize an AliasTable
+
+        Parameters:
+
+        *weights*
+            A list of non-negative weights, at least one of which is positive
+
+        """
+
+        self.size = len(weights)
+        total = float(sum(weights))
+        scaled = [w * self.size / total for w in weights]
+
+        self._prob = [1.0] * self.size
+        self._alias = list(range(self.size))
+
+        small = [i for i in range(self.size) if scaled[i] < 1.0]
+        large = [i for i in range(self.size) if scaled[i] >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Any remaining items have (up to rounding) a scaled weight of 1
+
+    def draw(self):
+        """Get the index of an item drawn in proportion to its weight"""
+        u = random.random() * self.size
+        i = int(u)
+        if u - i < self._prob[i]:
+            return i
+        return self._alias[i]
+
+    def sample(self, items, k=1):
+        """Draw k items (with replacement) in proportion to their weights
+
+        Parameters:
+
+        *items*
+            A list of items corresponding to the weights
+        *k*
+            Number of items to select (default: 1)
+
+        """
+
+        draw = self.draw
+        return [items[draw()] for i in itertools.repeat(None, k)]
+
+
+class FenwickTree(object):
+    """A Fenwick (binary indexed) tree storing a weight for each of a fixed
+    number of items.  Changing a weight, computing a running sum, and
+    selecting an item in proportion to its weight each take O(log n) time,
+    and only n numbers are stored.
+
+    Since changes are applied as differences, rounding errors can accumulate
+    in the sums after many changes to floating point weights.  SumTree avoids
+    this at the cost of twice the memory.
+
+    Properties:
+
+    size
+        The number of items
+
+    """
+
+    def __init__(self, size=0, weights=None):
+        """Initialize a FenwickTree.  Building from a list of weights takes
+        O(n) time.
+
+        Parameters:
+
+        *size*
+            The number of items, all of which start with weight 0
+        *weights*
+            A list of initial weights.  If given, size is ignored.
+
+        """
+
+        if weights is not None:
+            size = len(weights)
+
+        self.size = size
+        self._weights = [0] * size
+        self._tree = [0] * (size + 1)
+
+        if weights is not None:
+            self._weights = list(weights)
+            tree = self._tree
+            for i in range(1, size + 1):
+                tree[i] += weights[i - 1]
+                parent = i + (i & -i)
+                if parent <= size:
+                    tree[parent] += tree[i]
+
+        self._top = 1
+        while self._top * 2 <= size:
+            self._top *= 2
+
+    def __getitem__(self, index):
+        """Get the weight of the given item"""
+        return self._weights[index]
+
+    def __setitem__(self, index, weight):
+        """Set the weight of the given item"""
+        self.add(index, weight - self._weights[index])
+
+    def add(self, index, delta):
+        """Add to the weight of the given item
+
+        Parameters:
+
+        *index*
+            The index of the item
+        *delta*
+            The amount to add to its weight
+
+        """
+
+        self._weights[index] += delta
+        tree = self._tree
+        i = index + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        """Get the sum of the weights of items 0 through index - 1
+
+        Parameters:
+
+        *index*
+            The number of items to sum
+
+        """
+
+        tree = self._tree
+        total = 0
+        i = index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        """Get the sum of all weights"""
+        return self.prefix_sum(self.size)
+
+    def find(self, value):
+        """Get the first item at which the running sum of weights exceeds the
+        given value.  If value is drawn uniformly from [0, total()), items are
+        selected with probability proportional to their weights.
+
+        Parameters:
+
+        *value*
+            A number between 0 and total()
+
+        """
+
+        tree = self._tree
+        pos = 0
+        step = self._top
+        while step > 0:
+            nxt = pos + step
+            if nxt <= self.size and tree[nxt] <= value:
+                value -= tree[nxt]
+                pos = nxt
+            step //= 2
+        return min(pos, self.size - 1)
+
+    def select(self):
+        """Select an item with probability proportional to its weight"""
+        return self.find(random.random() * self.total())
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Write per-epoch snapshots of arrays (e.g., the type of every Cell) to a single
+binary file.
+
+A snapshot file begins with a header and is followed by records, each holding
+one array.  Static records hold arrays that rarely change, such as node IDs and
+coordinates, and are written only when they change.  Epoch records hold the
+arrays for one epoch.  Records are appended as they are written, so a file is
+usable even if the experiment is interrupted.  When the file is closed, an
+index of all records is appended, so readers do not need to scan the file.
+
+Layout (all integers little-endian):
+
+    header
+        8 bytes 'SEEDSNAP', uint16 format version, uint32 metadata length,
+        metadata (JSON), padding to a multiple of 8 bytes
+    record
+        4 bytes 'SREC', uint8 kind (0: static, 1: epoch), uint8 compression
+        (0: none, 1: zlib), uint16 name length, uint16 dtype length, int64
+        epoch, uint64 array size in bytes, uint64 stored size in bytes, name,
+        dtype (NumPy dtype string), padding to a multiple of 8 bytes, data,
+        padding to a multiple of 8 bytes
+    index
+        JSON list of [kind, epoch, name, dtype, data offset, array size,
+        stored size, compression] for each record, followed by uint64 offset
+        of the index and 8 bytes 'SNAPIDX1'
+
+Since uncompressed data is aligned, it can be memory-mapped by readers.  See
+contrib/utils/read_snapshots.py for a reader.
+
+Writing snapshots requires NumPy.
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+import json
+import os
+import struct
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from seeds.utils.numeric import require_numpy
+
+SNAPSHOT_MAGIC = b'SEEDSNAP'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sHI')
+SNAPSHOT_RECORD_MAGIC = b'SREC'
+SNAPSHOT_RECORD = struct.Struct('<4sBBHHqQQ')
+SNAPSHOT_TRAILER = struct.Struct('<Q8s')
+SNAPSHOT_TRAILER_MAGIC = b'SNAPIDX1'
+
+SNAPSHOT_STATIC = 0
+SNAPSHOT_EPOCH = 1
+
+
+def _padding(length, alignment=8):
+    """Get the number of bytes needed to pad the given length to a multiple of
+    alignment
+    """
+
+    return -length % alignment
+
+
+class SnapshotWriter(object):
+    """Append arrays to a snapshot file
+
+    Properties:
+
+    filename
+        The name of the file being written
+    compress
+        Whether or not to compress each array with zlib
+    index
+        A list describing each record written (see the module documentation)
+    closed
+        Whether or not the file has been closed
+
+    """
+
+    def __init__(self, filename, compress=False, metadata={}, resume=None):
+        """Initialize a SnapshotWriter object and write the file header
+
+        Parameters:
+
+        *filename*
+            The name of the file to write.  Any existing file is replaced.
+        *compress*
+            Whether or not to compress each array with zlib (default: False).
+            Compressed arrays can not be memory-mapped.
+        *metadata*
+            A dict of information to store in the header, such as the names
+            of Cell types.  This must be serializable as JSON.
+        *resume*
+            The state of the writer saved in a checkpoint (see
+            get_checkpoint).  If given, the existing file is truncated to the
+            saved position, and records are appended after that.  The header
+            is not written again.  (default: None)
+
+        """
+
+        require_numpy("Binary snapshots")
+
+        self.filename = filename
+        self.compress = compress
+        self.index = []
+        self.closed = False
+        self._static = {}
+
+        if resume is not None:
+            self._handle = open(filename, 'r+b')
+            self._handle.seek(resume['position'])
+            self._handle.truncate()
+            self.index = [list(r) for r in resume['index']]
+            self._static = dict(resume['static'])
+            return
+
+        self._handle = open(filename, 'wb')
+
+        meta = json.dumps(metadata).encode('utf-8')
+        self._write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta)))
+        self._write(meta)
+        self._pad()
+
+    def __str__(self):
+        """Produce a string to be used when a SnapshotWriter is printed"""
+        return "SnapshotWriter [{f}][Records: {n}]".format(f=self.filename, n=len(self.index))
+
+    def _write(self, data):
+        self._handle.write(data)
+
+    def _pad(self):
+        self._write(b'\0' * _padding(self._handle.tell()))
+
+    def _write_record(self, kind, epoch, name, values):
+        values = np.ascontiguousarray(values)
+        data = values.tobytes()
+        compression = 0
+        if self.compress:
+            data = zlib.compress(data)
+            compression = 1
+
+        name_bytes = name.encode('utf-8')
+        dtype_bytes = values.dtype.str.encode('ascii')
+        self._write(SNAPSHOT_RECORD.pack(SNAPSHOT_RECORD_MAGIC, kind,
+                                         compression, len(name_bytes),
+                                         len(dtype_bytes), epoch,
+                                         values.nbytes, len(data)))
+        self._write(name_bytes)
+        self._write(dtype_bytes)
+        self._pad()
+
+        offset = self._handle.tell()
+        self._write(data)
+        self._pad()
+
+        self.index.append([kind, epoch, name, values.dtype.str, offset,
+                           values.nbytes, len(data), compression])
+
+    def write_static(self, epoch, arrays):
+        """Write arrays that apply to the given and all later epochs until they
+        are written again.  Arrays that are equal to those last written with
+        the same name are skipped.
+
+        Parameters:
+
+        *epoch*
+            The first epoch to which the arrays apply
+        *arrays*
+            A list of (name, array) tuples
+
+        """
+
+        for (name, values) in arrays:
+            values = np.asarray(values)
+            last = self._static.get(name)
+            if last is not None and last.shape == values.shape and \
+                    last.dtype == values.dtype and (last == values).all():
+                continue
+
+            self._write_record(SNAPSHOT_STATIC, epoch, name, values)
+            self._static[name] = values.copy()
+
+    def write_epoch(self, epoch, arrays):
+        """Write the arrays for an epoch
+
+        Parameters:
+
+        *epoch*
+            The epoch
+        *arrays*
+            A list of (name, array) tuples
+
+        """
+
+        for (name, values) in arrays:
+            self._write_record(SNAPSHOT_EPOCH, epoch, name, values)
+
+    def flush(self):
+        """Write any data buffered by the file object"""
+        if not self.closed:
+            self._handle.flush()
+
+    def get_checkpoint(self):
+        """Write any buffered data to disk and get the state of the writer to
+        be saved in a checkpoint
+        """
+
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        return {'position': self._handle.tell(),
+                'index': [list(r) for r in self.index],
+                'static': dict(self._static)}
+
+    def close(self):
+        """Write the index and close the file"""
+        if self.closed:
+            return
+
+        offset = self._handle.tell()
+        self._write(json.dumps(self.index).encode('utf-8'))
+        self._write(SNAPSHOT_TRAILER.pack(offset, SNAPSHOT_TRAILER_MAGIC))
+        self._handle.close()
+        self.closed = True
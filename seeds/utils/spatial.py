@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""
+Collection of functions and classes for finding nearby points in the unit
+square, such as the points placed by CartesianTopology.  These work on arrays
+of coordinates rather than individual points, so that large numbers of points
+can be handled quickly.
+
+Except for KDTree, these require NumPy.
+"""
+
+__author__ = "Brian Connelly <bdc@msu.edu>"
+__credits__ = "Brian Connelly"
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import heapq
+from math import sqrt
+
+from seeds.utils.numeric import require_numpy
+
+
+def ragged_arange(starts, counts):
+    """Concatenate the ranges starts[i]..starts[i]+counts[i] for each i.  The
+    result is an int64 array of sum(counts) elements.
+
+    Parameters:
+
+    *starts*
+        An array of the first value of each range
+    *counts*
+        An array of the number of values in each range
+
+    """
+
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    ends = np.cumsum(counts)
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(ends - counts, counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + offsets
+
+
+class CellList(object):
+    """Points in the unit square sorted into a grid of square bins
+
+    The bins are at least radius wide, so any two points within radius of
+    each other are either in the same bin or in adjacent bins.  If periodic
+    boundaries are used, bins on opposite edges of the square are adjacent.
+
+    Properties:
+
+    coords
+        An (n, 2) array of the coordinates of each point
+    radius
+        The distance within which points are neighbors
+    periodic
+        Whether or not periodic boundary conditions are used
+    num_bins
+        The number of bins along each side of the square
+    bins
+        The index of the bin holding each point (x bin * num_bins + y bin)
+    order
+        The indices of the points, sorted by bin
+    starts
+        For each bin, the position in order of its first point
+    counts
+        The number of points in each bin
+
+    """
+
+    def __init__(self, coords, radius, periodic=False):
+        """Initialize a CellList object
+
+        Parameters:
+
+        *coords*
+            An (n, 2) array of the coordinates of each point.  Coordinates
+            must be in [0, 1).
+        *radius*
+            The distance within which points are neighbors
+        *periodic*
+            Whether or not to use periodic boundary conditions (default: False)
+
+        """
+
+        require_numpy("CellList")
+
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.radius = radius
+        self.periodic = periodic
+
+        # Bins need not be smaller than needed to hold a few points each.  With
+        # fewer than 3 bins per side, adjacent bins would be counted more than
+        # once, so a single bin is used.
+        if radius > 0:
+            num_bins = int(min(np.floor(1.0 / radius),
+                               np.sqrt(len(self.coords)) + 1))
+        else:
+            num_bins = 1
+        if num_bins < 3:
+            num_bins = 1
+        self.num_bins = num_bins
+
+        (bx, by) = self.bin_coords(self.coords)
+        self.bins = bx * num_bins + by
+        self.order = np.argsort(self.bins, kind='mergesort')
+        self.counts = np.bincount(self.bins, minlength=num_bins * num_bins)
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def __str__(self):
+        """Produce a string to be used when a CellList object is printed"""
+        return "CellList [Points: {n}][Bins: {b}x{b}]".format(n=len(self.coords), b=self.num_bins)
+
+    def bin_coords(self, coords):
+        """Get the x and y bin of each of the given points as a pair of
+        arrays
+        """
+
+        scaled = np.floor(np.asarray(coords) * self.num_bins).astype(np.int64)
+        np.clip(scaled, 0, self.num_bins - 1, out=scaled)
+        return (scaled[:, 0], scaled[:, 1])
+
+    def members(self, bin):
+        """Get the indices of the points in the given bin"""
+        start = self.starts[bin]
+        return self.order[start:start + self.counts[bin]]
+
+    def neighborhood(self, point):
+        """Get the indices of the points in the bin holding the given point
+        and in each adjacent bin, including the point itself
+
+        Parameters:
+
+        *point*
+            The index of the point
+
+        """
+
+        nb = self.num_bins
+        (x, y) = divmod(int(self.bins[point]), nb)
+        if nb == 1:
+            return self.members(0)
+
+        candidates = []
+        for px in range(x - 1, x + 2):
+            if not self.periodic and (px < 0 or px >= nb):
+                continue
+            for py in range(y - 1, y + 2):
+                if not self.periodic and (py < 0 or py >= nb):
+                    continue
+                candidates.append(self.members((px % nb) * nb + (py % nb)))
+
+        return np.concatenate(candidates)
+
+    def distances(self, src, dest):
+        """Get the distances between pairs of points
+
+        Parameters:
+
+        *src*
+            An array of the indices of the first point of each pair
+        *dest*
+            An array of the indices of the second point of each pair
+
+        """
+
+        delta = np.abs(self.coords[src] - self.coords[dest])
+        if self.periodic:
+            np.minimum(delta, 1 - delta, out=delta)
+        return np.sqrt((delta * delta).sum(axis=1))
+
+    def pairs(self):
+        """Find every pair of points that are less than radius apart.  The
+        result is a tuple (src, dest) of int64 arrays of point indices.  Each
+        pair is given once.
+        """
+
+        if self.radius <= 0 or len(self.coords) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return (empty, empty.copy())
+
+        nb = self.num_bins
+        found_src = []
+        found_dest = []
+
+        # Each pair of adjacent bins is visited once by pairing every bin with
+        # the bins at these offsets
+        if nb == 1:
+            offsets = [(0, 0)]
+        else:
+            offsets = [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+        bin_x = np.repeat(np.arange(nb), nb)
+        bin_y = np.tile(np.arange(nb), nb)
+
+        for (dx, dy) in offsets:
+            other_x = bin_x + dx
+            other_y = bin_y + dy
+            if self.periodic:
+                other_x %= nb
+                other_y %= nb
+                valid = np.ones(nb * nb, dtype=bool)
+            else:
+                valid = (other_x >= 0) & (other_x < nb) & (other_y >= 0) & (other_y < nb)
+
+            other = np.where(valid, other_x * nb + other_y, 0)
+
+            # Pair every point (in bin order) with each point in the other bin
+            per_point = np.where(valid, self.counts[other], 0)[self.bins[self.order]]
+            src = np.repeat(np.arange(len(self.order)), per_point)
+            dest = ragged_arange(self.starts[other][self.bins[self.order]], per_point)
+
+            if (dx, dy) == (0, 0):
+                keep = src < dest
+                src = src[keep]
+                dest = dest[keep]
+
+            src = self.order[src]
+            dest = self.order[dest]
+            close = self.distances(src, dest) < self.radius
+            found_src.append(src[close])
+            found_dest.append(dest[close])
+
+        return (np.concatenate(found_src), np.concatenate(found_dest))
+
+
+
+# Fields of the lists used as KDTree nodes
+_POINT, _KEY, _AXIS, _LEFT, _RIGHT, _ALIVE = range(6)
+
+
+class KDTree(object):
+    """A k-d tree of keyed points supporting nearest neighbor and radius
+    queries
+
+    Each node of the tree holds one point and splits space along one axis,
+    with points no greater than its coordinate on that axis on the left and
+    points no less than it on the right.  Queries visit subtrees nearest the query point first
+    and skip those whose region of space is farther than the points already
+    found.  With periodic boundaries, points are in the unit cube, distances
+    wrap around its edges (as in seeds.utils.geometry.euclidean_distance),
+    and so do the regions of space used to skip subtrees.
+
+    Points can be added and removed at any time.  Added points are placed in
+    the existing tree, and removed points are marked as removed and skipped
+    by queries.  The tree is rebuilt once the number of points added or
+    removed since it was last built exceeds the number it was built with,
+    which keeps it balanced.
+
+    Keys must be integers (e.g., node IDs).  Points at the same distance are
+    ordered by key.  KDTree does not require NumPy.
+
+    Properties:
+
+    dimensions
+        The number of dimensions of each point
+    periodic
+        Whether or not periodic boundary conditions are used
+    root
+        The root node of the tree
+
+    """
+
+    def __init__(self, points=(), dimensions=2, periodic=False):
+        """Initialize a KDTree object
+
+        Parameters:
+
+        *points*
+            An iterable of (key, coordinates) tuples of the points to add
+        *dimensions*
+            The number of dimensions of each point (default: 2)
+        *periodic*
+            Whether or not to use periodic boundary conditions (default: False)
+
+        """
+
+        self.dimensions = dimensions
+        self.periodic = periodic
+        self.root = None
+        self._nodes = {}
+        self._changes = 0
+        self._built_size = 0
+        self.rebuild([(key, self._point(coords)) for (key, coords) in points])
+
+    def __str__(self):
+        """Produce a string to be used when a KDTree object is printed"""
+        return "KDTree [Points: {n}][Dimensions: {d}]".format(n=len(self), d=self.dimensions)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, key):
+        return key in self._nodes
+
+    def _point(self, coords):
+        point = tuple(float(c) for c in coords)
+        if len(point) != self.dimensions:
+            raise ValueError("Point {p} does not have {d} dimensions".format(p=coords, d=self.dimensions))
+        return point
+
+    def rebuild(self, points=None):
+        """Build a balanced tree from the given points, or from the points
+        currently in the tree if none are given
+
+        Parameters:
+
+        *points*
+            A list of (key, point) tuples, where each point is a tuple of
+            floats (default: None)
+
+        """
+
+        if points is None:
+            points = [(key, node[_POINT]) for (key, node) in self._nodes.items()]
+
+        # Sorting by key makes the shape of the tree independent of the order
+        # in which points were given
+        points.sort(key=lambda item: item[0])
+
+        self._nodes = {}
+        self.root = self._build(points, 0)
+        self._changes = 0
+        self._built_size = len(self._nodes)
+
+    def _build(self, points, axis):
+        if not points:
+            return None
+
+        points.sort(key=lambda item: item[1][axis])
+        median = len(points) // 2
+        (key, point) = points[median]
+        next_axis = (axis + 1) % self.dimensions
+        node = [point, key, axis, self._build(points[:median], next_axis),
+                self._build(points[median + 1:], next_axis), True]
+        self._nodes[key] = node
+        return node
+
+    def _changed(self):
+        self._changes += 1
+        if self._changes > max(self._built_size, 16):
+            self.rebuild()
+
+    def insert(self, key, coords):
+        """Add a point to the tree.  If the key is already present, its point
+        is replaced.
+
+        Parameters:
+
+        *key*
+            The key of the point
+        *coords*
+            The coordinates of the point
+
+        """
+
+        point = self._point(coords)
+        if key in self._nodes:
+            self.remove(key)
+
+        node = [point, key, 0, None, None, True]
+        current = self.root
+        if current is None:
+            self.root = node
+        else:
+            while True:
+                axis = current[_AXIS]
+                if point[axis] < current[_POINT][axis]:
+                    side = _LEFT
+                else:
+                    side = _RIGHT
+
+                if current[side] is None:
+                    node[_AXIS] = (axis + 1) % self.dimensions
+                    current[side] = node
+                    break
+                current = current[side]
+
+        self._nodes[key] = node
+        self._changed()
+
+    def remove(self, key):
+        """Remove the point with the given key from the tree.  KeyError is
+        raised if there is no such point.
+
+        Parameters:
+
+        *key*
+            The key of the point
+
+        """
+
+        node = self._nodes.pop(key)
+        node[_ALIVE] = False
+        self._changed()
+
+    def _distance(self, p, q):
+        """Get the squared distance between two points"""
+        total = 0.0
+        for (a, b) in zip(p, q):
+            d = abs(a - b)
+            if self.periodic and d > 0.5:
+                d = 1.0 - d
+            total += d * d
+        return total
+
+    def _region_distance(self, point, low, high):
+        """Get the squared distance from a point to the nearest point in the
+        region of space bounded by low and high
+        """
+
+        total = 0.0
+        for (x, a, b) in zip(point, low, high):
+            if x < a:
+                d = a - x
+                if self.periodic:
+                    d = min(d, 1.0 - b + x)
+            elif x > b:
+                d = x - b
+                if self.periodic:
+                    d = min(d, 1.0 - x + a)
+            else:
+                continue
+            total += d * d
+        return total
+
+    def _region(self):
+        if self.periodic:
+            return ([0.0] * self.dimensions, [1.0] * self.dimensions)
+        return ([float('-inf')] * self.dimensions, [float('inf')] * self.dimensions)
+
+    def nearest(self, coords, k=1):
+        """Find the k points nearest the given coordinates.  The result is a
+        list of (distance, key) tuples, nearest first.  Fewer are given if the
+        tree holds fewer than k points.
+
+        Parameters:
+
+        *coords*
+            The coordinates of the query point
+        *k*
+            The number of points to find (default: 1)
+
+        """
+
+        point = self._point(coords)
+        if k < 1:
+            return []
+
+        # found is a heap of the best (-squared distance, -key) so far, so its
+        # first entry is the farthest point found
+        found = []
+        (low, high) = self._region()
+        stack = [(self.root, low, high)]
+
+        while stack:
+            (node, low, high) = stack.pop()
+            if node is None:
+                continue
+            if len(found) == k and self._region_distance(point, low, high) > -found[0][0]:
+                continue
+
+            if node[_ALIVE]:
+                entry = (-self._distance(point, node[_POINT]), -node[_KEY])
+                if len(found) < k:
+                    heapq.heappush(found, entry)
+                elif entry > found[0]:
+                    heapq.heapreplace(found, entry)
+
+            (left, right) = self._split(node, low, high)
+            if point[node[_AXIS]] < node[_POINT][node[_AXIS]]:
+                stack.append(right)
+                stack.append(left)
+            else:
+                stack.append(left)
+                stack.append(right)
+
+        return sorted((sqrt(-d), -key) for (d, key) in found)
+
+    def _split(self, node, low, high):
+        """Get the (node, low, high) of the left and right subtrees of a node,
+        given the region of space bounded by low and high of the node
+        """
+
+        axis = node[_AXIS]
+        split = node[_POINT][axis]
+        left_high = list(high)
+        left_high[axis] = split
+        right_low = list(low)
+        right_low[axis] = split
+        return ((node[_LEFT], low, left_high), (node[_RIGHT], right_low, high))
+
+    def within(self, coords, radius):
+        """Find all points within the given distance of the given
+        coordinates.  The result is a list of (distance, key) tuples, nearest
+        first.
+
+        Parameters:
+
+        *coords*
+            The coordinates of the query point
+        *radius*
+            The maximum distance of the points to find
+
+        """
+
+        point = self._point(coords)
+        if radius < 0:
+            return []
+
+        limit = radius * radius
+        found = []
+        (low, high) = self._region()
+        stack = [(self.root, low, high)]
+
+        while stack:
+            (node, low, high) = stack.pop()
+            if node is None or self._region_distance(point, low, high) > limit:
+                continue
+
+            if node[_ALIVE]:
+                d = self._distance(point, node[_POINT])
+                if d <= limit:
+                    found.append((d, node[_KEY]))
+
+            stack.extend(self._split(node, low, high))
+
+        return sorted((sqrt(d), key) for (d, key) in found)
@@ -18,6 +18,10 @@ def mean(data):
 
     """
 
+    if hasattr(data, 'mean'):
+        # NumPy arrays
+        return float(data.mean())
+
     return float(sum(data))/len(data)
 
 def std(data):
@@ -29,6 +33,11 @@ def std(data):
         a list of numbers whose standard deviation to calculate
 
     """
+
+    if hasattr(data, 'std'):
+        # NumPy arrays
+        return float(data.std())
+
     m = mean(data)
     sumsq = 0
 
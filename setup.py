@@ -27,7 +27,7 @@ if __name__ == "__main__":
         name = "seeds",
         version = S.__version__,
         packages = ['seeds','seeds.plugins','seeds.plugins.cell','seeds.plugins.topology','seeds.plugins.action','seeds.plugins.resource','seeds.utils'],
-        scripts = ['scripts/runseeds.py'],
+        scripts = ['scripts/runseeds.py', 'scripts/seedssweep.py'],
         license = S.__license__,
         author = "Brian Connelly",
         author_email = "bdc@msu.edu",
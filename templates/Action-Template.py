@@ -24,9 +24,8 @@ __author__ = "TODO"
 __credits__ = "TODO"
 
 
-# TODO: if you'll be writing data files, you'll want to use the csv module.
-# All data files created by SEEDS should be in csv format.
-import csv
+# NOTE: All data files created by SEEDS should be in csv format.  Use the
+# open_writer method to create them (see below).
 
 from seeds.Action import *
 
@@ -54,7 +53,14 @@ class TODO-ActionName(Action):
         # TODO: load and validate any other configuration parameters here
 
         # TODO: if you plan to have one output file for this action, create and
-        # open it here.
+        # open it here.  open_writer returns a writer whose rows are buffered
+        # and written by the Experiment, which also closes the file at the end
+        # of the experiment.  For example:
+        #
+        #   self.writer = self.open_writer('data.csv', ['epoch', 'value'])
+        #
+        # Rows can then be written in update() with self.writer.writerow
+        # (given a dict) or self.writer.writevalues (given a list).
 
 
     # TODO: the update method is called at each epoch and performs whatever
@@ -88,10 +88,6 @@ class TODO-CellTypeName(Cell):
         """Produce a string to be used when the object is printed"""
         return 'TODO-CellTypeName %d Type %d (%s)' % (self.id, self.type, self.types[self.type])
 
-    def type(self):
-        """Return the name of the type of this cell"""
-        return self.types[self.type]
-
 
     # TODO: the update method updates an organism's state.  As such, it is the
     # most important part of a Cell object.  When a Cell is updated, it may
@@ -121,5 +117,5 @@ class TODO-CellTypeName(Cell):
 
         # If the type of the Cell changes, the update_type_count method should
         # be called, which specifies the old type and the new type.
-        self.population.update_type_count(OLD_TYPE, NEW_TYPE)
+        self.population.update_type_count(OLD_TYPE, NEW_TYPE, node=self.node)
 